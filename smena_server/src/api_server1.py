@@ -1,10 +1,19 @@
-from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, Response, Query
 from pydantic import BaseModel
-from db_connector import DBConnector
+from db_connector import DBConnectorPool
 from ui.call_manager import CallManager
-from ui.sms_manager import send_http_sms
+from ui.sms_dispatcher import SMSDispatcher, HTTPSMSTransport
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from typing import Optional
+import asyncio
+import bisect
+import hashlib
 import logging
 import configparser
+import threading
+import time
+import uuid
 import os
 
 # Загрузка конфигурации
@@ -19,97 +28,426 @@ else:
 if 'Asterisk' not in config:
     raise KeyError("Секция 'Asterisk' отсутствует в конфигурационном файле")
 
-db_connector = DBConnector(config)
-call_manager = CallManager(config, callback=None)
-
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("api_server")
 
+# Запросы к БД выполняются в ограниченном пуле потоков, по соединению из пула на поток:
+# медленный запрос одного оператора не задерживает остальных
+DB_POOL_SIZE = int(config.get('API', 'db_pool_size', fallback='4'))
+db_pool = DBConnectorPool(config, size=DB_POOL_SIZE)
+db_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix='api-db')
+# Originate — блокирующий HTTP-запрос к Asterisk, выполняется в отдельном пуле
+call_executor = ThreadPoolExecutor(
+    max_workers=int(config.get('API', 'call_workers', fallback='2')), thread_name_prefix='api-call'
+)
+# Файлы (настройки, логи, отчёты)
+file_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='api-file')
+
+sms_dispatcher = SMSDispatcher(
+    HTTPSMSTransport(
+        config['SMS']['url'], config['SMS']['login'], config['SMS']['password'], config['SMS']['shortcode'],
+        pool_size=int(config.get('SMS', 'workers', fallback='4')),
+        timeout=float(config.get('SMS', 'timeout', fallback='10')),
+        verify=config.getboolean('SMS', 'verify_ssl', fallback=False)
+    ),
+    workers=int(config.get('SMS', 'workers', fallback='4')),
+    rate_per_second=float(config.get('SMS', 'rate_per_second', fallback='5')),
+    burst=int(config.get('SMS', 'burst', fallback='10')),
+    max_retries=int(config.get('SMS', 'max_retries', fallback='3'))
+)
+
+
+class JobRegistry:
+    """
+    Задания, выполняемые в фоне (SMS, звонки): эндпоинт сразу возвращает job_id,
+    состояние задания доступно через GET /jobs/{job_id}. Завершённые задания
+    хранятся retention_seconds.
+    """
+
+    def __init__(self, retention_seconds=3600):
+        self.retention_seconds = retention_seconds
+        self.lock = threading.Lock()
+        self.jobs = {}
+        # ActionID звонка -> job_id (статусы звонка приходят от CallManager)
+        self.action_jobs = {}
+
+    def create(self, kind, **fields):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self.lock:
+            self.prune(now)
+            self.jobs[job_id] = dict(fields, job_id=job_id, type=kind, status='pending', created=now, updated=now)
+        return job_id
+
+    def update(self, job_id, **fields):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                job.update(fields, updated=time.time())
+                if 'action_id' in fields:
+                    self.action_jobs[fields['action_id']] = job_id
+
+    def update_by_action(self, action_id, **fields):
+        with self.lock:
+            job_id = self.action_jobs.get(action_id)
+        if job_id is not None:
+            self.update(job_id, **fields)
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def prune(self, now):
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job['status'] not in ('pending', 'running') and now - job['updated'] > self.retention_seconds
+        ]
+        for job_id in expired:
+            action_id = self.jobs.pop(job_id).get('action_id')
+            self.action_jobs.pop(action_id, None)
+
+
+class LatencyStats:
+    """Задержки обработки запросов по эндпоинтам (последние window замеров)."""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.counts = {}
+        self.errors = {}
+
+    def record(self, endpoint, elapsed, status_code):
+        with self.lock:
+            self.samples.setdefault(endpoint, deque(maxlen=self.window)).append(elapsed)
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+            if status_code >= 500:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def stats(self):
+        with self.lock:
+            snapshot = {endpoint: sorted(samples) for endpoint, samples in self.samples.items()}
+            counts = dict(self.counts)
+            errors = dict(self.errors)
+        result = {}
+        for endpoint, ordered in snapshot.items():
+            result[endpoint] = {
+                'requests': counts[endpoint],
+                'errors': errors.get(endpoint, 0),
+                'p50': round(ordered[len(ordered) // 2], 4),
+                'p95': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+                'max': round(ordered[-1], 4),
+            }
+        return result
+
+
+class AlarmSnapshot:
+    """
+    Снимок активных тревог (Temp, StateEvent = 0), который обновляет фоновый поток.
+
+    Раз в poll_interval поток сверяет дешёвый отпечаток набора (количество, максимальный
+    Event_id, контрольная сумма строк) и перечитывает строки только если он изменился;
+    тогда увеличивается version. GET /alarms отдаёт страницы из снимка, а по version
+    и параметрам страницы строится ETag: неизменившийся опрос получает 304 без обращения к БД.
+    """
+
+    # Столбцы Temp, которые можно запросить через ?fields=, даже пока тревог нет
+    BASE_FIELDS = ('Event_id', 'Panel_id', 'Code', 'TimeEvent', 'StateEvent')
+
+    def __init__(self, db_pool, poll_interval=2.0):
+        self.db_pool = db_pool
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        # Поток опроса и refresh() после подтверждения тревоги не перечитывают снимок одновременно
+        self.refresh_lock = threading.Lock()
+        # Токен запуска в ETag: после перезапуска сервера версии не совпадут со старыми
+        self.boot = uuid.uuid4().hex[:8]
+        self.version = 0
+        self.fingerprint = None
+        self.rows = []
+        self.event_ids = []
+        self.fields = set(self.BASE_FIELDS)
+        self._stop = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.poll_loop, name='alarm-snapshot', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def poll_loop(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Ошибка обновления снимка тревог: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def refresh(self, force=False):
+        """Перечитывает тревоги, если набор изменился. Возвращает текущую версию."""
+        with self.refresh_lock:
+            fingerprint = self.db_pool.fetch_one(
+                "SELECT COUNT(*) AS total, MAX(Event_id) AS max_id, CHECKSUM_AGG(BINARY_CHECKSUM(*)) AS checksum"
+                " FROM Temp WHERE StateEvent = 0"
+            )
+            fingerprint = tuple(fingerprint.values()) if fingerprint else None
+            if not force and self.version and fingerprint == self.fingerprint:
+                return self.version
+            rows = self.db_pool.fetchall("SELECT * FROM Temp WHERE StateEvent = 0 ORDER BY Event_id")
+            with self.lock:
+                self.fingerprint = fingerprint
+                self.rows = rows
+                self.event_ids = [row['Event_id'] for row in rows]
+                self.fields.update(key for row in rows[:1] for key in row)
+                self.version += 1
+                logger.debug(f"Снимок тревог обновлён: версия {self.version}, тревог {len(rows)}")
+                return self.version
+
+    def etag(self, version, query=''):
+        """ETag версии снимка для конкретной страницы (query — нормализованные after/limit/fields)."""
+        page = hashlib.sha1(query.encode('utf-8')).hexdigest()[:12]
+        return f'"alarms-{self.boot}-{version}-{page}"'
+
+    def current(self):
+        """(version, строки, event_ids) — согласованные между собой."""
+        with self.lock:
+            return self.version, self.rows, self.event_ids
+
+
+jobs = JobRegistry()
+latency = LatencyStats()
+alarm_snapshot = AlarmSnapshot(db_pool, poll_interval=float(config.get('API', 'alarms_poll_seconds', fallback='2')))
+
+
+def on_call_status(action_id, status, call_info):
+    """Статус звонка от CallManager -> состояние задания."""
+    if status in ('ANSWERED', 'ACKNOWLEDGED'):
+        # Звонок ещё идёт: окончательный статус придёт с Hangup
+        jobs.update_by_action(action_id, call_status=status, **{status.lower(): True})
+    else:
+        jobs.update_by_action(action_id, status='completed', call_status=status)
+
+
+call_manager = CallManager(config, callback=on_call_status)
+
 app = FastAPI(title="SMENA API", description="API для управления тревогами, вызовами, SMS и отчетностью")
 
 # Разрешенные клиенты (например, только локальная сеть)
 ALLOWED_CLIENTS = ["192.168.1.100", "192.168.1.101", "192.168.1.102"]  # Укажите IP-адреса операторов
 API_KEY = "secure-api-key"  # API-ключ для авторизации
 
+
+async def run_in(executor, fn, *args):
+    """Выполняет блокирующую функцию в пуле потоков, не занимая цикл событий."""
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+@app.middleware("http")
+async def track_latency(request: Request, call_next):
+    started = time.monotonic()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # Шаблон пути (/alarms/{alarm_id}/acknowledge), а не конкретный URL
+        route = request.scope.get('route')
+        endpoint = f"{request.method} {route.path if route is not None else request.url.path}"
+        latency.record(endpoint, time.monotonic() - started, status_code)
+
+
+@app.on_event("startup")
+async def startup():
+    alarm_snapshot.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    alarm_snapshot.stop()
+    sms_dispatcher.shutdown(wait=False)
+    call_manager.stop()
+    for executor in (db_executor, call_executor, file_executor):
+        executor.shutdown(wait=False)
+    db_pool.disconnect()
+
+
 # Проверка API-ключа
-def verify_api_key(api_key: str = Header(...)):
+async def verify_api_key(api_key: str = Header(...)):
     if api_key != API_KEY:
         raise HTTPException(status_code=403, detail="Неверный API-ключ")
 
+
 @app.get("/settings/{category}", dependencies=[Depends(verify_api_key)])
-def get_settings(category: str):
+async def get_settings(category: str):
     """Получение настроек по категории."""
     if category in config:
         return dict(config[category])
     raise HTTPException(status_code=404, detail="Категория не найдена")
 
+
+def write_config():
+    with open(config_path, 'w', encoding='utf-8') as configfile:
+        config.write(configfile)
+
+
 @app.post("/settings/{category}", dependencies=[Depends(verify_api_key)])
-def update_settings(category: str, update: BaseModel):
+async def update_settings(category: str, update: BaseModel):
     """Обновление настроек."""
     if category in config:
         config[category][update.key] = update.value
-        with open(config_path, 'w', encoding='utf-8') as configfile:
-            config.write(configfile)
+        await run_in(file_executor, write_config)
         return {"status": "success", "message": "Настройки обновлены"}
     raise HTTPException(status_code=404, detail="Категория не найдена")
 
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or any(tag.removeprefix('W/') == etag for tag in candidates)
+
+
 @app.get("/alarms", dependencies=[Depends(verify_api_key)])
-def get_alarms():
-    """Получение списка тревог."""
-    query = "SELECT * FROM Temp WHERE StateEvent = 0"
-    alarms = db_connector.fetchall(query)
-    return alarms
+async def get_alarms(
+    response: Response,
+    after: Optional[int] = Query(None, description="Курсор: тревоги с Event_id больше указанного"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Размер страницы (без него — все тревоги)"),
+    fields: Optional[str] = Query(None, description="Столбцы через запятую, например Event_id,Panel_id,Code"),
+    if_none_match: Optional[str] = Header(None)
+):
+    """
+    Получение списка тревог из снимка (см. AlarmSnapshot).
+
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor (в том числе в ответе 304).
+    Если снимок не изменился с версии из If-None-Match, а after/limit/fields те же, ответ — 304 без тела.
+    """
+    version, rows, event_ids = alarm_snapshot.current()
+    if not version:
+        # Поток опроса ещё не успел прочитать тревоги
+        await run_in(db_executor, alarm_snapshot.refresh)
+        version, rows, event_ids = alarm_snapshot.current()
+
+    projection = []
+    if fields:
+        projection = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown = [field for field in projection if field not in alarm_snapshot.fields]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Неизвестные поля: {', '.join(unknown)}")
+
+    # Разные страницы и проекции одной версии снимка — разные представления со своими ETag
+    query = f"after={'' if after is None else after}&limit={'' if limit is None else limit}&fields={','.join(projection)}"
+    etag = alarm_snapshot.etag(version, query)
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    start = bisect.bisect_right(event_ids, after) if after is not None else 0
+    end = len(rows) if limit is None else min(len(rows), start + limit)
+    if end < len(rows):
+        headers['X-Next-Cursor'] = str(event_ids[end - 1])
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    page = rows[start:end]
+    if projection:
+        page = [{field: row.get(field) for field in projection} for row in page]
+    response.headers.update(headers)
+    return page
+
 
 @app.post("/alarms/{alarm_id}/acknowledge", dependencies=[Depends(verify_api_key)])
-def acknowledge_alarm(alarm_id: int):
+async def acknowledge_alarm(alarm_id: int):
     """Подтверждение тревоги."""
     query = "UPDATE Temp SET StateEvent = 1 WHERE Event_id = %s"
-    db_connector.execute(query, (alarm_id,))
-    db_connector.commit()
+    await run_in(db_executor, db_pool.execute, query, (alarm_id,))
+    # Подтверждённая тревога сразу пропадает из снимка, не дожидаясь очередного опроса
+    await run_in(db_executor, alarm_snapshot.refresh, True)
     return {"status": "success", "message": "Тревога подтверждена"}
 
-@app.post("/call/{phone_number}", dependencies=[Depends(verify_api_key)])
-def initiate_call(phone_number: str, file_name: str):
-    """Инициирование звонка."""
-    action_id = call_manager.make_call(phone_number, file_name)
+
+def run_call_job(job_id, phone_number, file_name):
+    jobs.update(job_id, status='running')
+    try:
+        action_id = call_manager.make_call(phone_number, file_name)
+    except Exception as e:
+        logger.error(f"Ошибка при выполнении вызова на {phone_number}: {e}")
+        jobs.update(job_id, status='failed', detail=str(e))
+        return
     if action_id:
-        return {"status": "success", "action_id": action_id}
-    raise HTTPException(status_code=500, detail="Ошибка при выполнении вызова")
-
-@app.post("/sms/{phone_number}", dependencies=[Depends(verify_api_key)])
-def send_sms(phone_number: str, message: str):
-    """Отправка SMS."""
-    success = send_http_sms(
-        phone_number, message, 
-        config['SMS']['url'], 
-        config['SMS']['login'], 
-        config['SMS']['password'], 
-        config['SMS']['shortcode']
+        # Окончательный статус звонка придёт от CallManager (on_call_status)
+        jobs.update(job_id, status='running', action_id=action_id)
+    else:
+        jobs.update(job_id, status='failed', detail="Ошибка при выполнении вызова")
+
+
+@app.post("/call/{phone_number}", status_code=202, dependencies=[Depends(verify_api_key)])
+async def initiate_call(phone_number: str, file_name: str):
+    """Инициирование звонка (в фоне). Состояние — GET /jobs/{job_id}."""
+    job_id = jobs.create('call', phone_number=phone_number)
+    call_executor.submit(run_call_job, job_id, phone_number, file_name)
+    return {"status": "accepted", "job_id": job_id}
+
+
+def on_sms_done(handle):
+    result = handle.result()
+    jobs.update(
+        handle.context,
+        status='completed' if result.ok else 'failed',
+        detail=result.detail,
+        attempts=handle.attempts
     )
-    if success:
-        return {"status": "success", "message": "SMS отправлено"}
-    raise HTTPException(status_code=500, detail="Ошибка при отправке SMS")
+
+
+@app.post("/sms/{phone_number}", status_code=202, dependencies=[Depends(verify_api_key)])
+async def send_sms(phone_number: str, message: str):
+    """Отправка SMS (в фоне, через диспетчер SMS). Состояние — GET /jobs/{job_id}."""
+    job_id = jobs.create('sms', phone_number=phone_number)
+    sms_dispatcher.submit(phone_number, message, context=job_id, callback=on_sms_done)
+    return {"status": "accepted", "job_id": job_id}
+
+
+@app.get("/jobs/{job_id}", dependencies=[Depends(verify_api_key)])
+async def get_job(job_id: str):
+    """Состояние фонового задания (SMS или звонок)."""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задание не найдено")
+    return job
+
+
+def read_log_tail(log_file, lines):
+    with open(log_file, "r", encoding="utf-8") as f:
+        return list(deque(f, maxlen=lines))
+
 
 @app.get("/logs", dependencies=[Depends(verify_api_key)])
-def get_logs():
+async def get_logs():
     """Получение логов системы."""
     log_file = "logs/smena.log"
     if os.path.exists(log_file):
-        with open(log_file, "r", encoding="utf-8") as f:
-            logs = f.readlines()
-        return {"logs": logs[-50:]}
+        logs = await run_in(file_executor, read_log_tail, log_file, 50)
+        return {"logs": logs}
     raise HTTPException(status_code=404, detail="Лог-файл не найден")
 
+
 @app.get("/reports", dependencies=[Depends(verify_api_key)])
-def get_reports():
+async def get_reports():
     """Получение списка отчетов."""
     reports_dir = "otcet"
     if not os.path.exists(reports_dir):
         return {"reports": []}
-    reports = os.listdir(reports_dir)
+    reports = await run_in(file_executor, os.listdir, reports_dir)
     return {"reports": reports}
 
+
+@app.get("/metrics", dependencies=[Depends(verify_api_key)])
+async def get_metrics():
+    """Задержки по эндпоинтам, статистика диспетчера SMS."""
+    return {"endpoints": latency.stats(), "sms": sms_dispatcher.stats()}
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8008)
@@ -1,7 +1,9 @@
 # db_connector.py
 
+import queue
 import pymssql
 import threading
+from contextlib import contextmanager
 from PyQt5.QtWidgets import QMessageBox
 import logging
 
@@ -155,3 +157,52 @@ class DBConnector:
             except pymssql.DatabaseError as e:
                 self.logger.error(f"Ошибка при выполнении rollback: {e}")
                 raise e
+
+
+class DBConnectorPool:
+    """
+    Пул соединений с базой данных для параллельных запросов (например, из API).
+
+    Каждое соединение — отдельный DBConnector со своей блокировкой; запрос занимает
+    одно соединение на время выполнения, поэтому запросы разных потоков не ждут
+    друг друга, пока в пуле есть свободные соединения.
+    """
+
+    def __init__(self, config, size=4):
+        """
+        :param config: Объект configparser.ConfigParser с настройками.
+        :param size: Количество соединений в пуле.
+        """
+        self.size = size
+        self.connectors = queue.Queue()
+        for _ in range(size):
+            self.connectors.put(DBConnector(config))
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Занимает соединение из пула на время блока with."""
+        connector = self.connectors.get(timeout=timeout)
+        try:
+            yield connector
+        finally:
+            self.connectors.put(connector)
+
+    def execute(self, sql, params=None, commit=True):
+        with self.connection() as connector:
+            return connector.execute(sql, params, commit)
+
+    def fetchall(self, sql, params=None):
+        with self.connection() as connector:
+            return connector.fetchall(sql, params)
+
+    def fetch_one(self, sql, params=None):
+        with self.connection() as connector:
+            return connector.fetch_one(sql, params)
+
+    def disconnect(self):
+        """Закрывает все соединения пула."""
+        while True:
+            try:
+                self.connectors.get_nowait().disconnect()
+            except queue.Empty:
+                break
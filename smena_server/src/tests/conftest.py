@@ -0,0 +1,128 @@
+# conftest.py
+import os
+import sys
+
+# Модули приложения импортируются от каталога src (ui.*, utils.*), как при запуске smena.py
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import itertools
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+
+import pytest
+
+
+class FakeCallManager:
+    """Звонки, которые инициировал EventProcessor: (номер, файл, panel_id)."""
+
+    def __init__(self):
+        self.calls = []
+        self.hangups = []
+        self.seq = itertools.count(1)
+
+    def make_call(self, phone_number, file_name, panel_id=None):
+        self.calls.append((phone_number, file_name, panel_id))
+        return f"originate-test-{next(self.seq):06d}"
+
+    def hangup(self, action_id):
+        self.hangups.append(action_id)
+
+
+class FakeSynthesizer:
+    """Учёт закреплений аудио вместо кэша: cache_key -> количество закреплений."""
+
+    def __init__(self):
+        self.pins = Counter()
+
+    def synthesize(self, object_id, template_vars, template, backend=None):
+        key = f"audio-{object_id}"
+        self.pins[key] += 1
+        return {'mp3': f"/tmp/{key}.mp3", 'cache_key': key}
+
+    def release(self, cache_key):
+        if cache_key:
+            self.pins[cache_key] -= 1
+
+    def pin(self, file_name, action_id):
+        pass
+
+    def unpin(self, action_id):
+        pass
+
+
+class FakeDBConnector:
+    """Запоминает SQL-запросы; изменяющие запросы затрагивают одну строку."""
+
+    def __init__(self):
+        self.queries = []
+
+    def execute(self, sql, params=None, commit=True):
+        self.queries.append((' '.join(sql.split()), params))
+        return [] if sql.strip().upper().startswith('SELECT') else 1
+
+    def fetchall(self, sql, params=None):
+        return self.execute(sql, params)
+
+    def fetch_one(self, sql, params=None):
+        self.execute(sql, params)
+        return None
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def processor(tmp_path):
+    """
+    EventProcessor без Qt-окна, AMI, TTS и БД: реальные методы обработки поверх
+    подставных CallManager, синтезатора и DBConnector. Отчёты пишутся в tmp_path.
+    """
+    pytest.importorskip('PyQt5')
+    from ui.event_processor import EventProcessor
+    from ui.recipient_coordinator import RecipientCoordinator
+
+    processor = EventProcessor.__new__(EventProcessor)
+    processor.__dict__.update({
+        'config': None,
+        'parent': None,
+        'logger': logging.getLogger('event_processor'),
+        'report_dir': str(tmp_path),
+        'report_lock': threading.Lock(),
+        # Имя как у месячного отчёта: иначе write_to_report переключает файл
+        'report_file_path': str(tmp_path / (datetime.now().strftime('%Y.%m.01') + '.csv')),
+        'detailed_report_file_path': str(tmp_path / 'detailed_report.log'),
+        'lock': threading.Lock(),
+        'action_id_lock': threading.Lock(),
+        'action_id_to_call_info': {},
+        'active_events': {},
+        'active_incidents': {},
+        'event_incidents': {},
+        'event_responsibles': {},
+        'event_call_attempts': {},
+        'sms_notified': {},
+        'parallel_groups': {},
+        'retry_timers': {},
+        'recipients': RecipientCoordinator(),
+        'prefetched': {},
+        'prefetch_lock': threading.Lock(),
+        'journal': None,
+        'executor': None,
+        'test_mode': False,
+        'test_phone_number': '',
+        'require_ack': False,
+        'sms_policy': 'end',
+        'dial_mode': 'sequential',
+        'tts_template': '',
+        'tts_backend': None,
+        'call_delay_seconds': 0,
+        'call_manager': FakeCallManager(),
+        'synthesizer': FakeSynthesizer(),
+        'db_connector': FakeDBConnector(),
+    })
+    processor.initialize_report_file()
+    return processor
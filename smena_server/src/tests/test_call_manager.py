@@ -0,0 +1,110 @@
+# test_call_manager.py
+# CallManager против имитатора Asterisk (utils/ami_simulator.py): сценарий звонка
+# выбирается по последней цифре номера.
+import configparser
+import threading
+import time
+
+import pytest
+
+from ui.call_manager import CallManager
+from utils import ami_simulator
+
+
+class StatusRecorder:
+    """Статусы звонков из callback CallManager: action_id -> [статус, ...]."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.statuses = {}
+
+    def __call__(self, action_id, status, call_info):
+        with self.condition:
+            self.statuses.setdefault(action_id, []).append(status)
+            self.condition.notify_all()
+
+    def wait_for(self, action_id, status, timeout=10):
+        with self.condition:
+            self.condition.wait_for(lambda: status in self.statuses.get(action_id, []), timeout)
+            return list(self.statuses.get(action_id, []))
+
+
+@pytest.fixture
+def simulator():
+    server, httpd = ami_simulator.start()
+    yield server.getsockname()[1], httpd.server_address[1]
+    httpd.shutdown()
+    server.close()
+
+
+def make_manager(simulator, require_ack):
+    ami_port, http_port = simulator
+    config = configparser.ConfigParser()
+    config['Asterisk'] = {'host': '127.0.0.1', 'port': str(ami_port), 'user': 'smena', 'password': 'secret'}
+    config['AsteriskHTTP'] = {'host': '127.0.0.1', 'port': str(http_port), 'user': 'smena', 'password': 'secret'}
+    config['EventProcessing'] = {'require_ack': str(require_ack).lower()}
+    recorder = StatusRecorder()
+    manager = CallManager(config, callback=recorder)
+    manager.recorder = recorder
+    return manager
+
+
+@pytest.fixture
+def call_manager(simulator):
+    manager = make_manager(simulator, require_ack=True)
+    yield manager
+    manager.stop()
+
+
+@pytest.fixture
+def call_manager_without_ack(simulator):
+    manager = make_manager(simulator, require_ack=False)
+    yield manager
+    manager.stop()
+
+
+def test_answered_and_acknowledged(call_manager):
+    action_id = call_manager.make_call('79001234561', 'message')
+
+    statuses = call_manager.recorder.wait_for(action_id, 'HUNG_UP')
+
+    assert statuses == ['ANSWERED', 'ACKNOWLEDGED', 'HUNG_UP']
+    assert action_id not in call_manager.active_calls
+
+
+def test_answered_without_ack_is_hung_up(call_manager):
+    action_id = call_manager.make_call('79001234562', 'message')
+    assert call_manager.recorder.wait_for(action_id, 'ANSWERED') == ['ANSWERED']
+
+    # Так EventProcessor прерывает звонок по истечении срока подтверждения
+    started = time.monotonic()
+    call_manager.hangup(action_id)
+    statuses = call_manager.recorder.wait_for(action_id, 'HUNG_UP')
+
+    assert statuses == ['ANSWERED', 'HUNG_UP']
+    # Имитатор сам завершает такой звонок только через 5 сек
+    assert time.monotonic() - started < 4
+
+
+def test_busy(call_manager):
+    action_id = call_manager.make_call('79001234563', 'message')
+
+    assert call_manager.recorder.wait_for(action_id, 'FAILED') == ['FAILED']
+    assert action_id not in call_manager.active_calls
+
+
+def test_hangup_while_ringing(call_manager):
+    action_id = call_manager.make_call('79001234560', 'message')
+
+    call_manager.hangup(action_id)
+
+    assert call_manager.recorder.wait_for(action_id, 'HUNG_UP') == ['HUNG_UP']
+
+
+def test_answered_call_is_not_tracked_without_ack(call_manager_without_ack):
+    action_id = call_manager_without_ack.make_call('79001234561', 'message')
+
+    assert call_manager_without_ack.recorder.wait_for(action_id, 'ANSWERED') == ['ANSWERED']
+    # Без обязательного подтверждения ответ — финальный статус, звонок не копится в active_calls
+    assert action_id not in call_manager_without_ack.active_calls
+    assert action_id not in call_manager_without_ack.channels
@@ -0,0 +1,50 @@
+# test_event_coalescer.py
+# EventCoalescer: события одного объекта за окно объединения — один инцидент.
+from datetime import datetime, timedelta
+
+from ui.event_coalescer import EventCoalescer
+
+START = datetime(2026, 1, 1, 12, 0)
+
+
+def event(event_id, panel_id, code, minute=0):
+    return {'event_id': event_id, 'panel_id': panel_id, 'code': code, 'time_event': START + timedelta(minutes=minute)}
+
+
+def test_events_of_one_object_are_merged_after_window():
+    coalescer = EventCoalescer(window_seconds=30)
+    coalescer.add(event(2, 1, 'E130', minute=1), now=START)
+    coalescer.add(event(1, 1, 'E100'), now=START + timedelta(seconds=10))
+    coalescer.add(event(3, 1, 'E130', minute=2), now=START + timedelta(seconds=20))
+    coalescer.add(event(4, 2, 'E301'), now=START + timedelta(seconds=20))
+
+    assert coalescer.pop_ready(now=START + timedelta(seconds=29)) == []
+
+    [incident] = coalescer.pop_ready(now=START + timedelta(seconds=30))
+    # Основное событие — самое раннее; коды уникальны и в порядке появления
+    assert incident['event_id'] == 1
+    assert [e['event_id'] for e in incident['merged_events']] == [1, 2, 3]
+    assert incident['codes'] == ['E100', 'E130']
+    assert incident['code'] == 'E100, E130'
+    assert coalescer.pending_count() == 1
+
+
+def test_repeated_event_id_is_ignored():
+    coalescer = EventCoalescer()
+    coalescer.add(event(1, 1, 'E130'), now=START)
+    coalescer.add(event(1, 1, 'E130'), now=START)
+
+    [incident] = coalescer.pop_ready(now=START)
+
+    assert len(incident['merged_events']) == 1
+    assert coalescer.pending_count() == 0
+
+
+def test_window_starts_from_first_event():
+    coalescer = EventCoalescer(window_seconds=30)
+    coalescer.add(event(1, 1, 'E130'), now=START)
+    coalescer.add(event(2, 1, 'E130', minute=1), now=START + timedelta(seconds=25))
+
+    # Поздние события не продлевают окно: корзина выдаётся через 30 сек от первого
+    [incident] = coalescer.pop_ready(now=START + timedelta(seconds=30))
+    assert [e['event_id'] for e in incident['merged_events']] == [1, 2]
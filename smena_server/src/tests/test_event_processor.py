@@ -0,0 +1,104 @@
+# test_event_processor.py
+# Очереди оповещений на занятых номерах и жизненный цикл инцидента EventProcessor.
+import itertools
+import queue
+import threading
+from datetime import datetime
+
+
+def open_incident(processor, event_id, panel_id):
+    """Регистрирует инцидент так же, как begin_incident после claim_event."""
+    event = {
+        'event_id': event_id, 'panel_id': panel_id, 'code': 'E130',
+        'time_event': datetime(2026, 1, 1, 12, 0), 'address': f"Объект {panel_id}",
+        'company_name': 'ООО Тест', 'template_vars': {}
+    }
+    processor.active_incidents[panel_id] = event
+    processor.event_incidents[event_id] = [event_id]
+    return event
+
+
+def notify(processor, event, phone):
+    responsible = {'phone_number': phone, 'responsible_name': f"Ответственный {phone}"}
+    notification = processor.build_notification(
+        event['event_id'], f"audio-{event['panel_id']}", event['panel_id'], event, responsible
+    )
+    processor.start_call(notification)
+
+
+def action_for(processor, event_id):
+    with processor.action_id_lock:
+        return next(
+            action_id for action_id, info in processor.action_id_to_call_info.items()
+            if any(n['event_id'] == event_id for n in info['notifications'])
+        )
+
+
+def test_finished_event_is_not_dialled_from_number_queue(processor):
+    first = open_incident(processor, 101, 1)
+    second = open_incident(processor, 102, 2)
+    busy = open_incident(processor, 100, 3)
+
+    notify(processor, busy, '79000000001')      # номер занят звонком по другому объекту
+    notify(processor, first, '79000000002')
+    notify(processor, first, '79000000001')     # в очереди номера
+    notify(processor, second, '79000000001')    # в очереди номера
+    assert processor.recipients.stats()['queued_notifications'] == 2
+
+    # Первое событие подтверждено на другом номере — оно завершено и уходит из очереди
+    processor.handle_call_event(action_for(processor, 101), 'ACKNOWLEDGED', {})
+    assert 101 not in processor.event_incidents
+    assert processor.recipients.stats()['queued_notifications'] == 1
+
+    # Номер освободился: звонок только по второму, всё ещё открытому событию
+    processor.handle_call_event(action_for(processor, 100), 'ACKNOWLEDGED', {})
+
+    assert processor.call_manager.calls == [
+        ('79000000001', 'audio-3', 3),
+        ('79000000002', 'audio-1', 1),
+        ('79000000001', 'audio-2', 2),
+    ]
+
+
+def test_dial_skips_notifications_of_closed_events(processor):
+    live = open_incident(processor, 201, 1)
+    closed = open_incident(processor, 202, 2)
+    notify(processor, live, '79000000001')
+    notify(processor, closed, '79000000001')
+    queued = processor.recipients.release('79000000001')
+    processor.release_incident(2, 202)
+
+    processor.dial_recipient('79000000001', queued)
+    processor.recipients.release('79000000001')
+
+    assert [call[1] for call in processor.call_manager.calls] == ['audio-1']
+    assert not processor.recipients.is_busy('79000000001')
+
+
+def test_failed_submit_releases_scheduled_event(processor):
+    class ClosedExecutor:
+        def submit(self, key, fn, *args):
+            raise RuntimeError('executor is shut down')
+
+    processor.__dict__.update({
+        'processing_enabled': True,
+        'futures': set(),
+        'futures_lock': threading.Lock(),
+        'reserved_slots': 0,
+        'max_concurrent_events': 2,
+        'event_queue': queue.PriorityQueue(),
+        'queue_seq': itertools.count(),
+        'waiting_since': {},
+        'scheduled_event_ids': set(),
+        'executor': ClosedExecutor(),
+    })
+    event = {'event_id': 201, 'panel_id': 7, 'merged_events': [{'event_id': 201}, {'event_id': 202}]}
+    processor.scheduled_event_ids.update({201, 202})
+    processor.event_queue.put((0, next(processor.queue_seq), event))
+
+    processor.try_process_events()
+
+    # Слот освобождён, события снова доступны для постановки в очередь при следующем опросе
+    assert processor.reserved_slots == 0
+    assert not processor.futures
+    assert not processor.scheduled_event_ids
@@ -0,0 +1,87 @@
+# test_keyed_executor.py
+# KeyedExecutor: задачи одного ключа по одной и по порядку, разных ключей — параллельно.
+import threading
+import time
+
+import pytest
+
+from ui.keyed_executor import KeyedExecutor
+
+
+@pytest.fixture
+def executor():
+    executor = KeyedExecutor(max_workers=4)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def test_same_key_runs_in_order_one_at_a_time(executor):
+    order = []
+    running = []
+    overlaps = []
+
+    def task(n):
+        running.append(n)
+        if len(running) > 1:
+            overlaps.append(list(running))
+        time.sleep(0.01)
+        order.append(n)
+        running.remove(n)
+
+    futures = [executor.submit('panel-1', task, n) for n in range(10)]
+    for future in futures:
+        future.result(timeout=5)
+
+    assert order == list(range(10))
+    assert not overlaps
+    assert executor.pending_count() == 0
+    assert not executor.active_keys()
+
+
+def test_different_keys_run_in_parallel(executor):
+    barrier = threading.Barrier(2, timeout=5)
+
+    # Обе задачи ждут друг друга: если ключи выполнялись бы по очереди, барьер бы не сработал
+    first = executor.submit('panel-1', barrier.wait)
+    second = executor.submit('panel-2', barrier.wait)
+
+    first.result(timeout=5)
+    second.result(timeout=5)
+
+
+def test_failed_task_does_not_block_its_key(executor):
+    def fail():
+        raise ValueError('ошибка обработки')
+
+    failed = executor.submit('panel-1', fail)
+    following = executor.submit('panel-1', lambda: 'готово')
+
+    with pytest.raises(ValueError):
+        failed.result(timeout=5)
+    assert following.result(timeout=5) == 'готово'
+
+
+def test_shutdown_cancels_queued_tasks_and_rejects_new():
+    executor = KeyedExecutor(max_workers=1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    running = executor.submit('panel-1', block)
+    queued = executor.submit('panel-1', lambda: 'не выполнится')
+    started.wait(5)
+
+    executor.shutdown(wait=False)
+    release.set()
+    running.result(timeout=5)
+
+    # Очередь ключа разбирается после завершения текущей задачи: ожидавшая задача отменяется
+    deadline = time.monotonic() + 5
+    while not queued.done() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert queued.cancelled()
+    with pytest.raises(RuntimeError):
+        executor.submit('panel-2', lambda: None)
@@ -0,0 +1,99 @@
+# test_notification_journal.py
+# Журнал заданий обзвона: сохранение между запусками и возобновление цепочек.
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+from ui.notification_journal import NotificationJournal, JOB_DIALING, JOB_PENDING
+
+RESPONSIBLES = [
+    {'phone_number': '79000000001', 'responsible_name': 'Первый'},
+    {'phone_number': '79000000002', 'responsible_name': 'Второй'},
+    {'phone_number': '79000000003', 'responsible_name': 'Третий'},
+]
+
+
+def make_event(event_id, panel_id):
+    return {
+        'event_id': event_id, 'panel_id': panel_id, 'code': 'E130',
+        'time_event': datetime(2026, 1, 1, 12, 0), 'address': f"Объект {panel_id}",
+        'template_vars': {'object_id': panel_id}
+    }
+
+
+def open_journal(path):
+    return NotificationJournal(str(path), flush_interval=0.01)
+
+
+def test_jobs_survive_restart(tmp_path):
+    path = tmp_path / 'notifications.db'
+    journal = open_journal(path)
+    journal.start(make_event(1, 10), RESPONSIBLES)
+    journal.start(make_event(2, 20), RESPONSIBLES)
+    journal.start(make_event(3, 30), RESPONSIBLES)
+    journal.dialing([(1, 1)], wait=True)
+    journal.schedule(2, 2, 1234.5)
+    journal.complete(3)
+    journal.close()
+
+    journal = open_journal(path)
+    try:
+        jobs = {job['event_id']: job for job in journal.jobs()}
+    finally:
+        journal.close()
+    assert set(jobs) == {1, 2}
+    assert (jobs[1]['state'], jobs[1]['attempt']) == (JOB_DIALING, 1)
+    assert (jobs[2]['state'], jobs[2]['attempt'], jobs[2]['next_attempt_at']) == (JOB_PENDING, 2, 1234.5)
+    assert jobs[1]['event']['time_event'] == datetime(2026, 1, 1, 12, 0)
+    assert jobs[1]['responsibles'] == RESPONSIBLES
+
+
+def test_database_values_are_stored_as_strings(tmp_path):
+    journal = open_journal(tmp_path / 'notifications.db')
+    event = dict(make_event(1, 10), amount=Decimal('12.50'), day=date(2026, 1, 1), raw=b'\x01')
+    journal.start(event, RESPONSIBLES)
+    journal.close()
+
+    journal = open_journal(tmp_path / 'notifications.db')
+    try:
+        stored = journal.jobs()[0]['event']
+    finally:
+        journal.close()
+    assert stored['amount'] == '12.50'
+    assert stored['day'] == '2026-01-01'
+    assert stored['time_event'] == datetime(2026, 1, 1, 12, 0)
+
+
+def resume(processor, job):
+    scheduled = []
+    processor.schedule_next_attempt = lambda notification, delay=None: scheduled.append((notification, delay))
+    processor.resume_job(job)
+    return scheduled
+
+
+def test_resume_after_dialing_skips_the_unconfirmed_call(processor):
+    job = {
+        'event_id': 1, 'panel_id': 10, 'state': JOB_DIALING, 'attempt': 1, 'next_attempt_at': None,
+        'event': make_event(1, 10), 'responsibles': RESPONSIBLES, 'created_at': time.time()
+    }
+    [(notification, delay)] = resume(processor, job)
+
+    # Исход звонка второму ответственному неизвестен — следующим звонят третьему
+    assert delay == 0
+    assert processor.event_call_attempts[1] + 1 == 2
+    assert processor.active_incidents[10]['event_id'] == 1
+    assert processor.event_responsibles[1] == RESPONSIBLES
+    assert notification['file_name'] == 'audio-10'
+    assert processor.synthesizer.pins['audio-10'] == 1
+
+
+def test_resume_pending_keeps_attempt_and_remaining_delay(processor):
+    job = {
+        'event_id': 2, 'panel_id': 20, 'state': JOB_PENDING, 'attempt': 1,
+        'next_attempt_at': time.time() + 60, 'event': make_event(2, 20),
+        'responsibles': RESPONSIBLES, 'created_at': time.time()
+    }
+    [(_, delay)] = resume(processor, job)
+
+    assert processor.event_call_attempts[2] + 1 == 1
+    assert 0 < delay <= 60
@@ -0,0 +1,75 @@
+# test_recipient_coordinator.py
+from ui.recipient_coordinator import RecipientCoordinator
+
+
+def notification(event_id):
+    return {'event_id': event_id}
+
+
+def test_second_notification_waits_for_busy_number():
+    coordinator = RecipientCoordinator()
+
+    assert coordinator.acquire('79001234567', notification(1))
+    assert not coordinator.acquire('79001234567', notification(2))
+    assert coordinator.acquire('79007654321', notification(3))
+    assert coordinator.stats() == {'busy_numbers': 2, 'queued_notifications': 1}
+
+
+def test_release_returns_all_queued_for_merge():
+    coordinator = RecipientCoordinator()
+    coordinator.acquire('79001234567', notification(1))
+    coordinator.acquire('79001234567', notification(2))
+    coordinator.acquire('79001234567', notification(3))
+
+    queued = coordinator.release('79001234567')
+
+    assert [n['event_id'] for n in queued] == [2, 3]
+    # Номер остаётся занятым под объединённый звонок
+    assert coordinator.is_busy('79001234567')
+    assert coordinator.release('79001234567') == []
+    assert not coordinator.is_busy('79001234567')
+
+
+def test_requeue_puts_notifications_first():
+    coordinator = RecipientCoordinator()
+    coordinator.acquire('79001234567', notification(1))
+    coordinator.acquire('79001234567', notification(4))
+
+    coordinator.requeue('79001234567', [notification(2), notification(3)])
+
+    assert [n['event_id'] for n in coordinator.release('79001234567')] == [2, 3, 4]
+
+
+def test_drop_event_removes_from_all_numbers():
+    coordinator = RecipientCoordinator()
+    for phone in ('79001234567', '79007654321'):
+        coordinator.acquire(phone, notification(1))
+        coordinator.acquire(phone, notification(2))
+        coordinator.acquire(phone, notification(3))
+
+    assert coordinator.drop_event(2) == 2
+
+    assert [n['event_id'] for n in coordinator.release('79001234567')] == [3]
+    assert [n['event_id'] for n in coordinator.release('79007654321')] == [3]
+
+
+def test_release_skips_finished_events():
+    coordinator = RecipientCoordinator()
+    coordinator.acquire('79001234567', notification(1))
+    coordinator.acquire('79001234567', notification(2))
+    coordinator.acquire('79001234567', notification(3))
+    active = {3}
+
+    queued = coordinator.release('79001234567', is_active=lambda event_id: event_id in active)
+
+    assert [n['event_id'] for n in queued] == [3]
+
+
+def test_release_frees_number_when_all_queued_are_finished():
+    coordinator = RecipientCoordinator()
+    coordinator.acquire('79001234567', notification(1))
+    coordinator.acquire('79001234567', notification(2))
+
+    assert coordinator.release('79001234567', is_active=lambda event_id: False) == []
+    assert not coordinator.is_busy('79001234567')
+    assert coordinator.acquire('79001234567', notification(3))
@@ -0,0 +1,50 @@
+# test_severity_policy.py
+# Деградация каналов при перегрузке: по умолчанию выключена, low не опускается ниже SMS.
+import configparser
+from datetime import datetime, timedelta
+
+from ui.severity_policy import (
+    SeverityPolicy, SEVERITY_CRITICAL, SEVERITY_HIGH, SEVERITY_LOW,
+    CHANNEL_CALLS, CHANNEL_SMS, CHANNEL_REPORT
+)
+
+
+def make_policy(**options):
+    config = configparser.ConfigParser()
+    if options:
+        config['Severity'] = {key: str(value) for key, value in options.items()}
+    return SeverityPolicy(config)
+
+
+def test_shedding_is_disabled_without_section():
+    policy = make_policy()
+    now = datetime(2026, 1, 1, 12, 0)
+    assert not policy.shed_enabled
+    assert not policy.is_overloaded(10000, now - timedelta(hours=1), now=now)
+
+
+def test_zero_queue_depth_disables_shedding():
+    policy = make_policy(shed_queue_depth=0, shed_max_age_seconds=10)
+    now = datetime(2026, 1, 1, 12, 0)
+    assert not policy.is_overloaded(10000, now - timedelta(hours=1), now=now)
+
+
+def test_overload_by_depth_and_age():
+    policy = make_policy(shed_queue_depth=50, shed_max_age_seconds=300)
+    now = datetime(2026, 1, 1, 12, 0)
+    assert not policy.is_overloaded(50, now - timedelta(seconds=300), now=now)
+    assert policy.is_overloaded(51, None, now=now)
+    assert policy.is_overloaded(1, now - timedelta(seconds=301), now=now)
+
+
+def test_low_degrades_to_sms_unless_configured():
+    policy = make_policy(shed_queue_depth=50)
+    assert policy.degraded_channel(SEVERITY_CRITICAL) == CHANNEL_CALLS
+    assert policy.degraded_channel(SEVERITY_HIGH) == CHANNEL_SMS
+    assert policy.degraded_channel(SEVERITY_LOW) == CHANNEL_SMS
+
+    policy = make_policy(shed_queue_depth=50, low_degraded_channel='report')
+    assert policy.degraded_channel(SEVERITY_LOW) == CHANNEL_REPORT
+
+    policy = make_policy(shed_queue_depth=50, low_degraded_channel='nothing')
+    assert policy.degraded_channel(SEVERITY_LOW) == CHANNEL_SMS
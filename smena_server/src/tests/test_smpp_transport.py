@@ -0,0 +1,87 @@
+# test_smpp_transport.py
+# SMPPTransport против локальной заглушки SMSC (utils/smpp_stub.py).
+import socket
+import threading
+
+import pytest
+
+from ui.smpp_transport import SMPPTransport
+from utils import smpp_stub
+
+
+@pytest.fixture
+def smsc():
+    server = socket.create_server(('127.0.0.1', 0))
+    threading.Thread(target=smpp_stub.serve, args=(server,), daemon=True).start()
+    yield server.getsockname()[1]
+    server.close()
+
+
+@pytest.fixture
+def transport(smsc):
+    receipts = []
+    delivered = threading.Event()
+
+    def on_delivery(reference, stat):
+        receipts.append((reference, stat))
+        delivered.set()
+
+    transport = SMPPTransport(
+        '127.0.0.1', smsc, 'smena', 'secret', source_addr='SMENA',
+        window=4, submit_timeout=5.0, bind_timeout=5.0, on_delivery=on_delivery
+    )
+    transport.receipts = receipts
+    transport.delivered = delivered
+    yield transport
+    transport.close()
+
+
+def test_submit_and_delivery_receipt(transport):
+    reference = object()
+    result = transport.send('79001234567', 'Тревога на объекте 101', reference=reference)
+
+    assert result.ok
+    assert result.message_id
+    assert transport.delivered.wait(5)
+    assert transport.receipts == [(reference, 'DELIVRD')]
+    assert transport.references == {}
+
+
+def test_error_status_does_not_drop_session(transport):
+    permanent = transport.send('79001234569', 'Неверный номер')
+    throttled = transport.send('79001234568', 'Перегрузка SMSC')
+
+    assert not permanent.ok and not permanent.retryable
+    assert not throttled.ok and throttled.retryable
+    # Сессия не переподключалась: следующее сообщение уходит сразу
+    assert transport.bound.is_set()
+    assert transport.send('79001234567', 'После ошибки', reference='ref').ok
+    assert transport.delivered.wait(5)
+    assert transport.receipts == [('ref', 'DELIVRD')]
+
+
+def test_concurrent_sends_fill_window(transport):
+    results = []
+    threads = [
+        threading.Thread(target=lambda i=i: results.append(transport.send(f'7900000000{i % 8}', f'SMS {i}')))
+        for i in range(12)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert len(results) == 12
+    assert all(result.ok for result in results)
+
+
+def test_receipt_references_are_bounded(smsc):
+    transport = SMPPTransport('127.0.0.1', smsc, 'smena', 'secret', bind_timeout=5.0, max_receipts=2)
+    try:
+        for i in range(4):
+            assert transport.send('79001234567', f'SMS {i}', reference=i).ok
+        with transport.lock:
+            assert [reference for reference, _ in transport.references.values()][-2:] == [2, 3]
+            assert len(transport.references) <= 2
+    finally:
+        transport.close()
@@ -0,0 +1,115 @@
+# test_sms_dispatcher.py
+# SMSDispatcher: ограничение частоты, повторы с задержкой и остановка с незавершёнными SMS.
+import threading
+import time
+
+import pytest
+
+from ui.sms_dispatcher import SMSDispatcher, SMSResult
+
+
+class ScriptedTransport:
+    """Отвечает по сценарию для каждого номера: список SMSResult, последний повторяется."""
+
+    name = 'test'
+
+    def __init__(self, script=None):
+        self.script = script or {}
+        self.sent = []
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def send(self, phone_number, message, reference=None):
+        with self.lock:
+            self.sent.append((time.monotonic(), phone_number))
+            attempts = sum(1 for _, phone in self.sent if phone == phone_number)
+        results = self.script.get(phone_number) or [SMSResult(True, message_id='id')]
+        return results[min(attempts, len(results)) - 1]
+
+    def close(self):
+        self.closed = True
+
+
+def make_dispatcher(transport, **options):
+    options.setdefault('rate_per_second', 0)
+    options.setdefault('backoff_base', 0.01)
+    return SMSDispatcher(transport, workers=4, **options)
+
+
+def test_rate_limit_spreads_sends():
+    transport = ScriptedTransport()
+    dispatcher = make_dispatcher(transport, rate_per_second=20, burst=1)
+    started = time.monotonic()
+
+    handles = [dispatcher.submit(f"7900000000{n}", 'Тревога') for n in range(5)]
+    assert all(handle.result(timeout=5).ok for handle in handles)
+
+    # Первый токен есть сразу, остальные четыре — по одному в 50 мс
+    assert time.monotonic() - started >= 0.18
+    times = sorted(sent_at for sent_at, _ in transport.sent)
+    assert times[-1] - times[0] >= 0.18
+    dispatcher.shutdown()
+
+
+def test_retryable_errors_are_retried():
+    transport = ScriptedTransport({'79000000001': [
+        SMSResult(False, retryable=True, detail='503'),
+        SMSResult(False, retryable=True, detail='503'),
+        SMSResult(True, message_id='id'),
+    ]})
+    dispatcher = make_dispatcher(transport)
+
+    handle = dispatcher.submit('79000000001', 'Тревога')
+
+    assert handle.result(timeout=5).ok
+    assert handle.attempts == 3
+    assert dispatcher.stats()['retries'] == 2
+    dispatcher.shutdown()
+
+
+@pytest.mark.parametrize('result, attempts', [
+    (SMSResult(False, retryable=False, detail='ERROR'), 1),
+    (SMSResult(False, retryable=True, detail='503'), 3),
+])
+def test_failures_stop_after_limit(result, attempts):
+    transport = ScriptedTransport({'79000000001': [result]})
+    dispatcher = make_dispatcher(transport, max_retries=2)
+
+    handle = dispatcher.submit('79000000001', 'Тревога')
+
+    assert not handle.result(timeout=5).ok
+    assert handle.attempts == attempts
+    assert dispatcher.stats()['failed'] == 1
+    dispatcher.shutdown()
+
+
+def test_invalid_number_is_not_sent():
+    transport = ScriptedTransport()
+    dispatcher = make_dispatcher(transport)
+    done = []
+
+    handle = dispatcher.submit('12345', 'Тревога', callback=done.append)
+
+    assert not handle.result(timeout=5).ok
+    assert done == [handle]
+    assert not transport.sent
+    dispatcher.shutdown()
+
+
+def test_shutdown_completes_sms_waiting_for_retry():
+    transport = ScriptedTransport({'79000000001': [SMSResult(False, retryable=True, detail='503')]})
+    dispatcher = make_dispatcher(transport, backoff_base=60)
+    handle = dispatcher.submit('79000000001', 'Тревога')
+    deadline = time.monotonic() + 5
+    while not dispatcher.timers and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    dispatcher.shutdown(wait=True)
+
+    result = handle.result(timeout=1)
+    assert not result.ok and 'остановлен' in result.detail
+    assert handle.attempts == 1
+    assert transport.closed
+    assert dispatcher.stats()['pending'] == 0
+    # После остановки новые SMS сразу завершаются ошибкой
+    assert not dispatcher.submit('79000000002', 'Тревога').result(timeout=1).ok
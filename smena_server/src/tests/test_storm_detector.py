@@ -0,0 +1,47 @@
+# test_storm_detector.py
+# StormDetector: пороги по коду и пульту в скользящем окне.
+from datetime import datetime, timedelta
+
+from ui.storm_detector import StormDetector
+
+START = datetime(2026, 1, 1, 12, 0)
+
+
+def observe(detector, first_id, count, code='E301', pult_id=1, now=START):
+    for event_id in range(first_id, first_id + count):
+        detector.observe({'event_id': event_id, 'code': code, 'pult_id': pult_id}, now=now)
+
+
+def test_code_threshold_within_window():
+    detector = StormDetector(window_seconds=300, code_threshold=3, pult_threshold=0)
+    observe(detector, 1, 2)
+    assert detector.storm_key({'code': 'E301', 'pult_id': 1}, now=START) is None
+
+    observe(detector, 3, 1, now=START + timedelta(seconds=60))
+
+    assert detector.storm_key({'code': 'E301', 'pult_id': 1}, now=START + timedelta(seconds=60)) == ('code', 'E301')
+    assert detector.storm_key({'codes': ['E130', 'E301']}, now=START + timedelta(seconds=60)) == ('code', 'E301')
+    assert detector.storm_key({'code': 'E130', 'pult_id': 1}, now=START + timedelta(seconds=60)) is None
+
+
+def test_events_leave_the_window():
+    detector = StormDetector(window_seconds=300, code_threshold=3, pult_threshold=0)
+    observe(detector, 1, 2)
+    observe(detector, 3, 1, now=START + timedelta(seconds=200))
+    assert detector.active_storms(now=START + timedelta(seconds=300)) == {('code', 'E301'): 3}
+
+    # Первые два события вышли из окна
+    assert detector.active_storms(now=START + timedelta(seconds=301)) == {}
+    assert detector.storm_key({'code': 'E301'}, now=START + timedelta(seconds=301)) is None
+
+
+def test_pult_threshold_and_repeated_events():
+    detector = StormDetector(window_seconds=300, code_threshold=0, pult_threshold=4)
+    observe(detector, 1, 2, code='E301', pult_id=7)
+    observe(detector, 1, 2, code='E301', pult_id=7)      # повторные Event_id не учитываются
+    assert detector.active_storms(now=START) == {}
+
+    observe(detector, 3, 2, code='E302', pult_id=7)
+
+    assert detector.storm_key({'code': 'E130', 'pult_id': 7}, now=START) == ('pult', 7)
+    assert detector.active_storms(now=START) == {('pult', 7): 4}
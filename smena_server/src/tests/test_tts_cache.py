@@ -0,0 +1,116 @@
+# test_tts_cache.py
+# Кэш TTS: закрепления, вытеснение по лимитам и уборка устаревших записей.
+import os
+import time
+
+from ui.tts_cache import TTSCache
+
+
+def write_entry(cache, key, size=100):
+    name = f"{key}.mp3"
+    with open(os.path.join(cache.base_dir, name), 'wb') as f:
+        f.write(b'\0' * size)
+    cache.put(key, [name])
+    return name
+
+
+def exists(cache, name):
+    return os.path.exists(os.path.join(cache.base_dir, name))
+
+
+def test_eviction_skips_pinned_entries(tmp_path):
+    cache = TTSCache(str(tmp_path), max_files=2)
+    first = write_entry(cache, 'first')
+    cache.pin('first', 'originate-1')
+    cache.release('first')                      # put закрепляет запись до release
+    second = write_entry(cache, 'second')
+    cache.release('second')
+
+    third = write_entry(cache, 'third')
+
+    # Самая старая запись закреплена за звонком — вытесняется следующая по давности
+    assert exists(cache, first) and exists(cache, third)
+    assert not exists(cache, second)
+    assert set(cache.entries) == {'first', 'third'}
+
+    cache.unpin('originate-1')
+    cache.release('third')
+    write_entry(cache, 'fourth')
+    assert not exists(cache, first)
+    assert set(cache.entries) == {'third', 'fourth'}
+
+
+def test_eviction_by_size(tmp_path):
+    cache = TTSCache(str(tmp_path), max_bytes=250)
+    for key in ('a', 'b', 'c'):
+        write_entry(cache, key)
+        cache.release(key)
+
+    assert list(cache.entries) == ['b', 'c']
+    assert cache.total_bytes == 200
+
+
+def test_get_pins_until_release(tmp_path):
+    cache = TTSCache(str(tmp_path), max_files=1)
+    write_entry(cache, 'old')
+    cache.release('old')
+    assert cache.get('old') == ['old.mp3']
+
+    write_entry(cache, 'new')
+
+    # Обе записи закреплены: лимит временно превышен, файлы не удаляются
+    assert set(cache.entries) == {'old', 'new'}
+    cache.release('old')
+    assert set(cache.entries) == {'new'}
+
+
+def test_expire_drops_stale_entries_and_stale_pins(tmp_path):
+    cache = TTSCache(str(tmp_path), max_age_seconds=60, pin_timeout_seconds=30)
+    stale = write_entry(cache, 'stale')
+    cache.release('stale')
+    pinned = write_entry(cache, 'pinned')
+    cache.release('pinned')
+    cache.pin('pinned', 'originate-1')
+    now = time.time() + 120
+
+    cache.expire(now=now)
+
+    # Зависшее закрепление снято по таймауту, после чего устаревшая запись тоже удалена
+    assert not cache.owner_pins
+    assert not exists(cache, stale) and not exists(cache, pinned)
+    assert not cache.entries and cache.total_bytes == 0
+
+
+def test_expire_keeps_acquired_entries(tmp_path):
+    cache = TTSCache(str(tmp_path), max_age_seconds=60)
+    name = write_entry(cache, 'busy')
+
+    cache.expire(now=time.time() + 120)
+
+    assert exists(cache, name)
+    assert 'busy' in cache.entries
+
+
+def test_key_lock_survives_drop(tmp_path):
+    cache = TTSCache(str(tmp_path))
+    write_entry(cache, 'key')
+    cache.release('key')
+    lock = cache.key_lock('key')
+
+    with lock:
+        cache.discard('key')
+        # Другой поток, пришедший за тем же ключом, ждёт ту же блокировку
+        assert cache.key_lock('key') is lock
+
+
+def test_index_survives_restart(tmp_path):
+    cache = TTSCache(str(tmp_path))
+    write_entry(cache, 'kept')
+    write_entry(cache, 'lost')
+    cache.close()
+    os.remove(os.path.join(str(tmp_path), 'lost.mp3'))
+
+    cache = TTSCache(str(tmp_path))
+
+    assert list(cache.entries) == ['kept']
+    assert cache.total_bytes == 100
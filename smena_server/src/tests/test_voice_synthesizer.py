@@ -0,0 +1,63 @@
+# test_voice_synthesizer.py
+# Резервный синтез Silero в режиме auto при недоступном Yandex TTS.
+import threading
+import time
+
+from ui.tts_backends import BACKEND_AUTO
+from ui.tts_cache import TTSCache
+from ui.voice_synthesizer import VoiceSynthesizer
+
+
+class SlowLocalBackend:
+    """Silero без модели: считает синтезы и отдаёт тишину с задержкой."""
+
+    speaker = 'xenia'
+
+    def __init__(self):
+        self.calls = 0
+
+    def available(self):
+        return True
+
+    def synthesize_pcm(self, text, speed=1.0):
+        self.calls += 1
+        time.sleep(0.2)
+        return b'\0\0' * 800
+
+
+def make_synthesizer(tmp_path):
+    synthesizer = VoiceSynthesizer.__new__(VoiceSynthesizer)
+    synthesizer.__dict__.update({
+        'base_dir': str(tmp_path),
+        'audio_base_url': 'http://127.0.0.1:8000/',
+        'write_sln': False,
+        'cache': TTSCache(str(tmp_path)),
+        'local': SlowLocalBackend(),
+        'fallback_after': 0,
+    })
+    # Облако недоступно
+    synthesizer.fetch_pcm = lambda text, voice, emotion, speed: None
+    return synthesizer
+
+
+def test_concurrent_fallbacks_synthesize_once(tmp_path):
+    synthesizer = make_synthesizer(tmp_path)
+    results = []
+
+    def synthesize(cache_key):
+        results.append(synthesizer.synthesize_to_cache(
+            1, cache_key, 'Тревога на объекте 1', 'alena', 'neutral', 1.0, BACKEND_AUTO
+        ))
+
+    # Разные ключи облачного синтеза (например, разные форматы) — один и тот же ключ Silero
+    threads = [threading.Thread(target=synthesize, args=(key,)) for key in ('cloud-a', 'cloud-b')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    fallback_key = synthesizer.local_cache_key('Тревога на объекте 1', 1.0)
+    assert synthesizer.local.calls == 1
+    assert [urls['cache_key'] for urls in results] == [fallback_key, fallback_key]
+    # Каждый вызов закрепил запись: put у первого, get у второго
+    assert synthesizer.cache.refcounts[fallback_key] == 2
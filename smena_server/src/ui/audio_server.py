@@ -0,0 +1,282 @@
+# audio_server.py
+import os
+import time
+import logging
+import mimetypes
+import threading
+from collections import Counter
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import unquote, urlsplit
+
+logger = logging.getLogger('Syntez')
+
+AUDIO_CONTENT_TYPES = {
+    '.mp3': 'audio/mpeg',
+    '.ogg': 'audio/ogg',
+    '.wav': 'audio/wav',
+    '.sln': 'audio/x-raw',
+    '.sln16': 'audio/x-raw',
+    '.sln48': 'audio/x-raw',
+}
+
+
+class LiveAudio:
+    """
+    Файл, который ещё дописывается синтезом. Писатель сообщает о росте файла (grew)
+    и о завершении (finish); HTTP-обработчик ждёт новых данных (wait) и отдаёт их
+    клиенту по мере появления.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.condition = threading.Condition()
+        self.size = 0
+        self.done = False
+        self.failed = False
+
+    def grew(self, size):
+        with self.condition:
+            self.size = size
+            self.condition.notify_all()
+
+    def finish(self, failed=False):
+        with self.condition:
+            self.done = True
+            self.failed = failed
+            self.condition.notify_all()
+
+    def wait(self, offset, timeout):
+        """Ждёт, пока файл станет длиннее offset или запись завершится. Возвращает (size, done)."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.size > offset or self.done, timeout)
+            return self.size, self.done
+
+    def wait_done(self, timeout):
+        with self.condition:
+            self.condition.wait_for(lambda: self.done, timeout)
+            return self.done and not self.failed
+
+
+class AudioRequestHandler(BaseHTTPRequestHandler):
+    """
+    Отдача аудиофайлов из корня сервера: GET/HEAD, Range (один диапазон),
+    If-Modified-Since. Тело файла отправляется через socket.sendfile
+    (os.sendfile там, где он есть) без копирования через буферы Python.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'SmenaAudio/1.0'
+
+    def log_message(self, format, *args):
+        """Перенаправление журнала запросов в основной логгер."""
+        logger.info(f"(HTTPServer) {self.client_address[0]} - {format % args}")
+
+    def do_HEAD(self):
+        self.serve(head=True)
+
+    def do_GET(self):
+        self.serve(head=False)
+
+    def serve(self, head):
+        started = time.monotonic()
+        status, sent = HTTPStatus.INTERNAL_SERVER_ERROR, 0
+        try:
+            status, sent = self.send_file(head)
+        except (ConnectionError, TimeoutError) as e:
+            logger.debug(f"(HTTPServer) Клиент {self.client_address[0]} отключился: {e}")
+            self.close_connection = True
+        finally:
+            self.server.record(status, sent, time.monotonic() - started)
+
+    def resolve(self):
+        """Путь к файлу внутри корня сервера или None (выход за корень, каталоги)."""
+        name = unquote(urlsplit(self.path).path).lstrip('/')
+        path = os.path.realpath(os.path.join(self.server.root, name))
+        if os.path.dirname(path) != self.server.root:
+            return None, name
+        return path, name
+
+    def send_error_status(self, status):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+        return status, 0
+
+    def send_file(self, head):
+        path, name = self.resolve()
+        if path is None:
+            return self.send_error_status(HTTPStatus.NOT_FOUND)
+        live = self.server.live_source(name) if self.server.live_source is not None else None
+        if live is not None:
+            return self.send_live(live, head)
+        if not os.path.exists(path) and self.server.on_missing is not None:
+            self.server.on_missing(name)
+        try:
+            f = open(path, 'rb')
+        except OSError:
+            return self.send_error_status(HTTPStatus.NOT_FOUND)
+
+        with f:
+            stat = os.fstat(f.fileno())
+            size = stat.st_size
+            last_modified = formatdate(stat.st_mtime, usegmt=True)
+
+            if self.not_modified(stat.st_mtime):
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_header('Last-Modified', last_modified)
+                self.end_headers()
+                return HTTPStatus.NOT_MODIFIED, 0
+
+            byte_range = self.parse_range(size)
+            if byte_range is False:
+                self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE, 0
+
+            if byte_range is None:
+                status, offset, count = HTTPStatus.OK, 0, size
+            else:
+                start, end = byte_range
+                status, offset, count = HTTPStatus.PARTIAL_CONTENT, start, end - start + 1
+
+            ext = os.path.splitext(path)[1].lower()
+            content_type = AUDIO_CONTENT_TYPES.get(ext) or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(count))
+            self.send_header('Last-Modified', last_modified)
+            self.send_header('Accept-Ranges', 'bytes')
+            if status == HTTPStatus.PARTIAL_CONTENT:
+                self.send_header('Content-Range', f'bytes {offset}-{offset + count - 1}/{size}')
+            self.end_headers()
+            if head or not count:
+                return status, 0
+            sent = self.connection.sendfile(f, offset, count)
+            return status, sent
+
+    def send_live(self, live, head):
+        """
+        Отдаёт дописываемый файл по мере роста: chunked transfer для HTTP/1.1,
+        для HTTP/1.0 — без длины с закрытием соединения в конце. Если синтез
+        оборвался, соединение закрывается без завершающего фрагмента, чтобы клиент
+        увидел ошибку, а не укороченное сообщение.
+        """
+        chunked = self.request_version != 'HTTP/1.0'
+        ext = os.path.splitext(live.path)[1].lower()
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', AUDIO_CONTENT_TYPES.get(ext, 'application/octet-stream'))
+        self.send_header('Cache-Control', 'no-store')
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+        else:
+            self.close_connection = True
+        self.end_headers()
+        if head:
+            return HTTPStatus.OK, 0
+
+        sent = 0
+        idle_since = time.monotonic()
+        with open(live.path, 'rb') as f:
+            while True:
+                size, done = live.wait(sent, timeout=1.0)
+                data = f.read(size - sent) if size > sent else b''
+                if data:
+                    if chunked:
+                        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b'\r\n')
+                    else:
+                        self.wfile.write(data)
+                    sent += len(data)
+                    idle_since = time.monotonic()
+                    continue
+                if done:
+                    break
+                if time.monotonic() - idle_since > self.server.live_stall_timeout:
+                    logger.error(f"(HTTPServer) Синтез {os.path.basename(live.path)} не продвигается, поток прерван.")
+                    self.close_connection = True
+                    return HTTPStatus.GATEWAY_TIMEOUT, sent
+        if live.failed:
+            self.close_connection = True
+            return HTTPStatus.BAD_GATEWAY, sent
+        if chunked:
+            self.wfile.write(b'0\r\n\r\n')
+        return HTTPStatus.OK, sent
+
+    def not_modified(self, mtime):
+        header = self.headers.get('If-Modified-Since')
+        if not header or self.headers.get('Range'):
+            return False
+        try:
+            since = parsedate_to_datetime(header)
+        except (TypeError, ValueError):
+            return False
+        return since is not None and int(mtime) <= since.timestamp()
+
+    def parse_range(self, size):
+        """
+        Разбор заголовка Range. Возвращает (start, end) включительно, None — отдать
+        файл целиком, False — диапазон невыполним. Поддерживается один диапазон.
+        """
+        header = self.headers.get('Range')
+        if not header or not header.startswith('bytes=') or ',' in header:
+            return None
+        start_str, _, end_str = header[len('bytes='):].strip().partition('-')
+        try:
+            if not start_str:
+                length = int(end_str)
+                if length <= 0:
+                    return False
+                return max(0, size - length), size - 1
+            start = int(start_str)
+            end = int(end_str) if end_str else size - 1
+        except ValueError:
+            return None
+        if start >= size or end < start:
+            return False
+        return start, min(end, size - 1)
+
+
+class AudioHTTPServer(ThreadingHTTPServer):
+    """
+    Многопоточный HTTP-сервер аудиофайлов с явным корнем (без os.chdir).
+
+    on_missing(имя_файла) вызывается, если запрошенного файла нет, — например,
+    чтобы создать производный формат по запросу. live_source(имя_файла) возвращает
+    LiveAudio, если файл ещё дописывается синтезом, — тогда он отдаётся потоком.
+    Ведёт метрики доступа (stats()).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, root, on_missing=None, live_source=None, live_stall_timeout=30.0):
+        self.root = os.path.realpath(root)
+        self.on_missing = on_missing
+        self.live_source = live_source
+        self.live_stall_timeout = live_stall_timeout
+        self.metrics_lock = threading.Lock()
+        self.status_counts = Counter()
+        self.bytes_sent = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        super().__init__(address, AudioRequestHandler)
+
+    def record(self, status, sent, elapsed):
+        with self.metrics_lock:
+            self.status_counts[int(status)] += 1
+            self.bytes_sent += sent
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+
+    def stats(self):
+        with self.metrics_lock:
+            requests_count = sum(self.status_counts.values())
+            return {
+                'requests': requests_count,
+                'statuses': dict(self.status_counts),
+                'bytes_sent': self.bytes_sent,
+                'avg_seconds': round(self.total_seconds / requests_count, 4) if requests_count else 0.0,
+                'max_seconds': round(self.max_seconds, 4),
+            }
@@ -0,0 +1,183 @@
+# audio_vocabulary.py
+import os
+import json
+import logging
+import threading
+
+from ui.event_codes_mapping import event_codes_mapping
+from ui.tts_cache import TTSCache
+from ui.tts_segments import (
+    split_template, join_pcm, silence, SEGMENT_STATIC, PCM_SAMPLE_RATE
+)
+from ui.utils import DIGIT_WORDS
+
+logger = logging.getLogger('audio_vocabulary')
+
+# Переменные шаблона, которые собираются из словаря без обращения к TTS
+ASSEMBLABLE_VARIABLES = ('object_id_digits', 'event_description')
+
+
+def normalize_phrase(text):
+    """Ключ фразы в словаре: без регистра, лишних пробелов и концевой пунктуации."""
+    return ' '.join(text.lower().split()).strip(' .,!?;:')
+
+
+class AudioVocabulary:
+    """
+    Словарь заранее синтезированных фраз в формате PCM.
+
+    Для каждого набора настроек голоса (голос, эмоция, скорость) в отдельной папке
+    хранятся: десять цифр, описания всех кодов событий из event_codes_mapping и
+    общие фразы (неизменные части шаблонов). Манифест manifest.json сопоставляет
+    нормализованную фразу с файлом.
+    """
+
+    def __init__(self, root_dir, fetch_pcm):
+        """
+        :param root_dir: Корневая папка словарей (по папке на настройки голоса).
+        :param fetch_pcm: Функция синтеза fetch_pcm(text, voice, emotion, speed) -> bytes | None.
+        """
+        self.root_dir = root_dir
+        self.fetch_pcm = fetch_pcm
+        self.lock = threading.Lock()
+        # voice_key -> {фраза: имя файла}
+        self.manifests = {}
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    @staticmethod
+    def voice_key(voice, emotion, speed):
+        return TTSCache.make_key('', voice, emotion, speed, f"vocabulary{PCM_SAMPLE_RATE}")[:16]
+
+    def voice_dir(self, voice_key):
+        return os.path.join(self.root_dir, voice_key)
+
+    def manifest(self, voice_key):
+        with self.lock:
+            manifest = self.manifests.get(voice_key)
+            if manifest is not None:
+                return manifest
+            path = os.path.join(self.voice_dir(voice_key), 'manifest.json')
+            manifest = {}
+            if os.path.exists(path):
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        manifest = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Не удалось прочитать манифест словаря {path}: {e}")
+            self.manifests[voice_key] = manifest
+            return manifest
+
+    def save_manifest(self, voice_key, manifest):
+        path = os.path.join(self.voice_dir(voice_key), 'manifest.json')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def default_phrases(templates=()):
+        """Цифры, описания кодов событий и неизменные части переданных шаблонов."""
+        phrases = list(DIGIT_WORDS.values()) + list(event_codes_mapping.values())
+        for template in templates:
+            if not template:
+                continue
+            phrases.extend(value for kind, value in split_template(template) if kind == SEGMENT_STATIC)
+        return phrases
+
+    def build(self, voice, emotion, speed, phrases):
+        """
+        Досинтезирует недостающие фразы для настроек голоса.
+        Возвращает количество синтезированных фраз.
+        """
+        voice_key = self.voice_key(voice, emotion, speed)
+        os.makedirs(self.voice_dir(voice_key), exist_ok=True)
+        manifest = dict(self.manifest(voice_key))
+        built = 0
+        for phrase in phrases:
+            key = normalize_phrase(phrase)
+            if not key or key in manifest:
+                continue
+            pcm = self.fetch_pcm(phrase, voice, emotion, speed)
+            if pcm is None:
+                logger.warning(f"Словарь: не удалось синтезировать фразу «{phrase}».")
+                continue
+            filename = TTSCache.make_key(key, voice, emotion, speed, 'lpcm')[:24] + '.pcm'
+            with open(os.path.join(self.voice_dir(voice_key), filename), 'wb') as f:
+                f.write(pcm)
+            manifest[key] = filename
+            built += 1
+        if built:
+            self.save_manifest(voice_key, manifest)
+            with self.lock:
+                self.manifests[voice_key] = manifest
+        logger.info(f"Словарь {voice_key}: синтезировано {built} фраз, всего {len(manifest)}.")
+        return built
+
+    def phrase_pcm(self, voice_key, phrase):
+        """PCM фразы из словаря или None, если фразы нет."""
+        filename = self.manifest(voice_key).get(normalize_phrase(phrase))
+        if not filename:
+            return None
+        try:
+            with open(os.path.join(self.voice_dir(voice_key), filename), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+
+class MessageAssembler:
+    """
+    Сборка сообщения из словаря без обращения к TTS.
+
+    Шаблон собирается, только если все его неизменные части есть в словаре,
+    а переменные — из числа ASSEMBLABLE_VARIABLES (номер объекта цифрами и
+    описание события). Иначе assemble возвращает None.
+    """
+
+    def __init__(self, vocabulary, word_gap_ms=120, segment_gap_ms=250):
+        self.vocabulary = vocabulary
+        self.word_gap_ms = word_gap_ms
+        self.segment_gap_ms = segment_gap_ms
+
+    def can_assemble(self, template):
+        return all(
+            kind == SEGMENT_STATIC or value in ASSEMBLABLE_VARIABLES
+            for kind, value in split_template(template)
+        )
+
+    def variable_phrases(self, name, template_variables):
+        """Фразы словаря, из которых произносится значение переменной."""
+        if name == 'object_id_digits':
+            digits = str(template_variables.get('object_id', ''))
+            return [DIGIT_WORDS[d] for d in digits if d in DIGIT_WORDS]
+        if name == 'event_description':
+            # Описание объединённого инцидента — описания кодов через запятую; сами
+            # описания тоже могут содержать запятые, поэтому приоритет у кодов события
+            codes = [c.strip() for c in str(template_variables.get('event_code', '')).split(',') if c.strip()]
+            if codes and all(code in event_codes_mapping for code in codes):
+                return [event_codes_mapping[code] for code in codes]
+            return [d.strip() for d in str(template_variables.get('event_description', '')).split(',') if d.strip()]
+        return None
+
+    def assemble(self, template, template_variables, voice, emotion, speed):
+        """Возвращает PCM собранного сообщения или None, если собрать из словаря нельзя."""
+        if not self.can_assemble(template):
+            return None
+        voice_key = self.vocabulary.voice_key(voice, emotion, speed)
+        segments = []
+        for kind, value in split_template(template):
+            phrases = [value] if kind == SEGMENT_STATIC else self.variable_phrases(value, template_variables)
+            if kind == SEGMENT_STATIC and not normalize_phrase(value):
+                continue
+            words = []
+            for phrase in phrases or []:
+                pcm = self.vocabulary.phrase_pcm(voice_key, phrase)
+                if pcm is None:
+                    return None
+                words.append(pcm)
+            if words:
+                segments.append(join_pcm(words, self.word_gap_ms))
+        if not segments:
+            return None
+        lead = silence(self.segment_gap_ms)
+        return lead + join_pcm(segments, self.segment_gap_ms) + lead
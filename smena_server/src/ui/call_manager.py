@@ -2,10 +2,11 @@
 import os
 import logging
 import time
+import itertools
 import threading
 import requests
 from requests.auth import HTTPDigestAuth
-from asterisk.ami import AMIClient
+from asterisk.ami import AMIClient, SimpleAction
 from datetime import datetime
 
 # Создадим логгер call_manager
@@ -36,6 +37,15 @@ class CallManager:
     2. Инициирует звонок (make_call) через HTTP (ARawman), возвращает ActionID.
     3. Слушает события AMI (_on_ami_event) и сопоставляет их с ActionID.
     4. При получении финального статуса звонка вызывает callback(action_id, status, call_info).
+    5. Прерывает звонок по ActionID (hangup) через AMI Hangup.
+    6. Передаёт подтверждение звонка (DTMF в диалплане -> UserEvent/VarSet SMENA_ACK)
+       как статус ACKNOWLEDGED, а завершение принятого звонка (Hangup) — как HUNG_UP.
+
+    Диалплан подтверждает приём, например:
+      same => n,Read(ACK_DIGIT,,1,,1,10)
+      same => n,GotoIf($["${ACK_DIGIT}" = "1"]?ack)
+      same => n(ack),UserEvent(SMENA_ACK,SmenaActionID: ${SMENA_ACTION_ID},Digit: ${ACK_DIGIT})
+    (или Set(SMENA_ACK=${ACK_DIGIT}) на канале звонка — тогда звонок находится по каналу).
     """
 
     def __init__(self, config, callback):
@@ -59,8 +69,20 @@ class CallManager:
         self.http_password = config['AsteriskHTTP'].get('password', 'password')
         self.base_url = f"http://{self.http_host}:{self.http_port}/asterisk/arawman"
 
+        # Принятый звонок отслеживается до подтверждения или Hangup только при обязательном
+        # подтверждении: иначе по ANSWERED он сразу завершён и удаляется из active_calls
+        self.require_ack = config.getboolean('EventProcessing', 'require_ack', fallback=False)
+
         # Активные звонки: action_id -> {'phone_number':..., 'panel_id':..., ...}
         self.active_calls = {}
+        # action_id -> канал звонка (из VarSet SMENA_ACTION_ID или OriginateResponse)
+        self.channels = {}
+        # ActionID звонков, которые нужно прервать, как только станет известен канал
+        self.hangup_requested = set()
+        self.channels_lock = threading.Lock()
+        # Порядковый номер в ActionID (фиксированной ширины, чтобы один ActionID не был
+        # подстрокой другого): параллельные звонки в одну миллисекунду различаются
+        self.call_seq = itertools.count(1)
 
         # Подключение к AMI
         self._stop = threading.Event()
@@ -86,20 +108,79 @@ class CallManager:
         name = event.name
         data = event.keys
 
-        if name == 'OriginateResponse' and 'ActionID' in data:
+        if name == 'VarSet' and data.get('Variable') == 'SMENA_ACTION_ID':
+            self.remember_channel(data.get('Value'), data.get('Channel'))
+
+        elif name == 'VarSet' and data.get('Variable') == 'SMENA_ACK' and data.get('Value'):
+            self.fire_acknowledged(self.action_for_channel(data.get('Channel')))
+
+        elif name == 'UserEvent' and data.get('UserEvent') == 'SMENA_ACK':
+            self.fire_acknowledged(data.get('SmenaActionID') or self.action_for_channel(data.get('Channel')))
+
+        elif name == 'OriginateResponse' and 'ActionID' in data:
             action_id = data.get('ActionID')
+            self.remember_channel(action_id, data.get('Channel'))
             if action_id in self.active_calls:
                 response = data.get('Response', '')
                 reason = data.get('Reason', '')
                 final_status = self.map_originate_response(response, reason)
-                self.fire_callback_if_final(action_id, final_status)
+                # Принятый звонок ещё идёт: при обязательном подтверждении он отслеживается до ACK или Hangup
+                self.fire_callback_if_final(action_id, final_status, keep=self.require_ack and final_status == 'ANSWERED')
 
         elif name == 'DialEnd' and 'DialStatus' in data:
             # Можем дополнительно обрабатывать, если нужно
             pass
         elif name == 'Hangup' and 'Cause' in data:
-            # Аналогично, если нужно
-            pass
+            action_id = self.action_for_channel(data.get('Channel'))
+            if action_id in self.active_calls:
+                self.fire_callback_if_final(action_id, 'HUNG_UP')
+
+    def remember_channel(self, action_id, channel):
+        """Запоминает канал звонка; если звонок уже просили прервать — прерывает."""
+        if not action_id or not channel or action_id not in self.active_calls:
+            return
+        with self.channels_lock:
+            if action_id in self.channels:
+                return
+            self.channels[action_id] = channel
+            pending_hangup = action_id in self.hangup_requested
+            self.hangup_requested.discard(action_id)
+        if pending_hangup:
+            self.send_hangup(action_id, channel)
+
+    def action_for_channel(self, channel):
+        if not channel:
+            return None
+        with self.channels_lock:
+            return next((a for a, c in self.channels.items() if c == channel), None)
+
+    def fire_acknowledged(self, action_id):
+        """Абонент подтвердил приём сообщения (звонок продолжает отслеживаться до Hangup)."""
+        if action_id not in self.active_calls:
+            return
+        logger.info(f"[ack] action_id={action_id}: приём подтверждён.")
+        self.callback(action_id, 'ACKNOWLEDGED', self.active_calls.get(action_id, {}))
+
+    def hangup(self, action_id):
+        """
+        Прерывает звонок. Если канал ещё неизвестен (вызов только начался),
+        звонок будет прерван при первом событии с его каналом.
+        """
+        with self.channels_lock:
+            channel = self.channels.get(action_id)
+            if channel is None:
+                if action_id in self.active_calls:
+                    self.hangup_requested.add(action_id)
+                    logger.info(f"[hangup] action_id={action_id}: канал ещё неизвестен, звонок будет прерван позже.")
+                return
+        self.send_hangup(action_id, channel)
+
+    def send_hangup(self, action_id, channel):
+        logger.info(f"[hangup] action_id={action_id}, канал {channel}")
+        try:
+            self.client.send_action(SimpleAction('Hangup', Channel=channel))
+        except Exception as e:
+            logger.error(f"Не удалось прервать звонок {action_id} ({channel}): {e}")
 
     def map_originate_response(self, response, reason):
         """
@@ -121,22 +202,28 @@ class CallManager:
                 return 'NO ANSWER'
         return None
 
-    def fire_callback_if_final(self, action_id, final_status):
+    def fire_callback_if_final(self, action_id, final_status, keep=False):
         """
         Если final_status не None, вызываем self.callback(action_id, final_status, call_info)
-        и удаляем звонок из self.active_calls.
+        и удаляем звонок из self.active_calls (keep=True — звонок продолжает отслеживаться).
         """
         if final_status is not None:
             call_info = self.active_calls.get(action_id, {})
             self.callback(action_id, final_status, call_info)
+            if keep:
+                return
             self.active_calls.pop(action_id, None)
+            with self.channels_lock:
+                self.channels.pop(action_id, None)
+                self.hangup_requested.discard(action_id)
 
     def make_call(self, phone_number, file_name, panel_id=None):
         """
         Инициирует звонок через HTTP-запрос. Возвращает action_id.
         """
-        action_id = f"originate-{int(time.time() * 1000)}"
-        variables = {"phone_number": phone_number, "vfile": file_name}
+        action_id = f"originate-{int(time.time() * 1000)}-{next(self.call_seq):06d}"
+        # SMENA_ACTION_ID: по событию VarSet становится известен канал звонка (для hangup)
+        variables = {"phone_number": phone_number, "vfile": file_name, "SMENA_ACTION_ID": action_id}
         if panel_id:
             variables["panel_id"] = panel_id
 
@@ -153,6 +240,13 @@ class CallManager:
         }
 
         logger.info(f"[make_call] action_id={action_id}, параметры: {params}")
+        # Регистрируется до запроса: события AMI по звонку могут прийти раньше ответа HTTP
+        self.active_calls[action_id] = {
+            'phone_number': phone_number,
+            'panel_id': panel_id,
+            'file_name': file_name,
+            'start_time': datetime.now()
+        }
         try:
             r = requests.get(
                 self.base_url,
@@ -167,12 +261,6 @@ class CallManager:
         except Exception as e:
             logger.error(f"Исключение в make_call: {e}")
 
-        self.active_calls[action_id] = {
-            'phone_number': phone_number,
-            'panel_id': panel_id,
-            'file_name': file_name,
-            'start_time': datetime.now()
-        }
         return action_id
 
     def stop(self):
@@ -0,0 +1,73 @@
+# event_coalescer.py
+import threading
+from datetime import datetime, timedelta
+
+from ui.event_codes_mapping import event_codes_mapping
+
+
+class EventCoalescer:
+    """
+    Объединяет открытые события одного объекта (panel_id) в одно оповещение.
+
+    События копятся в «корзине» объекта в течение окна объединения, отсчитываемого
+    от первого события. По истечении окна корзина выдаётся одним инцидентом:
+    словарём основного (самого раннего) события, в котором
+      - 'merged_events' — все объединённые события (исходные словари),
+      - 'codes'         — уникальные коды в порядке появления,
+      - 'code'          — коды через запятую (для шаблонов TTS/SMS и отчёта).
+    """
+
+    def __init__(self, window_seconds=0):
+        """
+        :param window_seconds: Окно объединения в секундах. 0 — объединяются только
+                               события, найденные за один опрос БД.
+        """
+        self.window = timedelta(seconds=window_seconds)
+        self.lock = threading.Lock()
+        # panel_id -> {'first_seen': datetime, 'events': {event_id: event}}
+        self.buckets = {}
+
+    def add(self, event, now=None):
+        """Добавляет событие в корзину его объекта. Повторное добавление того же Event_id игнорируется."""
+        now = now or datetime.now()
+        panel_id = event.get('panel_id')
+        with self.lock:
+            bucket = self.buckets.setdefault(panel_id, {'first_seen': now, 'events': {}})
+            bucket['events'].setdefault(event.get('event_id'), event)
+
+    def pop_ready(self, now=None):
+        """Возвращает список инцидентов, у которых истекло окно объединения."""
+        now = now or datetime.now()
+        ready = []
+        with self.lock:
+            for panel_id in list(self.buckets):
+                bucket = self.buckets[panel_id]
+                if now - bucket['first_seen'] >= self.window:
+                    del self.buckets[panel_id]
+                    ready.append(self.merge(list(bucket['events'].values())))
+        return ready
+
+    def pending_count(self):
+        """Количество событий, ожидающих истечения окна."""
+        with self.lock:
+            return sum(len(b['events']) for b in self.buckets.values())
+
+    @staticmethod
+    def merge(events):
+        """Собирает инцидент из списка событий одного объекта."""
+        events = sorted(events, key=lambda e: (e.get('time_event') or datetime.min, e.get('event_id') or 0))
+        incident = dict(events[0])
+        codes = []
+        for event in events:
+            code = event.get('code')
+            if code and code not in codes:
+                codes.append(code)
+        incident['merged_events'] = events
+        incident['codes'] = codes
+        incident['code'] = ', '.join(codes)
+        return incident
+
+    @staticmethod
+    def describe_codes(codes):
+        """Человекочитаемое описание кодов для голосового сообщения."""
+        return ', '.join(event_codes_mapping.get(code, code) for code in codes)
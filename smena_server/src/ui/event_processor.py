@@ -6,15 +6,26 @@ import time
 import socket
 import queue
 import logging
+import itertools
 import threading
+from collections import Counter
 from datetime import datetime, timedelta
 from concurrent.futures import ThreadPoolExecutor
 
 from PyQt5.QtCore import QObject, pyqtSignal
 from ui.voice_synthesizer import VoiceSynthesizer
 from ui.call_manager import CallManager
-from ui.sms_manager import send_http_sms
-from ui.utils import number_to_spelled_digits
+from ui.keyed_executor import KeyedExecutor
+from ui.event_coalescer import EventCoalescer
+from ui.recipient_coordinator import RecipientCoordinator
+from ui.storm_detector import StormDetector
+from ui.prerender import PrerenderJob
+from ui.notification_journal import NotificationJournal, JOB_DIALING
+from ui.severity_policy import (
+    SeverityPolicy, SEVERITY_CRITICAL, SEVERITY_RANK, CHANNEL_CALLS, CHANNEL_SMS
+)
+from ui.sms_dispatcher import SMSDispatcher, HTTPSMSTransport
+from ui.utils import number_to_spelled_digits, chunked
 from db_connector import DBConnector
 
 
@@ -60,8 +71,48 @@ class EventProcessor(QObject):
             folder_id=self.config['YandexCloud']['folder_id'],
             http_host=self.config['HTTPServer']['host'],
             http_port=int(self.config['HTTPServer']['port']),
-            audio_base_url=self.config['HTTPServer']['base_url']
+            audio_base_url=self.config['HTTPServer']['base_url'],
+            cache_max_bytes=int(self.config.get('TTSCache', 'max_mb', fallback='200')) * 1024 * 1024,
+            cache_options={
+                'max_files': int(self.config.get('TTSCache', 'max_files', fallback='5000')),
+                'max_age_seconds': int(self.config.get('TTSCache', 'max_age_hours', fallback='168')) * 3600,
+                'pin_timeout_seconds': int(self.config.get('TTSCache', 'pin_timeout_seconds', fallback='3600')),
+                'janitor_interval_seconds': int(self.config.get('TTSCache', 'janitor_interval_seconds', fallback='60')),
+                'orphan_age_seconds': int(self.config.get('TTSCache', 'orphan_age_seconds', fallback='3600'))
+            },
+            segmented=self.config.getboolean('YandexCloud', 'segmented_synthesis', fallback=False),
+            segment_gap_ms=int(self.config.get('YandexCloud', 'segment_gap_ms', fallback='60')),
+            vocabulary=self.config.getboolean('Vocabulary', 'enabled', fallback=False),
+            write_sln=self.config.getboolean('Audio', 'write_sln', fallback=False),
+            client_options={
+                'pool_size': int(self.config.get('TTSClient', 'pool_size', fallback='8')),
+                'max_concurrency': int(self.config.get('TTSClient', 'max_concurrency', fallback='4')),
+                'connect_timeout': float(self.config.get('TTSClient', 'connect_timeout', fallback='3.05')),
+                'read_timeout': float(self.config.get('TTSClient', 'read_timeout', fallback='15')),
+                'max_retries': int(self.config.get('TTSClient', 'max_retries', fallback='3')),
+                'hedge': self.config.getboolean('TTSClient', 'hedge', fallback=False)
+            },
+            backend=self.config.get('TTS', 'backend', fallback='yandex'),
+            silero_options={
+                'model_id': self.config.get('Silero', 'model', fallback='v4_ru'),
+                'speaker': self.config.get('Silero', 'speaker', fallback='xenia'),
+                'pool_size': int(self.config.get('Silero', 'pool_size', fallback='1')),
+                'threads_per_model': int(self.config.get('Silero', 'threads_per_model', fallback='2'))
+            } if self.config.getboolean('Silero', 'enabled', fallback=False) else None,
+            fallback_after=float(self.config.get('TTS', 'fallback_after_seconds', fallback='0')),
+            streaming=self.config.getboolean('Audio', 'streaming', fallback=False)
         )
+        if self.synthesizer.vocabulary:
+            threading.Thread(target=self.build_vocabulary, daemon=True).start()
+
+        # Ночной пакетный синтез сообщений по справочнику объектов
+        self.prerender_job = None
+        if self.config.getboolean('Prerender', 'enabled', fallback=False):
+            self.prerender_job = PrerenderJob(
+                self.config, self.db_connector, self.synthesizer, self.build_template_vars,
+                self.tts_template, self.tts_backend, self.event_codes
+            )
+            self.prerender_job.start()
         self.call_manager = CallManager(config=self.config, callback=self.handle_call_event)
 
         # Настройки SMS
@@ -69,29 +120,117 @@ class EventProcessor(QObject):
         self.sms_login = self.config['SMS']['login']
         self.sms_password = self.config['SMS']['password']
         self.sms_shortcode = self.config['SMS']['shortcode']
+        # Отправка SMS не блокирует рабочие потоки: диспетчер с пулом соединений,
+        # ограничением частоты и повторами
+        sms_transport = self.create_sms_transport()
+        sms_workers = int(self.config.get('SMS', 'workers', fallback='4'))
+        if sms_transport.name == 'smpp':
+            # Рабочий поток диспетчера ждёт submit_sm_resp своего SMS: чтобы окно SMPP
+            # заполнялось, потоков должно быть не меньше размера окна
+            sms_workers = max(sms_workers, sms_transport.window_size)
+        self.sms_dispatcher = SMSDispatcher(
+            sms_transport,
+            workers=sms_workers,
+            rate_per_second=float(self.config.get('SMS', 'rate_per_second', fallback='5')),
+            burst=int(self.config.get('SMS', 'burst', fallback='10')),
+            max_retries=int(self.config.get('SMS', 'max_retries', fallback='3'))
+        )
 
-        # Очередь и пул потоков
-        self.event_queue = queue.Queue()
+        # Очередь и пул потоков.
+        # Очередь приоритетная: (ранг важности, порядковый номер, событие) — критические события
+        # выбираются первыми. События одного объекта (panel_id) выполняются строго по одному
+        # и по порядку, события разных объектов распределяются по всем рабочим потокам.
+        self.event_queue = queue.PriorityQueue()
+        self.queue_seq = itertools.count()
         self.max_concurrent_events = int(self.config.get('EventProcessing', 'max_concurrent_events', fallback='5'))
-        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrent_events)
+        self.executor = KeyedExecutor(max_workers=self.max_concurrent_events)
         self.futures = set()
+        # Слоты, занятые под lock, но ещё не получившие future (см. try_process_events)
+        self.reserved_slots = 0
+        self.futures_lock = threading.Lock()
+        # Event_id, уже поставленные в очередь или пул и ещё не обработанные
+        # (защита от повторной постановки при опросе БД)
+        self.scheduled_event_ids = set()
+        # Event_id основного события -> время постановки в очередь (для ожидающих в очереди)
+        self.waiting_since = {}
         self.processing_enabled = False
 
+        # Классы важности, бюджеты времени и деградация каналов при перегрузке
+        self.severity = SeverityPolicy(self.config)
+        self.shed_counts = Counter()
+
         # Отслеживание времени последней обработки объектов
         self.active_events = {}
         self.lock = threading.Lock()
 
+        # Объединение открытых событий одного объекта в одно оповещение.
+        # active_incidents: panel_id -> инцидент, по которому идёт обзвон;
+        # event_incidents: Event_id основного события -> список Event_id всех объединённых событий.
+        self.coalesce_window_seconds = int(self.config.get('EventProcessing', 'coalesce_window_seconds', fallback='0'))
+        self.coalescer = EventCoalescer(self.coalesce_window_seconds)
+        self.active_incidents = {}
+        self.event_incidents = {}
+
         # Привязка ActionID -> call_info уже выполнена выше через action_id_to_call_info
 
         # Список ответственных и индекс текущей попытки
         self.event_responsibles = {}
         self.event_call_attempts = {}
 
+        # Не более одного звонка одновременно на номер; оповещения для занятого номера объединяются
+        self.recipients = RecipientCoordinator()
+        # Event_id -> threading.Timer запланированного звонка следующему ответственному
+        self.retry_timers = {}
+        # Event_id -> номера, на которые по событию уже отправлено SMS (защита от повторов)
+        self.sms_notified = {}
+        # Event_id -> группа параллельных звонков: {'pending', 'timers'}
+        self.parallel_groups = {}
+
+        # Массовые события: при превышении порога по коду/пульту события с «лёгкими»
+        # кодами обрабатываются пакетно рассылкой SMS вместо обзвона. Включается явно
+        # ([Storm] enabled = true): по умолчанию все события идут на обзвон, как раньше
+        self.storm_enabled = self.config.getboolean('Storm', 'enabled', fallback=False)
+        self.storm_detector = StormDetector(
+            window_seconds=int(self.config.get('Storm', 'window_seconds', fallback='300')),
+            code_threshold=int(self.config.get('Storm', 'code_threshold', fallback='50')),
+            pult_threshold=int(self.config.get('Storm', 'pult_threshold', fallback='100'))
+        )
+        self.storm_sms_codes = [
+            code.strip() for code in
+            self.config.get('Storm', 'sms_codes', fallback='E305,$AT,E301,E302,$YM').split(',') if code.strip()
+        ]
+        self.storm_sms_template = self.config.get(
+            'Storm', 'sms_text',
+            fallback='Массовое событие: {event_description}. Объекты: {objects}'
+        )
+        self.active_storm_keys = set()
+
+        # Упреждающий синтез: аудио начинает синтезироваться при постановке события в очередь,
+        # параллельно с ожиданием рабочего потока и записью в БД. Event_id -> Future
+        self.prefetch_executor = None
+        if self.config.getboolean('Prefetch', 'enabled', fallback=True):
+            self.prefetch_executor = ThreadPoolExecutor(
+                max_workers=int(self.config.get('Prefetch', 'workers', fallback='2'))
+            )
+        self.prefetched = {}
+        self.prefetch_lock = threading.Lock()
+
         self.call_delay_seconds = int(self.config.get('EventProcessing', 'call_delay_seconds', fallback='180'))
 
-        # Настраиваем пути к логам AMI
         self.logs_dir = os.path.join(script_dir, 'logs')
         os.makedirs(self.logs_dir, exist_ok=True)
+
+        # Журнал заданий обзвона (SQLite WAL): после перезапуска цепочки продолжаются
+        # с места остановки без повторных звонков. Файл лежит рядом с логами, а не в коде
+        self.journal = None
+        if self.config.getboolean('Journal', 'enabled', fallback=True):
+            self.journal = NotificationJournal(
+                self.config.get('Journal', 'path', fallback=os.path.join(self.logs_dir, 'notifications.db')),
+                flush_interval=int(self.config.get('Journal', 'flush_interval_ms', fallback='200')) / 1000.0,
+                batch_size=int(self.config.get('Journal', 'batch_size', fallback='100'))
+            )
+
+        # Настраиваем пути к логам AMI
         self.ami_log_path = self.config.get('Log', 'ami_log_path', fallback=os.path.join(self.logs_dir, 'ami_log.log'))
         self.status_ami_log_path = os.path.join(self.logs_dir, '_status_ami_log.log')
 
@@ -116,9 +255,39 @@ class EventProcessor(QObject):
         self.test_phone_number = self.config.get('Testing', 'test_phone_number', fallback='')
         self.sms_template = self.config.get('Message', 'sms_text', fallback='')
         self.tts_template = self.config.get('Message', 'tts_text', fallback='')
+        self.tts_multi_template = self.config.get(
+            'Message', 'tts_multi_text',
+            fallback='Внимание! Тревога на {object_count} объектах. {messages}'
+        )
+        # Движок синтеза для каждого шаблона (yandex / silero / auto); пусто — из [TTS] backend
+        self.tts_backend = self.config.get('Message', 'tts_text_backend', fallback='') or None
+        self.tts_multi_backend = self.config.get('Message', 'tts_multi_text_backend', fallback='') or None
         self.use_ssml = self.config.getboolean('Message', 'use_ssml', fallback=False)
         self.call_timeout = int(self.config.get('EventProcessing', 'call_timeout', fallback='60'))
         self.max_call_attempts = int(self.config.get('EventProcessing', 'max_call_attempts', fallback='3'))
+        # Когда отправляются SMS по событию с обзвоном:
+        # end — первому ответственному после всех звонков (как раньше);
+        # start — всем ответственным сразу при начале обзвона;
+        # first_failure — всем ответственным после первого неуспешного звонка.
+        self.sms_policy = self.config.get('SMS', 'policy', fallback='end').strip().lower()
+        if self.sms_policy not in ('end', 'start', 'first_failure'):
+            self.logger.warning(f"Неизвестная политика SMS '{self.sms_policy}', используется end.")
+            self.sms_policy = 'end'
+        # Режим обзвона: sequential — ответственные по одному; parallel — сразу первые
+        # parallel_count (со сдвигом parallel_stagger_seconds), выигрывает первый ответивший.
+        # parallel применяется к классам важности из parallel_severities (пусто — ко всем).
+        self.dial_mode = self.config.get('EventProcessing', 'dial_mode', fallback='sequential').strip().lower()
+        self.parallel_count = max(1, int(self.config.get('EventProcessing', 'parallel_count', fallback='2')))
+        self.parallel_stagger_seconds = float(self.config.get('EventProcessing', 'parallel_stagger_seconds', fallback='0'))
+        self.parallel_severities = {
+            s.strip() for s in
+            self.config.get('EventProcessing', 'parallel_severities', fallback=SEVERITY_CRITICAL).split(',') if s.strip()
+        }
+        # Подтверждение приёма: принятый звонок считается успешным только после DTMF-подтверждения
+        # (SMENA_ACK из диалплана). Без подтверждения за ack_timeout_seconds или при разрыве
+        # сразу звоним следующему ответственному.
+        self.require_ack = self.config.getboolean('EventProcessing', 'require_ack', fallback=False)
+        self.ack_timeout_seconds = int(self.config.get('EventProcessing', 'ack_timeout_seconds', fallback='120'))
         self.write_detailed_report("Параметры конфигурации загружены.")
 
     def load_event_codes_from_config(self):
@@ -156,6 +325,17 @@ class EventProcessor(QObject):
                 writer.writerow(data)
         self.write_detailed_report(f"Запись в отчёт: {data}")
 
+    def build_vocabulary(self):
+        """Фоновая досинтезация словаря цифр, кодов событий и общих фраз."""
+        phrases = [p.strip() for p in self.config.get('Vocabulary', 'phrases', fallback='').split('|') if p.strip()]
+        try:
+            built = self.synthesizer.build_vocabulary(templates=[self.tts_template], phrases=phrases)
+        except Exception as e:
+            self.logger.error(f"Ошибка построения словаря аудиофраз: {e}")
+            self.write_detailed_report(f"Ошибка построения словаря аудиофраз: {e}")
+            return
+        self.write_detailed_report(f"Словарь аудиофраз готов, досинтезировано фраз: {built}.")
+
     def start_processing(self):
         if not self.processing_enabled:
             self.processing_enabled = True
@@ -163,6 +343,10 @@ class EventProcessor(QObject):
             self.write_detailed_report("Обработка событий запущена.")
             self.processing_started.emit()
 
+            # После stop_processing пул остановлен — создаём новый
+            if self.executor is None:
+                self.executor = KeyedExecutor(max_workers=self.max_concurrent_events)
+
             self.processing_thread = threading.Thread(
                 target=self.event_processing_loop,
                 daemon=True
@@ -171,6 +355,9 @@ class EventProcessor(QObject):
 
             # Запуск парсера AMI лога
             self.start_ami_log_parser()
+
+            # Незавершённые цепочки обзвона из журнала
+            self.resume_jobs()
         else:
             self.logger.info("Обработка событий уже запущена.")
             self.write_detailed_report("Попытка запуска: обработка событий уже запущена.")
@@ -248,8 +435,20 @@ class EventProcessor(QObject):
             self.logger.info("Обработка событий остановлена.")
             self.write_detailed_report("Обработка событий остановлена.")
             self.processing_stopped.emit()
+            with self.lock:
+                timers = list(self.retry_timers.values())
+                self.retry_timers.clear()
+            for timer in timers:
+                timer.cancel()
+            with self.prefetch_lock:
+                prefetched_ids = list(self.prefetched)
+            self.cancel_prefetch(prefetched_ids)
             self.executor.shutdown(wait=True)
-            self.futures.clear()
+            self.executor = None
+            with self.futures_lock:
+                self.futures.clear()
+                self.scheduled_event_ids.clear()
+                self.waiting_since.clear()
             with self.event_queue.mutex:
                 self.event_queue.queue.clear()
             self.logger.debug("Все рабочие потоки остановлены.")
@@ -262,10 +461,28 @@ class EventProcessor(QObject):
         return self.processing_enabled
 
     def enqueue_event(self, event):
-        self.event_queue.put(event)
+        merged = self.incident_events(event)
+        with self.futures_lock:
+            new_events = [e for e in merged if e.get('event_id') not in self.scheduled_event_ids]
+            if not new_events:
+                self.logger.debug(f"Событие {event.get('event_id')} уже поставлено в обработку. Пропускаем.")
+                return
+            self.scheduled_event_ids.update(e.get('event_id') for e in new_events)
+        if len(new_events) < len(merged):
+            event = EventCoalescer.merge(new_events)
+
+        # Класс важности и крайний срок обработки считаются от момента постановки в очередь
+        received_at = event.setdefault('received_at', datetime.now())
+        severity = self.severity.classify(event.get('codes') or event.get('code'))
+        event['severity'] = severity
+        event['deadline'] = self.severity.deadline(severity, received_at)
+        with self.futures_lock:
+            self.waiting_since[event.get('event_id')] = received_at
+        self.event_queue.put((SEVERITY_RANK[severity], next(self.queue_seq), event))
+        self.prefetch_audio(event)
         if 'event_id' in event:
-            self.logger.debug(f"Событие {event['event_id']} добавлено в очередь.")
-            self.write_detailed_report(f"Событие {event['event_id']} добавлено в очередь.")
+            self.logger.debug(f"Событие {event['event_id']} ({severity}) добавлено в очередь.")
+            self.write_detailed_report(f"Событие {event['event_id']} ({severity}) добавлено в очередь.")
 
     def event_processing_loop(self):
         self.logger.debug("Начало цикла обработки событий.")
@@ -275,10 +492,39 @@ class EventProcessor(QObject):
             self.write_detailed_report("Загрузка событий из базы данных.")
             events = self.load_events_from_database()
             for event in events:
+                self.coalescer.add(event)
+                if self.storm_enabled:
+                    self.storm_detector.observe(event)
+            self.log_storm_changes()
+            self.check_claimed_events()
+            storm_batches = {}
+            for incident in self.coalescer.pop_ready():
                 if not self.processing_enabled:
                     break
-                self.enqueue_event(event)
+                if len(incident['merged_events']) > 1:
+                    self.write_detailed_report(
+                        f"Объект {incident['panel_id']}: объединено {len(incident['merged_events'])} событий ({incident['code']})."
+                    )
+                storm_key = self.storm_key_for(incident)
+                if storm_key is not None:
+                    storm_batches.setdefault(storm_key, []).append(incident)
+                    continue
+                self.enqueue_event(incident)
                 self.try_process_events()
+            for storm_key, incidents in storm_batches.items():
+                self.submit_storm_batch(storm_key, incidents)
+            shed_stats = self.get_shed_stats()
+            if shed_stats['shed']:
+                self.write_detailed_report(f"Сброс нагрузки: {shed_stats}")
+            tts_stats = self.synthesizer.client.stats()
+            if tts_stats['requests']:
+                self.write_detailed_report(f"Запросы к TTS: {tts_stats}")
+            sms_stats = self.sms_dispatcher.stats()
+            if sms_stats['submitted']:
+                self.write_detailed_report(f"Диспетчер SMS: {sms_stats}")
+            http_stats = self.synthesizer.httpd.stats()
+            if http_stats['requests']:
+                self.write_detailed_report(f"HTTP-сервер аудио: {http_stats}")
             self.logger.debug(f"Цикл завершен. Ждем {self.repeat_interval.total_seconds()} сек.")
             self.write_detailed_report(f"Цикл завершен. Ждем {self.repeat_interval.total_seconds()} сек.")
             time.sleep(self.repeat_interval.total_seconds())
@@ -286,13 +532,313 @@ class EventProcessor(QObject):
         self.write_detailed_report("Цикл обработки событий завершен.")
 
     def try_process_events(self):
-        while self.processing_enabled and not self.event_queue.empty() and len(self.futures) < self.max_concurrent_events:
-            event = self.event_queue.get()
-            future = self.executor.submit(self.process_event, event)
+        # Вызывается и из цикла опроса, и из on_event_future_done в рабочих потоках:
+        # проверка лимита и занятие слота выполняются под одной блокировкой
+        while self.processing_enabled:
+            with self.futures_lock:
+                if len(self.futures) + self.reserved_slots >= self.max_concurrent_events:
+                    break
+                try:
+                    _, _, event = self.event_queue.get_nowait()
+                except queue.Empty:
+                    break
+                event_id = event.get('event_id')
+                self.waiting_since.pop(event_id, None)
+                self.reserved_slots += 1
+            event_ids = [e.get('event_id') for e in self.incident_events(event)]
+            try:
+                # Ключ — panel_id: события одного объекта не обрабатываются параллельно
+                future = self.executor.submit(event.get('panel_id'), self.process_event, event)
+            except Exception as e:
+                # Событие не ушло в работу: снимаем отметку, чтобы следующий опрос базы подхватил его снова
+                with self.futures_lock:
+                    self.reserved_slots -= 1
+                    self.scheduled_event_ids.difference_update(event_ids)
+                self.logger.error(f"Не удалось начать обработку события {event_id}: {e}")
+                self.write_detailed_report(f"Не удалось начать обработку события {event_id}: {e}")
+                break
+            with self.futures_lock:
+                self.reserved_slots -= 1
+                self.futures.add(future)
+            future.add_done_callback(lambda f, ids=event_ids: self.on_event_future_done(f, ids))
+            self.logger.debug(f"Обработка события {event_id} начата.")
+            self.write_detailed_report(f"Обработка события {event_id} начата.")
+
+    def on_event_future_done(self, future, event_ids):
+        with self.futures_lock:
+            self.futures.discard(future)
+            self.scheduled_event_ids.difference_update(event_ids)
+        # Освободился слот — берём следующее событие из очереди
+        self.try_process_events()
+
+    def backlog_depth(self):
+        """Глубина нагрузки: события в очереди плюс объекты, по которым ещё идёт обзвон."""
+        with self.lock:
+            active = len(self.active_incidents)
+        return self.event_queue.qsize() + active
+
+    def build_template_vars(self, event):
+        """Переменные шаблона голосового сообщения для инцидента."""
+        panel_id = event.get('panel_id')
+        codes = event.get('codes') or [event.get('code')]
+        return {
+            'object_id': panel_id,
+            'object_id_digits': number_to_spelled_digits(panel_id),
+            'event_time': event.get('time_event').strftime('%Y-%m-%d %H:%M:%S'),
+            'address': event.get('address'),
+            'event_code': event.get('code'),
+            'event_description': EventCoalescer.describe_codes(codes),
+            'event_count': len(self.incident_events(event)),
+            'company_name': event.get('company_name')
+        }
+
+    def prefetch_audio(self, event):
+        """
+        Запускает синтез аудио события, не дожидаясь рабочего потока. Результат забирает
+        handle_event_logic (take_prefetched); если событие завершилось другим путём,
+        упреждающий синтез отменяется (cancel_prefetch).
+        """
+        if self.prefetch_executor is None:
+            return
+        event_id = event.get('event_id')
+        # При перегрузке некритические события, скорее всего, уйдут в SMS или отчёт
+        if event.get('severity') != SEVERITY_CRITICAL:
+            with self.futures_lock:
+                oldest = min(self.waiting_since.values(), default=None)
+            if self.severity.is_overloaded(self.backlog_depth(), oldest):
+                return
+        try:
+            template_vars = self.build_template_vars(event)
+        except (AttributeError, TypeError) as e:
+            self.logger.error(f"Упреждающий синтез для события {event_id} невозможен: {e}")
+            return
+        with self.prefetch_lock:
+            if event_id in self.prefetched:
+                return
+            self.prefetched[event_id] = self.prefetch_executor.submit(
+                self.synthesizer.synthesize, event.get('panel_id'), template_vars, self.tts_template, self.tts_backend
+            )
+        self.logger.debug(f"Запущен упреждающий синтез для события {event_id}.")
+
+    def take_prefetched(self, event_id):
+        """Результат упреждающего синтеза (ждёт его завершения) или None."""
+        with self.prefetch_lock:
+            future = self.prefetched.pop(event_id, None)
+        if future is None or future.cancelled():
+            return None
+        try:
+            return future.result()
+        except Exception as e:
+            self.logger.error(f"Ошибка упреждающего синтеза для события {event_id}: {e}")
+            return None
+
+    def cancel_prefetch(self, event_ids):
+        """Отменяет упреждающий синтез событий; уже синтезированное аудио освобождается в кэше."""
+        with self.prefetch_lock:
+            futures = [self.prefetched.pop(event_id) for event_id in event_ids if event_id in self.prefetched]
+        for future in futures:
+            if not future.cancel():
+                future.add_done_callback(self.release_prefetched)
+
+    def release_prefetched(self, future):
+        try:
+            audio_files = future.result()
+        except Exception:
+            return
+        if audio_files:
+            self.synthesizer.release(audio_files.get('cache_key'))
+
+    def select_channel(self, event):
+        """
+        Канал оповещения для события с учётом перегрузки и оставшегося бюджета времени.
+        Критические события всегда идут на обзвон.
+        """
+        severity = event.get('severity') or self.severity.classify(event.get('codes') or event.get('code'))
+        if severity == SEVERITY_CRITICAL or not self.severity.shed_enabled:
+            return CHANNEL_CALLS
+        now = datetime.now()
+        deadline = event.get('deadline')
+        with self.futures_lock:
+            oldest = min(self.waiting_since.values(), default=None)
+        reason = None
+        if deadline is not None and now > deadline:
+            reason = 'истёк бюджет времени'
+        elif self.severity.is_overloaded(self.backlog_depth(), oldest, now):
+            reason = 'перегрузка'
+        if reason is None:
+            return CHANNEL_CALLS
+        channel = self.severity.degraded_channel(severity)
+        self.record_shed(event, severity, channel, reason)
+        return channel
+
+    def deadline_expired(self, event):
+        """Истёк ли бюджет времени события (для критических событий и без деградации — никогда)."""
+        deadline = event.get('deadline')
+        return (
+            self.severity.shed_enabled
+            and event.get('severity') != SEVERITY_CRITICAL
+            and deadline is not None
+            and datetime.now() > deadline
+        )
+
+    def record_shed(self, event, severity, channel, reason):
+        with self.lock:
+            self.shed_counts[(severity, channel)] += 1
+        self.logger.warning(f"Событие {event.get('event_id')} ({severity}): {reason}, канал понижен до '{channel}'.")
+        self.write_detailed_report(f"Событие {event.get('event_id')} ({severity}): {reason}, канал понижен до '{channel}'.")
+
+    def get_shed_stats(self):
+        """Счётчики сброса нагрузки и текущая глубина очереди."""
+        with self.lock:
+            shed = {f"{severity}:{channel}": count for (severity, channel), count in self.shed_counts.items()}
+        with self.futures_lock:
+            oldest = min(self.waiting_since.values(), default=None)
+        return {
+            'shed': shed,
+            'queue_depth': self.event_queue.qsize(),
+            'backlog_depth': self.backlog_depth(),
+            'oldest_wait_seconds': (datetime.now() - oldest).total_seconds() if oldest else 0.0
+        }
+
+    def storm_key_for(self, incident):
+        """Ключ шторма для инцидента, если его следует обработать пакетно, иначе None."""
+        if not self.storm_enabled:
+            return None
+        codes = incident.get('codes') or [incident.get('code')]
+        if not all(code in self.storm_sms_codes for code in codes):
+            # Серьёзные коды и во время шторма обрабатываются обычным обзвоном
+            return None
+        return self.storm_detector.storm_key(incident)
+
+    def log_storm_changes(self):
+        if not self.storm_enabled:
+            return
+        storms = self.storm_detector.active_storms()
+        for key in storms.keys() - self.active_storm_keys:
+            self.logger.warning(f"Обнаружено массовое событие {key}: {storms[key]} событий за окно.")
+            self.write_detailed_report(f"Обнаружено массовое событие {key}: {storms[key]} событий за окно.")
+        for key in self.active_storm_keys - storms.keys():
+            self.logger.info(f"Массовое событие {key} завершено.")
+            self.write_detailed_report(f"Массовое событие {key} завершено.")
+        self.active_storm_keys = set(storms.keys())
+
+    def submit_storm_batch(self, storm_key, incidents):
+        event_ids = [e.get('event_id') for incident in incidents for e in self.incident_events(incident)]
+        with self.futures_lock:
+            if any(event_id in self.scheduled_event_ids for event_id in event_ids):
+                incidents = [
+                    incident for incident in incidents
+                    if not any(e.get('event_id') in self.scheduled_event_ids for e in self.incident_events(incident))
+                ]
+                event_ids = [e.get('event_id') for incident in incidents for e in self.incident_events(incident)]
+            if not incidents:
+                return
+            self.scheduled_event_ids.update(event_ids)
+        future = self.executor.submit(('storm', storm_key), self.process_storm_batch, storm_key, incidents)
+        with self.futures_lock:
             self.futures.add(future)
-            future.add_done_callback(self.futures.discard)
-            self.logger.debug(f"Обработка события {event['event_id']} начата.")
-            self.write_detailed_report(f"Обработка события {event['event_id']} начата.")
+        future.add_done_callback(lambda f, ids=event_ids: self.on_event_future_done(f, ids))
+        self.logger.info(f"Массовое событие {storm_key}: {len(incidents)} объектов переданы на пакетную обработку.")
+        self.write_detailed_report(f"Массовое событие {storm_key}: {len(incidents)} объектов переданы на пакетную обработку.")
+
+    def process_storm_batch(self, storm_key, incidents):
+        """
+        Пакетная обработка массового события: без синтеза речи и обзвона.
+        Все события принимаются и архивируются пакетно, ответственным уходит по одному SMS
+        на номер (с перечнем всех его объектов), затем события пакетно завершаются.
+        """
+        if not self.processing_enabled:
+            return
+        claimed = []
+        for incident in incidents:
+            if self.attach_to_active_incident(incident):
+                continue
+            if self.claim_event(incident.get('panel_id')):
+                claimed.append(incident)
+        if not claimed:
+            return
+
+        # Один номер — одно SMS со списком всех его объектов
+        responsibles_by_panel = self.get_responsibles_bulk([incident.get('panel_id') for incident in claimed])
+        recipients = {}
+        for incident in claimed:
+            for responsible in responsibles_by_panel.get(incident.get('panel_id'), []):
+                phone_number = responsible.get('phone_number')
+                if not phone_number:
+                    continue
+                phone_to_sms = self.test_phone_number if self.test_mode else phone_number
+                entry = recipients.setdefault(phone_to_sms, {'responsible': responsible, 'incidents': []})
+                entry['incidents'].append(incident)
+
+        codes = []
+        for incident in claimed:
+            for code in incident.get('codes') or [incident.get('code')]:
+                if code not in codes:
+                    codes.append(code)
+        event_description = EventCoalescer.describe_codes(codes)
+
+        # Тексты SMS готовятся до приёма событий: при ошибке в шаблоне события не должны
+        # быть завершены без оповещения — они уходят на обычную обработку
+        messages = {}
+        try:
+            for phone_to_sms, entry in recipients.items():
+                objects = '; '.join(f"{i.get('panel_id')} {i.get('address') or ''}".strip() for i in entry['incidents'])
+                messages[phone_to_sms] = self.storm_sms_template.format(
+                    event_description=event_description,
+                    object_count=len(entry['incidents']),
+                    objects=objects
+                )
+        except (KeyError, IndexError, ValueError) as e:
+            self.logger.error(f"Ошибка форматирования SMS массового события {storm_key}: {e}. События обрабатываются по одному.")
+            self.write_detailed_report(f"Ошибка форматирования SMS массового события {storm_key}: {e}. События обрабатываются по одному.")
+            for incident in claimed:
+                self.begin_incident(incident, self.select_channel(incident))
+            return
+
+        events = [e for incident in claimed for e in self.incident_events(incident)]
+        event_ids = [e.get('event_id') for e in events]
+        self.update_events_status(None, event_ids, state_event=1)
+        if not self.create_archive_events(events):
+            self.logger.error(f"Не удалось создать записи в архиве для массового события {storm_key}")
+            self.write_detailed_report(f"Не удалось создать записи в архиве для массового события {storm_key}")
+            self.update_events_status(None, event_ids, state_event=0)
+            return
+        self.create_archive_records(event_ids, 'Прием на обработку')
+
+        sms_handles = []
+        for phone_to_sms, entry in recipients.items():
+            sms_handles.append(self.sms_dispatcher.submit(
+                phone_to_sms, messages[phone_to_sms], context=entry,
+                callback=lambda handle, key=storm_key: self.report_storm_sms(handle, key)
+            ))
+
+        self.finalize_events_bulk(claimed)
+        self.logger.info(f"Массовое событие {storm_key}: обработано {len(event_ids)} событий, поставлено в отправку {len(sms_handles)} SMS.")
+        self.write_detailed_report(f"Массовое событие {storm_key}: обработано {len(event_ids)} событий, поставлено в отправку {len(sms_handles)} SMS.")
+
+    def report_storm_sms(self, handle, storm_key):
+        """Запись в отчёт результата SMS массового события (вызывается диспетчером SMS)."""
+        entry = handle.context
+        sms_sent = handle.result().ok
+        for incident in entry['incidents']:
+            self.write_to_report({
+                'Дата и время обработки': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'ID объекта': incident.get('panel_id'),
+                'ID события': incident.get('event_id'),
+                'Код события': incident.get('code'),
+                'Время события': incident.get('time_event').strftime('%Y-%m-%d %H:%M:%S'),
+                'Адрес': incident.get('address'),
+                'Название компании': incident.get('company_name'),
+                'Ответственный': entry['responsible'].get('responsible_name'),
+                'Номер телефона': entry['responsible'].get('phone_number'),
+                'Статус': 'SMS отправлено' if sms_sent else 'Ошибка отправки SMS',
+                'Дополнительная информация': f"Массовое событие {storm_key}"
+            })
+
+    @staticmethod
+    def incident_events(event):
+        """Список исходных событий инцидента (для одиночного события — [event])."""
+        return event.get('merged_events') or [event]
 
     def load_events_from_database(self):
         if not self.event_codes:
@@ -305,7 +851,8 @@ class EventProcessor(QObject):
         SELECT a.Panel_id, a.Event_id, a.Code, a.TimeEvent, 
                COALESCE(d.address, '') as address, 
                d.CompanyName,
-               a.StateEvent
+               a.StateEvent,
+               b.Pult_id
         FROM {database_name}.dbo.Temp a
         LEFT JOIN {database_name}.dbo.Panel b ON a.Panel_id = b.Panel_id
         LEFT JOIN {database_name}.dbo.Groups c ON c.Panel_id = b.Panel_id
@@ -323,7 +870,8 @@ class EventProcessor(QObject):
                     'time_event': row['TimeEvent'],
                     'address': row['address'],
                     'company_name': row['CompanyName'],
-                    'state_event': row['StateEvent']
+                    'state_event': row['StateEvent'],
+                    'pult_id': row['Pult_id']
                 })
             self.logger.debug(f"Загружено {len(events)} событий.")
             self.write_detailed_report(f"Загружено {len(events)} событий из БД.")
@@ -342,21 +890,140 @@ class EventProcessor(QObject):
             return
         panel_id = event.get('panel_id')
         event_id = event.get('event_id')
-        if not self.can_process_event(panel_id):
+        if self.attach_to_active_incident(event):
+            self.cancel_prefetch([event_id])
+            return
+        if not self.claim_event(panel_id):
+            self.cancel_prefetch([event_id])
             self.logger.info(f"Событие для объекта {panel_id} пропущено (не наступил нужный период).")
             self.write_detailed_report(f"Событие для объекта {panel_id} пропущено (не наступил нужный период).")
             return
-
-        self.update_event_status(panel_id, event_id, state_event=1)
+        # Канал выбирается только для принятого события: пропущенные по периоду события
+        # остаются в Temp и не должны учитываться как сброшенные при каждом опросе
+        channel = self.select_channel(event)
+        if channel != CHANNEL_CALLS:
+            self.cancel_prefetch([event_id])
+        self.begin_incident(event, channel)
+
+    def begin_incident(self, event, channel):
+        """Принимает событие (объект уже занят claim_event) и запускает оповещение по каналу."""
+        panel_id = event.get('panel_id')
+        event_id = event.get('event_id')
+        event_ids = [e.get('event_id') for e in self.incident_events(event)]
         with self.lock:
-            self.active_events[panel_id] = datetime.now()
+            self.active_incidents[panel_id] = event
+            self.event_incidents[event_id] = event_ids
+        self.update_events_status(panel_id, event_ids, state_event=1)
+        # С этого момента в Temp у событий StateEvent = 1: отклонение означает, что событие
+        # закрыли или изменили вне SMENA (check_claimed_events)
+        event['claimed_at'] = time.monotonic()
+        if channel == CHANNEL_CALLS:
+            self.handle_event_logic(event)
+        else:
+            self.handle_degraded_event(event, channel)
 
-        self.handle_event_logic(event)
+    def handle_degraded_event(self, event, channel):
+        """Обработка без обзвона: архив, затем SMS (канал sms) или только отчёт (канал report)."""
+        panel_id = event.get('panel_id')
+        event_id = event.get('event_id')
+        merged_events = self.incident_events(event)
+        if not self.create_archive_events(merged_events):
+            self.revert_incident(panel_id, event_id)
+            return
+        self.create_archive_records([e.get('event_id') for e in merged_events], 'Прием на обработку')
+        self.notify_degraded(event, channel)
 
-    def can_process_event(self, panel_id):
+    def notify_degraded(self, event, channel):
+        """Оповещение дешёвым каналом и завершение события (архив уже создан)."""
+        panel_id = event.get('panel_id')
+        event_id = event.get('event_id')
+        responsibles = self.event_responsibles.get(event_id) or self.get_responsibles(panel_id)
+        responsible = next((r for r in responsibles if r.get('phone_number')), None)
+        if channel == CHANNEL_SMS and responsible:
+            self.send_sms_to_responsible(responsible, event_id, panel_id, event)
+        else:
+            self.write_to_report({
+                'Дата и время обработки': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'ID объекта': panel_id,
+                'ID события': event_id,
+                'Код события': event.get('code'),
+                'Время события': event.get('time_event').strftime('%Y-%m-%d %H:%M:%S'),
+                'Адрес': event.get('address'),
+                'Название компании': event.get('company_name'),
+                'Ответственный': responsible.get('responsible_name') if responsible else '',
+                'Номер телефона': responsible.get('phone_number') if responsible else '',
+                'Статус': 'Без оповещения (перегрузка)',
+                'Дополнительная информация': f"Класс важности: {event.get('severity')}"
+            })
+        self.finalize_event(panel_id, event_id)
+
+    def attach_to_active_incident(self, event):
+        """
+        Если по объекту уже идёт обзвон, новые события присоединяются к нему:
+        помечаются как принятые, архивируются и будут завершены вместе с инцидентом.
+        Возвращает True, если событие присоединено.
+        """
+        panel_id = event.get('panel_id')
+        with self.lock:
+            active = self.active_incidents.get(panel_id)
+            if active is None:
+                return False
+            event_ids = self.event_incidents.setdefault(active.get('event_id'), [])
+            new_events = [e for e in self.incident_events(event) if e.get('event_id') not in event_ids]
+            event_ids.extend(e.get('event_id') for e in new_events)
+        if not new_events:
+            return True
+        new_ids = [e.get('event_id') for e in new_events]
+        self.update_events_status(panel_id, new_ids, state_event=1)
+        for new_event in new_events:
+            if self.create_archive_event(new_event):
+                self.create_archive_record(new_event.get('event_id'), 'Прием на обработку')
+        self.logger.info(f"События {new_ids} присоединены к инциденту {active.get('event_id')} объекта {panel_id}.")
+        self.write_detailed_report(f"События {new_ids} присоединены к инциденту {active.get('event_id')} объекта {panel_id}.")
+        return True
+
+    def release_incident(self, panel_id, event_id):
+        """Снимает инцидент с учёта и возвращает Event_id всех его событий."""
+        with self.lock:
+            event_ids = self.event_incidents.pop(event_id, None) or [event_id]
+            active = self.active_incidents.get(panel_id)
+            if active is not None and active.get('event_id') == event_id:
+                del self.active_incidents[panel_id]
+            else:
+                active = None
+            self.event_responsibles.pop(event_id, None)
+            self.event_call_attempts.pop(event_id, None)
+            self.sms_notified.pop(event_id, None)
+            group = self.parallel_groups.pop(event_id, None)
+        # Оповещения, ждущие в очередях занятых номеров, больше не нужны
+        for dropped_id in {event_id, *event_ids}:
+            self.recipients.drop_event(dropped_id)
+        self.cancel_prefetch(event_ids)
+        if group is not None:
+            self.stop_parallel_group(event_id, group)
+        if self.journal:
+            self.journal.complete(event_id)
+        if active is not None:
+            # Аудио инцидента больше не нужно звонкам — его можно вытеснять из кэша
+            self.synthesizer.release(active.pop('audio_key', None))
+        return event_ids
+
+    def claim_event(self, panel_id):
+        """
+        Атомарно проверяет, можно ли обрабатывать объект, и сразу отмечает его как обрабатываемый.
+        Проверка и запись выполняются под одной блокировкой, поэтому два события одного
+        объекта не могут одновременно пройти проверку.
+        """
         now = datetime.now()
         with self.lock:
-            last_time = self.active_events.get(panel_id, None)
+            if not self.can_process_event(panel_id, now):
+                return False
+            self.active_events[panel_id] = now
+            return True
+
+    def can_process_event(self, panel_id, now=None):
+        now = now or datetime.now()
+        last_time = self.active_events.get(panel_id, None)
         if last_time is None:
             return True
         if now.date() == last_time.date():
@@ -371,54 +1038,83 @@ class EventProcessor(QObject):
         return True
 
     def update_event_status(self, panel_id, event_id, state_event):
-        update_sql = """
-        UPDATE dbo.Temp SET StateEvent = %s 
-        WHERE Panel_id = %s AND Event_id = %s
+        self.update_events_status(panel_id, [event_id], state_event)
+
+    def update_events_status(self, panel_id, event_ids, state_event):
+        """
+        Обновляет StateEvent сразу для нескольких событий (пакетами по 1000).
+        panel_id=None — события разных объектов, отбор только по Event_id.
         """
         try:
-            rows_affected = self.db_connector.execute(update_sql, (state_event, panel_id, event_id))
+            rows_affected = 0
+            for chunk in chunked(event_ids, 1000):
+                placeholders = ', '.join(['%s'] * len(chunk))
+                if panel_id is None:
+                    update_sql = f"UPDATE dbo.Temp SET StateEvent = %s WHERE Event_id IN ({placeholders})"
+                    params = (state_event, *chunk)
+                else:
+                    update_sql = f"""
+                    UPDATE dbo.Temp SET StateEvent = %s 
+                    WHERE Panel_id = %s AND Event_id IN ({placeholders})
+                    """
+                    params = (state_event, panel_id, *chunk)
+                rows_affected += self.db_connector.execute(update_sql, params)
             if state_event == 1:
                 self.db_connector.commit()
             if rows_affected > 0:
-                self.logger.debug(f"Статус события {event_id} -> {state_event}.")
-                self.write_detailed_report(f"Статус события {event_id} обновлен на {state_event}.")
+                self.logger.debug(f"Статус событий {event_ids} -> {state_event}.")
+                self.write_detailed_report(f"Статус событий {event_ids} обновлен на {state_event}.")
             else:
-                self.logger.warning(f"Статус события {event_id} не обновлен (нет затронутых строк).")
-                self.write_detailed_report(f"Статус события {event_id} не обновлен (нет затронутых строк).")
+                self.logger.warning(f"Статус событий {event_ids} не обновлен (нет затронутых строк).")
+                self.write_detailed_report(f"Статус событий {event_ids} не обновлен (нет затронутых строк).")
         except Exception as e:
             self.logger.error(f"Ошибка при обновлении статуса: {e}")
-            self.write_detailed_report(f"Ошибка при обновлении статуса события {event_id}: {e}")
+            self.write_detailed_report(f"Ошибка при обновлении статуса событий {event_ids}: {e}")
 
     def handle_event_logic(self, event):
         panel_id = event.get('panel_id')
         event_id = event.get('event_id')
-        event_code = event.get('code')
-        address = event.get('address')
-        event_time = event.get('time_event')
-        company_name = event.get('company_name')
+        merged_events = self.incident_events(event)
         self.logger.debug(f"Обработка логики события {event_id}.")
         self.write_detailed_report(f"Начало обработки логики события {event_id}.")
         try:
-            if not self.create_archive_event(event):
-                self.logger.error(f"Не удалось создать запись в архиве для события {event_id}")
-                self.write_detailed_report(f"Не удалось создать запись в архиве для события {event_id}")
-                self.update_event_status(panel_id, event_id, state_event=0)
+            archived_ids = []
+            for merged_event in merged_events:
+                merged_id = merged_event.get('event_id')
+                if not self.create_archive_event(merged_event):
+                    self.logger.error(f"Не удалось создать запись в архиве для события {merged_id}")
+                    self.write_detailed_report(f"Не удалось создать запись в архиве для события {merged_id}")
+                    continue
+                archived_ids.append(merged_id)
+            if not archived_ids:
+                self.revert_incident(panel_id, event_id)
                 return
-            self.create_archive_record(event_id, 'Прием на обработку')
-
-            template_vars = {
-                'object_id': panel_id,
-                'object_id_digits': number_to_spelled_digits(panel_id),
-                'event_time': event_time.strftime('%Y-%m-%d %H:%M:%S'),
-                'address': address,
-                'event_code': event_code,
-                'company_name': company_name
-            }
-            audio_files = self.synthesizer.synthesize(panel_id, template_vars, self.tts_template)
+            self.create_archive_records(archived_ids, 'Прием на обработку')
+
+            template_vars = self.build_template_vars(event)
+            audio_files = self.take_prefetched(event_id)
+            if audio_files:
+                self.write_detailed_report(f"Аудио для события {event_id} взято из упреждающего синтеза.")
+            else:
+                audio_files = self.synthesizer.synthesize(panel_id, template_vars, self.tts_template, self.tts_backend)
             if not audio_files or not audio_files.get('mp3'):
                 self.logger.error(f"Не удалось сгенерировать аудио для события {event_id}")
                 self.write_detailed_report(f"Не удалось сгенерировать аудио для события {event_id}")
-                self.update_event_status(panel_id, event_id, state_event=0)
+                self.revert_incident(panel_id, event_id)
+                return
+            with self.lock:
+                active = event_id in self.event_incidents
+                if active:
+                    # Закрепление аудио в кэше снимает release_incident — при любом исходе инцидента
+                    event['audio_key'] = audio_files.get('cache_key')
+            if not active:
+                # Событие закрыли вне SMENA, пока шёл синтез: инцидент уже снят с учёта
+                self.synthesizer.release(audio_files.get('cache_key'))
+                return
+            if self.deadline_expired(event):
+                channel = self.severity.degraded_channel(event.get('severity'))
+                self.record_shed(event, event.get('severity'), channel, 'истёк бюджет времени после синтеза')
+                self.notify_degraded(event, channel)
                 return
             file_path = audio_files['mp3']
             file_name = os.path.splitext(os.path.basename(file_path))[0]
@@ -431,13 +1127,30 @@ class EventProcessor(QObject):
                 self.write_detailed_report(f"Нет ответственных лиц для объекта {panel_id}. Завершаем.")
                 self.finalize_event(panel_id, event_id)
                 return
-            self.event_responsibles[event_id] = responsibles
-            self.event_call_attempts[event_id] = 0
+            event['template_vars'] = template_vars
+            with self.lock:
+                # Проверка и запись под одной блокировкой: release_incident (отмена события)
+                # либо уже прошёл, либо удалит эти записи сам
+                active = event_id in self.event_incidents
+                if active:
+                    self.event_responsibles[event_id] = responsibles
+                    self.event_call_attempts[event_id] = 0
+            if not active:
+                return
+            if self.journal:
+                self.journal.start(event, responsibles)
+            if self.sms_policy == 'start':
+                self.notify_responsibles_sms(event_id, panel_id, event, responsibles)
             self.call_responsibles(event_id, file_name, panel_id, event)
         except Exception as e:
             self.logger.error(f"Ошибка при обработке события {event_id}: {e}")
             self.write_detailed_report(f"Ошибка при обработке события {event_id}: {e}")
-            self.update_event_status(panel_id, event_id, state_event=0)
+            self.revert_incident(panel_id, event_id)
+
+    def revert_incident(self, panel_id, event_id):
+        """Возвращает все события инцидента в статус 0 (не обработано)."""
+        event_ids = self.release_incident(panel_id, event_id)
+        self.update_events_status(panel_id, event_ids, state_event=0)
 
     def get_responsibles(self, panel_id):
         query = """
@@ -467,17 +1180,63 @@ class EventProcessor(QObject):
             self.write_detailed_report(f"Ошибка при получении ответственных для Panel_id={panel_id}: {e}")
             return []
 
+    def get_responsibles_bulk(self, panel_ids):
+        """Ответственные сразу для нескольких объектов: panel_id -> список (как get_responsibles)."""
+        result = {}
+        try:
+            for chunk in chunked(set(panel_ids), 1000):
+                placeholders = ', '.join(['%s'] * len(chunk))
+                query = f"""
+                SELECT r.Panel_id, r.ResponsiblesList_id, COALESCE(rt.PhoneNo, '') as PhoneNo,
+                       rl.Responsible_Name
+                FROM dbo.Responsibles r
+                LEFT JOIN dbo.ResponsibleTel rt ON rt.ResponsiblesList_id = r.ResponsiblesList_id
+                LEFT JOIN dbo.ResponsiblesList rl ON rl.ResponsiblesList_id = r.ResponsiblesList_id
+                WHERE r.Panel_id IN ({placeholders})
+                ORDER BY r.Panel_id, r.Responsible_id ASC
+                """
+                for row in self.db_connector.fetchall(query, tuple(chunk)):
+                    result.setdefault(row['Panel_id'], []).append({
+                        'responsibles_list_id': row['ResponsiblesList_id'],
+                        'phone_number': row['PhoneNo'],
+                        'responsible_name': row['Responsible_Name']
+                    })
+            self.write_detailed_report(f"Найдены ответственные для {len(result)} объектов (пакетный запрос).")
+        except Exception as e:
+            self.logger.error(f"Ошибка при пакетном получении ответственных: {e}")
+            self.write_detailed_report(f"Ошибка при пакетном получении ответственных: {e}")
+        return result
+
     def call_responsibles(self, event_id, file_name, panel_id, event):
+        if not self.is_incident_active(event_id):
+            self.logger.debug(f"Событие {event_id} уже завершено или отменено, звонок не нужен.")
+            return
         responsibles = self.event_responsibles.get(event_id, [])
         attempt = self.event_call_attempts.get(event_id, 0)
+        if attempt > 0 and attempt < len(responsibles) and self.deadline_expired(event):
+            # Бюджет времени исчерпан посреди цепочки — дальше не звоним, уходим в дешёвый канал
+            channel = self.severity.degraded_channel(event.get('severity'))
+            self.record_shed(event, event.get('severity'), channel, 'истёк бюджет времени в цепочке обзвона')
+            self.notify_degraded(event, channel)
+            return
         if attempt >= len(responsibles):
-            self.logger.info(f"Все ответственные обзвонены (event_id={event_id}). Отправка SMS первому.")
-            self.write_detailed_report(f"Все ответственные обзвонены для события {event_id}. Отправка SMS первому.")
-            if responsibles:
-                self.send_sms_to_responsible(responsibles[0], event_id, panel_id, event)
+            if self.sms_policy == 'end':
+                self.logger.info(f"Все ответственные обзвонены (event_id={event_id}). Отправка SMS первому.")
+                self.write_detailed_report(f"Все ответственные обзвонены для события {event_id}. Отправка SMS первому.")
+                self.notify_responsibles_sms(event_id, panel_id, event, responsibles[:1])
+            else:
+                # По политикам start и first_failure SMS уже разосланы всем ответственным.
+                # Повторная рассылка здесь после перезапуска (sms_notified не журналируется)
+                # продублировала бы их
+                self.logger.info(f"Все ответственные обзвонены (event_id={event_id}).")
+                self.write_detailed_report(f"Все ответственные обзвонены для события {event_id}.")
             self.finalize_event(panel_id, event_id)
             return
 
+        if self.dial_mode == 'parallel' and (not self.parallel_severities or event.get('severity') in self.parallel_severities):
+            self.call_responsibles_parallel(event_id, file_name, panel_id, event, attempt)
+            return
+
         responsible = responsibles[attempt]
         phone_number = responsible.get('phone_number')
         responsible_name = responsible.get('responsible_name')
@@ -488,129 +1247,576 @@ class EventProcessor(QObject):
             self.call_responsibles(event_id, file_name, panel_id, event)
             return
 
-        phone_to_call = self.test_phone_number if self.test_mode else phone_number
-        self.logger.debug(f"Инициируем звонок на номер {phone_to_call} для события {event_id}.")
-        self.write_detailed_report(f"Инициируем звонок на номер {phone_to_call} для события {event_id}.")
-        action_id = self.call_manager.make_call(phone_to_call, file_name, panel_id)
-        if not action_id:
-            self.logger.error(f"Не удалось инициировать звонок для события {event_id} на {phone_to_call}. Следующий.")
-            self.write_detailed_report(f"Не удалось инициировать звонок для события {event_id} на {phone_to_call}.")
-            time.sleep(self.call_delay_seconds)
-            self.event_call_attempts[event_id] += 1
+        self.start_call(self.build_notification(event_id, file_name, panel_id, event, responsible))
+
+    def call_responsibles_parallel(self, event_id, file_name, panel_id, event, attempt):
+        """
+        Звонит сразу следующим parallel_count ответственным (с номерами), начиная с attempt.
+        Первый принятый звонок завершает событие, остальные звонки группы прерываются.
+        Если все звонки группы неуспешны, через call_delay_seconds звонит следующей группе.
+        """
+        responsibles = self.event_responsibles.get(event_id, [])
+        group, index = [], attempt
+        while index < len(responsibles) and len(group) < self.parallel_count:
+            if responsibles[index].get('phone_number'):
+                group.append(responsibles[index])
+            index += 1
+        # Попытки группы считаются сделанными: следующая группа начнётся после неё
+        self.event_call_attempts[event_id] = index - 1
+        if not group:
+            self.event_call_attempts[event_id] = len(responsibles)
             self.call_responsibles(event_id, file_name, panel_id, event)
             return
 
-        # Добавляем запись с блокировкой
+        state = {'pending': len(group), 'timers': []}
+        with self.lock:
+            self.parallel_groups[event_id] = state
+        names = [r.get('responsible_name') for r in group]
+        self.logger.info(f"Событие {event_id}: параллельный обзвон {names}.")
+        self.write_detailed_report(f"Событие {event_id}: параллельный обзвон {names}.")
+        for position, responsible in enumerate(group):
+            notification = self.build_notification(event_id, file_name, panel_id, event, responsible)
+            notification['parallel'] = True
+            delay = position * self.parallel_stagger_seconds
+            if delay <= 0:
+                self.start_call(notification)
+                continue
+            timer = threading.Timer(delay, self.start_call, args=(notification,))
+            timer.daemon = True
+            with self.lock:
+                state['timers'].append(timer)
+            timer.start()
+
+    def build_notification(self, event_id, file_name, panel_id, event, responsible):
+        phone_number = responsible.get('phone_number')
+        return {
+            'panel_id': panel_id,
+            'event_id': event_id,
+            'code': event.get('code'),
+            'time_event': event.get('time_event'),
+            'address': event.get('address'),
+            'company_name': event.get('company_name'),
+            'phone_number': phone_number,
+            'phone_to_call': self.test_phone_number if self.test_mode else phone_number,
+            'responsible_name': responsible.get('responsible_name'),
+            'file_name': file_name,
+            'event': event
+        }
+
+    def start_call(self, notification):
+        """Занимает номер и звонит; если номер занят, оповещение ждёт в очереди номера."""
+        event_id = notification['event_id']
+        phone_to_call = notification['phone_to_call']
+        if notification.get('parallel') and not self.is_incident_active(event_id):
+            # Группа уже завершена (звонок принят другим ответственным) — отложенный звонок не нужен
+            return
+        if not self.recipients.acquire(phone_to_call, notification):
+            # На этот номер уже идёт звонок по другому объекту — оповещение будет
+            # объединено со следующим звонком на номер
+            self.logger.info(f"Номер {phone_to_call} занят другим звонком, событие {event_id} поставлено в очередь номера.")
+            self.write_detailed_report(f"Номер {phone_to_call} занят другим звонком, событие {event_id} поставлено в очередь номера.")
+            return
+        self.dial_recipient(phone_to_call, [notification])
+
+    def is_incident_active(self, event_id):
+        with self.lock:
+            return event_id in self.event_incidents
+
+    def check_claimed_events(self):
+        """
+        Сверяет события, по которым идёт обзвон, с Temp: если строка исчезла или её
+        StateEvent изменился (тревогу закрыли в Пульте), обзвон по инциденту прекращается.
+        """
+        with self.lock:
+            incidents = [
+                (panel_id, incident, list(self.event_incidents.get(incident.get('event_id'), [])))
+                for panel_id, incident in self.active_incidents.items()
+                if incident.get('claimed_at') is not None
+            ]
+        if not incidents:
+            return
+        event_ids = [event_id for _, _, ids in incidents for event_id in ids]
+        try:
+            claimed = set()
+            for chunk in chunked(event_ids, 1000):
+                placeholders = ', '.join(['%s'] * len(chunk))
+                query = f"SELECT Event_id FROM dbo.Temp WHERE StateEvent = 1 AND Event_id IN ({placeholders})"
+                claimed.update(row['Event_id'] for row in self.db_connector.fetchall(query, tuple(chunk)))
+        except Exception as e:
+            self.logger.error(f"Ошибка при проверке обрабатываемых событий: {e}")
+            self.write_detailed_report(f"Ошибка при проверке обрабатываемых событий: {e}")
+            return
+        for panel_id, incident, ids in incidents:
+            if not claimed.intersection(ids):
+                self.cancel_incident(panel_id, incident)
+
+    def cancel_incident(self, panel_id, incident):
+        """
+        Прекращает обзвон по инциденту, закрытому вне SMENA: отменяет запланированные
+        звонки, прерывает идущие и сразу освобождает номера. Temp не изменяется.
+        """
+        event_id = incident.get('event_id')
+        with self.lock:
+            if self.active_incidents.get(panel_id) is not incident:
+                # Инцидент уже завершён самой SMENA
+                return
+            timer = self.retry_timers.pop(event_id, None)
+        if timer is not None:
+            timer.cancel()
+
         with self.action_id_lock:
-            self.action_id_to_call_info[action_id] = {
-                'panel_id': panel_id,
-                'event_id': event_id,
-                'code': event.get('code'),
-                'time_event': event.get('time_event'),
-                'address': event.get('address'),
-                'company_name': event.get('company_name'),
-                'phone_number': phone_number,
-                'responsible_name': responsible_name,
-                'file_name': file_name,
-                'event': event
-            }
-        report_data = {
+            # Общий звонок по нескольким событиям продолжается ради остальных событий
+            action_ids = [
+                action_id for action_id, info in self.action_id_to_call_info.items()
+                if all(n.get('event_id') == event_id for n in info.get('notifications') or [info])
+            ]
+            calls = [(action_id, self.action_id_to_call_info.pop(action_id)) for action_id in action_ids]
+        event_ids = self.release_incident(panel_id, event_id)
+        for action_id, call_info in calls:
+            self.call_manager.hangup(action_id)
+            if call_info.get('ack_timer'):
+                call_info['ack_timer'].cancel()
+            self.synthesizer.unpin(action_id)
+            self.synthesizer.release(call_info.get('combined_audio_key'))
+            self.release_recipient(call_info.get('phone_to_call'))
+
+        self.logger.info(f"События {event_ids} объекта {panel_id} закрыты вне SMENA. Обзвон прекращён, прервано звонков: {len(calls)}.")
+        self.write_detailed_report(f"События {event_ids} объекта {panel_id} закрыты вне SMENA. Обзвон прекращён, прервано звонков: {len(calls)}.")
+        self.write_to_report({
             'Дата и время обработки': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'ID объекта': panel_id,
             'ID события': event_id,
-            'Код события': event.get('code'),
-            'Время события': event.get('time_event').strftime('%Y-%m-%d %H:%M:%S'),
-            'Адрес': event.get('address'),
-            'Название компании': event.get('company_name'),
-            'Ответственный': responsible_name,
-            'Номер телефона': phone_number,
-            'Статус': 'Звонок инициирован',
-            'Дополнительная информация': f"ActionID: {action_id}"
-        }
-        self.write_to_report(report_data)
-        self.logger.info(f"Звонок инициирован на номер {phone_to_call} для события {event_id}, ActionID={action_id}.")
-        self.write_detailed_report(f"Звонок инициирован на номер {phone_to_call} для события {event_id}, ActionID={action_id}.")
-
-    def handle_call_event(self, uniqueid, status, call_info, extra_info=None):
-        expected_statuses = ['ANSWERED', 'NO ANSWER', 'BUSY', 'FAILED', 'CANCELED', 'HUNG_UP', 'BRIDGED']
-        panel_id = call_info.get('panel_id')
-        phone_number = call_info.get('phone_number')
-        event_id = call_info.get('event_id')
-        code = call_info.get('code')
-        event_time = call_info.get('time_event')
-        address = call_info.get('address')
-        company_name = call_info.get('company_name')
-        responsible_name = call_info.get('responsible_name')
-
-        self.logger.info(f"[CALL EVENT] ActionID={uniqueid}, Status={status}, Phone={phone_number}, EventID={event_id}")
-        self.write_detailed_report(f"[CALL EVENT] ActionID={uniqueid}, Status={status}, Phone={phone_number}, EventID={event_id}")
+            'Код события': incident.get('code'),
+            'Время события': incident.get('time_event').strftime('%Y-%m-%d %H:%M:%S'),
+            'Адрес': incident.get('address'),
+            'Название компании': incident.get('company_name'),
+            'Ответственный': '',
+            'Номер телефона': '',
+            'Статус': 'Обзвон прекращён',
+            'Дополнительная информация': 'Событие закрыто или изменено в Пульте'
+        })
+        if self.parent:
+            self.parent.remove_alarm_card(panel_id)
 
-        if status not in expected_statuses:
+    def stop_parallel_group(self, event_id, group):
+        """Отменяет отложенные звонки группы и прерывает звонки, которые ещё идут."""
+        with self.lock:
+            timers = list(group['timers'])
+        for timer in timers:
+            timer.cancel()
+        with self.action_id_lock:
+            # Общий звонок по нескольким событиям не прерывается: он нужен и другим событиям
+            action_ids = [
+                action_id for action_id, info in self.action_id_to_call_info.items()
+                if all(n.get('event_id') == event_id and n.get('parallel') for n in info.get('notifications') or [info])
+            ]
+        for action_id in action_ids:
+            self.logger.info(f"Событие {event_id}: прерывание звонка {action_id} группы.")
+            self.write_detailed_report(f"Событие {event_id}: прерывание звонка {action_id} группы.")
+            self.call_manager.hangup(action_id)
+
+    def on_call_failed(self, notification, delay=None):
+        """Неуспешный звонок: следующая попытка (для параллельной группы — когда неуспешны все)."""
+        event_id = notification['event_id']
+        if not self.is_incident_active(event_id):
+            # Событие уже завершено (например, принят параллельный звонок)
+            return
+        if self.sms_policy == 'first_failure':
+            self.notify_responsibles_sms(
+                event_id, notification['panel_id'], notification['event'], self.event_responsibles.get(event_id, [])
+            )
+        if notification.get('parallel'):
+            with self.lock:
+                state = self.parallel_groups.get(event_id)
+                if state is None:
+                    return
+                state['pending'] -= 1
+                if state['pending'] > 0:
+                    return
+                del self.parallel_groups[event_id]
+            self.write_detailed_report(f"Событие {event_id}: все звонки параллельной группы неуспешны.")
+        self.schedule_next_attempt(notification, delay)
+
+    def dial_recipient(self, phone_to_call, notifications):
+        """
+        Звонит на номер по одному или нескольким оповещениям.
+        Номер должен быть занят через self.recipients (acquire/release).
+        Несколько оповещений объединяются в один звонок с общим сообщением.
+        """
+        # Пока оповещения ждали номер, их события могли завершиться
+        notifications = [n for n in notifications if self.is_incident_active(n['event_id'])]
+        if not notifications:
+            self.release_recipient(phone_to_call)
+            return
+        file_name = notifications[0]['file_name']
+        combined_file = None
+        if len(notifications) > 1:
+            combined_file = self.synthesize_combined_message(notifications)
+            if combined_file:
+                file_name = combined_file
+            else:
+                # Общее сообщение не получилось — звоним по первому, остальные ждут своей очереди
+                self.recipients.requeue(phone_to_call, notifications[1:])
+                notifications = notifications[:1]
+
+        event_ids = [n['event_id'] for n in notifications]
+        self.logger.debug(f"Инициируем звонок на номер {phone_to_call} для событий {event_ids}.")
+        self.write_detailed_report(f"Инициируем звонок на номер {phone_to_call} для событий {event_ids}.")
+        if self.journal:
+            # Звонок отмечается до инициации: после перезапуска он не повторяется
+            self.journal.dialing([(n['event_id'], self.event_call_attempts.get(n['event_id'], 0)) for n in notifications])
+        action_id = self.call_manager.make_call(phone_to_call, file_name, notifications[0]['panel_id'])
+        if not action_id:
+            self.logger.error(f"Не удалось инициировать звонок для событий {event_ids} на {phone_to_call}. Следующий.")
+            self.write_detailed_report(f"Не удалось инициировать звонок для событий {event_ids} на {phone_to_call}.")
+            self.synthesizer.release(combined_file)
+            self.release_recipient(phone_to_call)
+            for notification in notifications:
+                self.on_call_failed(notification)
             return
 
-        if status in ['ANSWERED', 'BRIDGED']:
-            rep_status = 'Звонок принят' if status == 'ANSWERED' else 'Звонок соединён'
+        # Добавляем запись с блокировкой
+        call_info = dict(notifications[0])
+        call_info['file_name'] = file_name
+        call_info['notifications'] = notifications
+        # Общее аудио закреплено в кэше до конца звонка
+        call_info['combined_audio_key'] = combined_file
+        with self.action_id_lock:
+            self.action_id_to_call_info[action_id] = call_info
+        # Файл, который проигрывает звонок, не удаляется до его завершения
+        self.synthesizer.pin(file_name, action_id)
+        for notification in notifications:
+            event = notification['event']
             report_data = {
                 'Дата и время обработки': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'ID объекта': panel_id,
-                'ID события': event_id,
-                'Код события': code,
-                'Время события': event_time.strftime('%Y-%m-%d %H:%M:%S'),
-                'Адрес': address,
-                'Название компании': company_name,
-                'Ответственный': responsible_name,
-                'Номер телефона': phone_number,
-                'Статус': rep_status,
-                'Дополнительная информация': status
+                'ID объекта': notification['panel_id'],
+                'ID события': notification['event_id'],
+                'Код события': event.get('code'),
+                'Время события': event.get('time_event').strftime('%Y-%m-%d %H:%M:%S'),
+                'Адрес': event.get('address'),
+                'Название компании': event.get('company_name'),
+                'Ответственный': notification['responsible_name'],
+                'Номер телефона': notification['phone_number'],
+                'Статус': 'Звонок инициирован',
+                'Дополнительная информация': f"ActionID: {action_id}"
             }
             self.write_to_report(report_data)
-            self.finalize_event(panel_id, event_id)
+        self.logger.info(f"Звонок инициирован на номер {phone_to_call} для событий {event_ids}, ActionID={action_id}.")
+        self.write_detailed_report(f"Звонок инициирован на номер {phone_to_call} для событий {event_ids}, ActionID={action_id}.")
+
+    def synthesize_combined_message(self, notifications):
+        """Синтезирует одно сообщение по нескольким объектам. Возвращает имя файла или None."""
+        messages = []
+        for notification in notifications:
+            template_vars = notification['event'].get('template_vars')
+            try:
+                messages.append(self.tts_template.format(**template_vars))
+            except (KeyError, TypeError) as e:
+                self.logger.error(f"Ошибка форматирования сообщения для события {notification['event_id']}: {e}")
+                return None
+        combined_vars = {
+            'object_count': len(notifications),
+            'messages': ' '.join(messages)
+        }
+        object_id = 'multi-' + '-'.join(str(n['panel_id']) for n in notifications)
+        audio_files = self.synthesizer.synthesize(
+            object_id, combined_vars, self.tts_multi_template, self.tts_multi_backend
+        )
+        if not audio_files or not audio_files.get('mp3'):
+            self.logger.error(f"Не удалось сгенерировать общее аудио для объектов {object_id}.")
+            self.write_detailed_report(f"Не удалось сгенерировать общее аудио для объектов {object_id}.")
+            return None
+        return audio_files.get('cache_key')
 
-        elif status in ['NO ANSWER', 'BUSY', 'FAILED', 'CANCELED', 'HUNG_UP']:
-            self.logger.warning(f"Звонок неуспешен ({status}) для номера {phone_number}, event_id={event_id}.")
-            self.write_detailed_report(f"Звонок неуспешен ({status}) для номера {phone_number}, event_id={event_id}.")
-            time.sleep(self.call_delay_seconds)
-            self.event_call_attempts[event_id] += 1
-            self.call_responsibles(event_id, call_info.get('file_name'), panel_id, call_info.get('event'))
+    def release_recipient(self, phone_to_call):
+        """
+        Освобождает номер. Если за время звонка на номер накопились оповещения,
+        они объединяются в один новый звонок (в рабочем потоке пула).
+        """
+        queued = self.recipients.release(phone_to_call, is_active=self.is_incident_active)
+        if not queued:
+            return
+        self.logger.info(f"Номер {phone_to_call}: объединённый звонок по {len(queued)} оповещениям.")
+        self.write_detailed_report(f"Номер {phone_to_call}: объединённый звонок по событиям {[n['event_id'] for n in queued]}.")
+        if self.executor is None:
+            self.dial_recipient(phone_to_call, queued)
+        else:
+            self.executor.submit(('phone', phone_to_call), self.dial_recipient, phone_to_call, queued)
 
+    def schedule_next_attempt(self, notification, delay=None):
+        """Планирует звонок следующему ответственному через call_delay_seconds, не блокируя поток."""
+        event_id = notification['event_id']
+        delay = self.call_delay_seconds if delay is None else delay
+
+        def run_next_attempt():
+            with self.lock:
+                self.retry_timers.pop(event_id, None)
+            self.event_call_attempts[event_id] = self.event_call_attempts.get(event_id, 0) + 1
+            self.call_responsibles(event_id, notification['file_name'], notification['panel_id'], notification['event'])
+
+        timer = threading.Timer(delay, run_next_attempt)
+        timer.daemon = True
+        with self.lock:
+            self.retry_timers[event_id] = timer
+        if self.journal:
+            self.journal.schedule(event_id, self.event_call_attempts.get(event_id, 0) + 1, time.time() + delay)
+        timer.start()
+
+    def resume_jobs(self):
+        """
+        Возобновляет цепочки обзвона из журнала, которые не ведутся в этом процессе
+        (после перезапуска или после остановки обработки, отменившей таймеры).
+        """
+        if not self.journal:
+            return
         with self.action_id_lock:
-            if uniqueid in self.action_id_to_call_info:
-                del self.action_id_to_call_info[uniqueid]
-                self.write_detailed_report(f"ActionID {uniqueid} удалён из отслеживания.")
+            dialing_ids = {
+                n.get('event_id')
+                for info in self.action_id_to_call_info.values()
+                for n in info.get('notifications') or [info]
+            }
+        with self.lock:
+            timer_ids = set(self.retry_timers)
+        jobs = [j for j in self.journal.jobs() if j['event_id'] not in dialing_ids and j['event_id'] not in timer_ids]
+        if not jobs:
+            return
+        self.logger.info(f"Возобновление {len(jobs)} незавершённых цепочек обзвона из журнала.")
+        self.write_detailed_report(f"Возобновление цепочек обзвона из журнала: {[j['event_id'] for j in jobs]}.")
+        for job in jobs:
+            self.executor.submit(job['panel_id'], self.resume_job, job)
+
+    def resume_job(self, job):
+        """Продолжает одну цепочку обзвона с сохранённой попытки."""
+        panel_id = job['panel_id']
+        event_id = job['event_id']
+        with self.lock:
+            event = self.active_incidents.get(panel_id)
+            if event is None or event.get('event_id') != event_id:
+                # После перезапуска: инцидент восстанавливается из журнала
+                event = job['event']
+                self.active_incidents[panel_id] = event
+            # После stop_processing/start_processing инцидент ещё в памяти: его присоединённые
+            # события и закреплённое аудио сохраняются
+            self.event_incidents.setdefault(event_id, [e.get('event_id') for e in self.incident_events(event)])
+            self.active_events.setdefault(panel_id, datetime.fromtimestamp(job['created_at']))
+            self.event_responsibles.setdefault(event_id, job['responsibles'])
+        event['claimed_at'] = time.monotonic()
+
+        try:
+            # Аудио берётся из кэша (или синтезируется заново, если было вытеснено)
+            audio_files = self.synthesizer.synthesize(panel_id, event.get('template_vars'), self.tts_template, self.tts_backend)
+            if not audio_files or not audio_files.get('mp3'):
+                self.logger.error(f"Не удалось получить аудио для возобновляемого события {event_id}. Событие возвращено в обработку.")
+                self.write_detailed_report(f"Не удалось получить аудио для возобновляемого события {event_id}. Событие возвращено в обработку.")
+                self.revert_incident(panel_id, event_id)
+                return
+            # synthesize закрепил аудио заново — прежнее закрепление инцидента снимается
+            self.synthesizer.release(event.pop('audio_key', None))
+            event['audio_key'] = audio_files.get('cache_key')
+            file_name = os.path.splitext(os.path.basename(audio_files['mp3']))[0]
+
+            attempt = job['attempt']
+            delay = 0
+            if job['state'] == JOB_DIALING:
+                # Исход звонка до перезапуска неизвестен: он не повторяется, цепочка идёт дальше
+                attempt += 1
+            elif job['next_attempt_at']:
+                delay = max(0, job['next_attempt_at'] - time.time())
+            self.event_call_attempts[event_id] = attempt - 1
+            self.logger.info(f"Событие {event_id}: цепочка обзвона возобновлена с попытки {attempt + 1} через {delay:.0f} сек.")
+            self.write_detailed_report(f"Событие {event_id}: цепочка обзвона возобновлена с попытки {attempt + 1} через {delay:.0f} сек.")
+            self.schedule_next_attempt({
+                'event_id': event_id, 'panel_id': panel_id, 'file_name': file_name, 'event': event
+            }, delay=delay)
+        except Exception as e:
+            self.logger.error(f"Ошибка при возобновлении события {event_id}: {e}")
+            self.write_detailed_report(f"Ошибка при возобновлении события {event_id}: {e}")
+            self.revert_incident(panel_id, event_id)
+
+    def handle_call_event(self, uniqueid, status, call_info, extra_info=None):
+        expected_statuses = [
+            'ANSWERED', 'NO ANSWER', 'BUSY', 'FAILED', 'CANCELED', 'HUNG_UP', 'BRIDGED',
+            'ACKNOWLEDGED', 'UNACKNOWLEDGED'
+        ]
+
+        self.logger.info(f"[CALL EVENT] ActionID={uniqueid}, Status={status}, Phone={call_info.get('phone_number')}, EventID={call_info.get('event_id')}")
+        self.write_detailed_report(f"[CALL EVENT] ActionID={uniqueid}, Status={status}, Phone={call_info.get('phone_number')}, EventID={call_info.get('event_id')}")
+
+        if status not in expected_statuses:
+            return
+        if self.require_ack and status in ['ANSWERED', 'BRIDGED']:
+            # Ответ ещё не означает, что сообщение услышали (мог ответить автоответчик)
+            self.on_call_answered(uniqueid)
+            return
+
+        # Финальный статус обрабатывается один раз: повторные уведомления (AMI и парсер лога)
+        # по тому же ActionID игнорируются
+        with self.action_id_lock:
+            stored_info = self.action_id_to_call_info.pop(uniqueid, None)
+        if stored_info is None:
+            self.logger.debug(f"ActionID {uniqueid} уже обработан или неизвестен.")
+            return
+        self.write_detailed_report(f"ActionID {uniqueid} удалён из отслеживания.")
+        if stored_info.get('ack_timer'):
+            stored_info['ack_timer'].cancel()
+        unacknowledged = status in ['HUNG_UP', 'UNACKNOWLEDGED'] and stored_info.get('answered')
+
+        if status == 'UNACKNOWLEDGED' and unacknowledged:
+            # Истёк срок подтверждения, а звонок ещё идёт: номер освобождается, звонок прерывается
+            self.call_manager.hangup(uniqueid)
+        self.synthesizer.unpin(uniqueid)
+        self.synthesizer.release(stored_info.get('combined_audio_key'))
+        self.release_recipient(stored_info.get('phone_to_call'))
+
+        for notification in stored_info.get('notifications') or [stored_info]:
+            panel_id = notification.get('panel_id')
+            phone_number = notification.get('phone_number')
+            event_id = notification.get('event_id')
+
+            if status in ['ANSWERED', 'BRIDGED', 'ACKNOWLEDGED']:
+                rep_status = {
+                    'ANSWERED': 'Звонок принят', 'BRIDGED': 'Звонок соединён', 'ACKNOWLEDGED': 'Приём подтверждён'
+                }[status]
+                report_data = {
+                    'Дата и время обработки': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    'ID объекта': panel_id,
+                    'ID события': event_id,
+                    'Код события': notification.get('code'),
+                    'Время события': notification.get('time_event').strftime('%Y-%m-%d %H:%M:%S'),
+                    'Адрес': notification.get('address'),
+                    'Название компании': notification.get('company_name'),
+                    'Ответственный': notification.get('responsible_name'),
+                    'Номер телефона': phone_number,
+                    'Статус': rep_status,
+                    'Дополнительная информация': status
+                }
+                self.write_to_report(report_data)
+                # При параллельном обзвоне событие могло уже завершиться другим звонком
+                if self.is_incident_active(event_id):
+                    self.finalize_event(panel_id, event_id)
+            elif unacknowledged:
+                self.logger.warning(f"Звонок на {phone_number} принят без подтверждения ({status}), event_id={event_id}. Следующий ответственный.")
+                self.write_detailed_report(f"Звонок на {phone_number} принят без подтверждения ({status}), event_id={event_id}.")
+                self.write_to_report({
+                    'Дата и время обработки': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    'ID объекта': panel_id,
+                    'ID события': event_id,
+                    'Код события': notification.get('code'),
+                    'Время события': notification.get('time_event').strftime('%Y-%m-%d %H:%M:%S'),
+                    'Адрес': notification.get('address'),
+                    'Название компании': notification.get('company_name'),
+                    'Ответственный': notification.get('responsible_name'),
+                    'Номер телефона': phone_number,
+                    'Статус': 'Звонок принят без подтверждения',
+                    'Дополнительная информация': status
+                })
+                self.on_call_failed(notification, delay=0)
+            else:
+                self.logger.warning(f"Звонок неуспешен ({status}) для номера {phone_number}, event_id={event_id}.")
+                self.write_detailed_report(f"Звонок неуспешен ({status}) для номера {phone_number}, event_id={event_id}.")
+                self.on_call_failed(notification)
+
+    def on_call_answered(self, action_id):
+        """Звонок принят: ждём подтверждения не дольше ack_timeout_seconds."""
+        with self.action_id_lock:
+            call_info = self.action_id_to_call_info.get(action_id)
+            if call_info is None or call_info.get('answered'):
+                return
+            call_info['answered'] = True
+            timer = threading.Timer(
+                self.ack_timeout_seconds, self.handle_call_event, args=(action_id, 'UNACKNOWLEDGED', call_info)
+            )
+            timer.daemon = True
+            call_info['ack_timer'] = timer
+        timer.start()
+        event_ids = [n['event_id'] for n in call_info.get('notifications') or [call_info]]
+        self.logger.info(f"Звонок {action_id} принят, ожидание подтверждения (события {event_ids}).")
+        self.write_detailed_report(f"Звонок {action_id} принят, ожидание подтверждения (события {event_ids}).")
 
     def finalize_event(self, panel_id, event_id):
-        self.logger.debug(f"Финализация события {event_id} для объекта {panel_id}.")
-        self.write_detailed_report(f"Финализация события {event_id} для объекта {panel_id}.")
-        self.update_event_status(panel_id, event_id, state_event=2)
-        self.delete_dependent_records(event_id)
-        self.delete_event_from_temp(panel_id, event_id)
-        self.create_archive_record(event_id, 'Окончание обработки')
-        self.logger.info(f"Обработка события {event_id} для объекта {panel_id} завершена.")
-        self.write_detailed_report(f"Обработка события {event_id} для объекта {panel_id} завершена.")
+        """Завершает событие вместе со всеми объединёнными с ним событиями объекта."""
+        event_ids = self.release_incident(panel_id, event_id)
+        self.logger.debug(f"Финализация событий {event_ids} для объекта {panel_id}.")
+        self.write_detailed_report(f"Финализация событий {event_ids} для объекта {panel_id}.")
+        self.update_events_status(panel_id, event_ids, state_event=2)
+        self.delete_dependent_records(event_ids)
+        self.delete_events_from_temp(panel_id, event_ids)
+        self.create_archive_records(event_ids, 'Окончание обработки')
+        self.logger.info(f"Обработка событий {event_ids} для объекта {panel_id} завершена.")
+        self.write_detailed_report(f"Обработка событий {event_ids} для объекта {panel_id} завершена.")
         if self.parent:
             self.parent.remove_alarm_card(panel_id)
 
-    def delete_dependent_records(self, event_id):
-        delete_sql = "DELETE FROM dbo.TempDetails WHERE Event_id = %s"
+    def finalize_events_bulk(self, incidents):
+        """Пакетное завершение инцидентов разных объектов (массовое событие)."""
+        event_ids = []
+        for incident in incidents:
+            event_ids.extend(self.release_incident(incident.get('panel_id'), incident.get('event_id')))
+            for merged_event in self.incident_events(incident):
+                if merged_event.get('event_id') not in event_ids:
+                    event_ids.append(merged_event.get('event_id'))
+        self.update_events_status(None, event_ids, state_event=2)
+        self.delete_dependent_records(event_ids)
+        self.delete_events_from_temp(None, event_ids)
+        self.create_archive_records(event_ids, 'Окончание обработки')
+        self.logger.info(f"Пакетно завершено {len(event_ids)} событий {len(incidents)} объектов.")
+        self.write_detailed_report(f"Пакетно завершено {len(event_ids)} событий {len(incidents)} объектов.")
+        if self.parent:
+            for incident in incidents:
+                self.parent.remove_alarm_card(incident.get('panel_id'))
+
+    def delete_dependent_records(self, event_ids):
         try:
-            self.db_connector.execute(delete_sql, (event_id,))
+            for chunk in chunked(event_ids, 1000):
+                placeholders = ', '.join(['%s'] * len(chunk))
+                delete_sql = f"DELETE FROM dbo.TempDetails WHERE Event_id IN ({placeholders})"
+                self.db_connector.execute(delete_sql, tuple(chunk))
             self.db_connector.commit()
-            self.logger.debug(f"TempDetails для event_id={event_id} удалены.")
-            self.write_detailed_report(f"TempDetails для event_id={event_id} удалены.")
+            self.logger.debug(f"TempDetails для event_id={event_ids} удалены.")
+            self.write_detailed_report(f"TempDetails для event_id={event_ids} удалены.")
         except Exception as e:
-            self.logger.error(f"Ошибка при удалении TempDetails (event_id={event_id}): {e}")
-            self.write_detailed_report(f"Ошибка при удалении TempDetails (event_id={event_id}): {e}")
+            self.logger.error(f"Ошибка при удалении TempDetails (event_id={event_ids}): {e}")
+            self.write_detailed_report(f"Ошибка при удалении TempDetails (event_id={event_ids}): {e}")
 
-    def delete_event_from_temp(self, panel_id, event_id):
-        delete_sql = "DELETE FROM dbo.Temp WHERE Panel_id = %s AND Event_id = %s"
+    def delete_events_from_temp(self, panel_id, event_ids):
         try:
-            self.db_connector.execute(delete_sql, (panel_id, event_id))
+            for chunk in chunked(event_ids, 1000):
+                placeholders = ', '.join(['%s'] * len(chunk))
+                if panel_id is None:
+                    delete_sql = f"DELETE FROM dbo.Temp WHERE Event_id IN ({placeholders})"
+                    params = tuple(chunk)
+                else:
+                    delete_sql = f"DELETE FROM dbo.Temp WHERE Panel_id = %s AND Event_id IN ({placeholders})"
+                    params = (panel_id, *chunk)
+                self.db_connector.execute(delete_sql, params)
             self.db_connector.commit()
-            self.logger.debug(f"Событие {event_id} удалено из Temp.")
-            self.write_detailed_report(f"Событие {event_id} удалено из Temp.")
+            self.logger.debug(f"События {event_ids} удалены из Temp.")
+            self.write_detailed_report(f"События {event_ids} удалены из Temp.")
         except Exception as e:
-            self.logger.error(f"Ошибка при удалении события {event_id} из Temp: {e}")
-            self.write_detailed_report(f"Ошибка при удалении события {event_id} из Temp: {e}")
+            self.logger.error(f"Ошибка при удалении событий {event_ids} из Temp: {e}")
+            self.write_detailed_report(f"Ошибка при удалении событий {event_ids} из Temp: {e}")
+
+    def notify_responsibles_sms(self, event_id, panel_id, event, responsibles):
+        """
+        Отправляет SMS по событию всем указанным ответственным параллельно (через диспетчер).
+        На каждый номер по событию уходит не больше одного SMS, сколько бы раз ни
+        срабатывала политика и сколько бы раз номер ни встречался в списке.
+        """
+        recipients = []
+        with self.lock:
+            notified = self.sms_notified.setdefault(event_id, set())
+            for responsible in responsibles:
+                phone_number = responsible.get('phone_number')
+                phone_to_sms = self.test_phone_number if self.test_mode else phone_number
+                if not phone_number or phone_to_sms in notified:
+                    continue
+                notified.add(phone_to_sms)
+                recipients.append(responsible)
+        if not recipients:
+            return
+        self.write_detailed_report(f"SMS по событию {event_id} ставятся в отправку для {len(recipients)} ответственных.")
+        for responsible in recipients:
+            self.send_sms_to_responsible(responsible, event_id, panel_id, event)
 
     def send_sms_to_responsible(self, responsible, event_id, panel_id, event):
         phone_number = responsible.get('phone_number')
@@ -635,34 +1841,79 @@ class EventProcessor(QObject):
             self.write_detailed_report(f"Ошибка при форматировании SMS для события {event_id}: {e}")
             return
 
-        sms_sent = send_http_sms(
-            phone_number=phone_to_sms,
-            message=message,
-            url=self.sms_url,
-            login=self.sms_login,
-            password=self.sms_password,
-            shortcode=self.sms_shortcode
+        self.sms_dispatcher.submit(
+            phone_to_sms, message,
+            context={'event_id': event_id, 'panel_id': panel_id, 'event': event, 'responsible': responsible},
+            callback=self.report_sms_result
         )
-        if sms_sent:
-            self.logger.info(f"SMS отправлено на номер {phone_to_sms}.")
-            self.write_detailed_report(f"SMS отправлено на номер {phone_to_sms} для события {event_id}.")
-            report_data = {
-                'Дата и время обработки': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                'ID объекта': panel_id,
-                'ID события': event_id,
-                'Код события': event.get('code'),
-                'Время события': event.get('time_event').strftime('%Y-%m-%d %H:%M:%S'),
-                'Адрес': event.get('address'),
-                'Название компании': event.get('company_name'),
-                'Ответственный': responsible_name,
-                'Номер телефона': phone_number,
-                'Статус': 'SMS отправлено',
-                'Дополнительная информация': ''
-            }
-            self.write_to_report(report_data)
+
+    def create_sms_transport(self):
+        """Транспорт SMS по настройке [SMS] backend: http (по умолчанию) или smpp."""
+        backend = self.config.get('SMS', 'backend', fallback='http').strip().lower()
+        if backend == 'smpp':
+            from ui.smpp_transport import SMPPTransport
+            self.logger.info("SMS отправляются через SMPP.")
+            return SMPPTransport(
+                self.config.get('SMPP', 'host'),
+                int(self.config.get('SMPP', 'port', fallback='2775')),
+                self.config.get('SMPP', 'system_id'),
+                self.config.get('SMPP', 'password'),
+                system_type=self.config.get('SMPP', 'system_type', fallback='SMPP'),
+                source_addr=self.config.get('SMPP', 'source_addr', fallback=self.sms_shortcode),
+                window=int(self.config.get('SMPP', 'window', fallback='10')),
+                enquire_link_interval=float(self.config.get('SMPP', 'enquire_link_seconds', fallback='30')),
+                submit_timeout=float(self.config.get('SMPP', 'submit_timeout', fallback='30')),
+                on_delivery=self.report_sms_delivery,
+                receipt_ttl=float(self.config.get('SMPP', 'receipt_ttl_seconds', fallback='86400')),
+                max_receipts=int(self.config.get('SMPP', 'max_receipts', fallback='10000'))
+            )
+        return HTTPSMSTransport(
+            self.sms_url, self.sms_login, self.sms_password, self.sms_shortcode,
+            pool_size=int(self.config.get('SMS', 'workers', fallback='4')),
+            timeout=float(self.config.get('SMS', 'timeout', fallback='10')),
+            verify=self.config.getboolean('SMS', 'verify_ssl', fallback=False)
+        )
+
+    def report_sms_delivery(self, handle, stat):
+        """Квитанция доставки SMS (SMPP deliver_sm), сопоставленная с событием по дескриптору."""
+        context = handle.context or {}
+        if 'incidents' in context:
+            event_ids = ', '.join(str(i.get('event_id')) for i in context['incidents'])
+        else:
+            event_ids = str(context.get('event_id'))
+        if stat == 'DELIVRD':
+            self.logger.info(f"SMS на {handle.phone_number} доставлено (события {event_ids}).")
+            self.write_detailed_report(f"SMS на {handle.phone_number} доставлено (события {event_ids}).")
         else:
-            self.logger.error(f"Не удалось отправить SMS на {phone_to_sms}.")
-            self.write_detailed_report(f"Не удалось отправить SMS на {phone_to_sms} для события {event_id}.")
+            self.logger.warning(f"SMS на {handle.phone_number} не доставлено: {stat} (события {event_ids}).")
+            self.write_detailed_report(f"SMS на {handle.phone_number} не доставлено: {stat} (события {event_ids}).")
+
+    def report_sms_result(self, handle):
+        """Журнал и отчёт по результату SMS события (вызывается диспетчером SMS)."""
+        context = handle.context
+        event_id = context['event_id']
+        event = context['event']
+        result = handle.result()
+        if not result.ok:
+            self.logger.error(f"Не удалось отправить SMS на {handle.phone_number}: {result.detail}")
+            self.write_detailed_report(f"Не удалось отправить SMS на {handle.phone_number} для события {event_id}.")
+            return
+        self.logger.info(f"SMS отправлено на номер {handle.phone_number}.")
+        self.write_detailed_report(f"SMS отправлено на номер {handle.phone_number} для события {event_id}.")
+        report_data = {
+            'Дата и время обработки': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'ID объекта': context['panel_id'],
+            'ID события': event_id,
+            'Код события': event.get('code'),
+            'Время события': event.get('time_event').strftime('%Y-%m-%d %H:%M:%S'),
+            'Адрес': event.get('address'),
+            'Название компании': event.get('company_name'),
+            'Ответственный': context['responsible'].get('responsible_name'),
+            'Номер телефона': context['responsible'].get('phone_number'),
+            'Статус': 'SMS отправлено',
+            'Дополнительная информация': ''
+        }
+        self.write_to_report(report_data)
 
     def create_archive_event(self, event):
         if not self.db_connector:
@@ -702,42 +1953,101 @@ class EventProcessor(QObject):
             self.write_detailed_report(f"Ошибка при создании записи в архив для события {event['event_id']}: {e}")
             return False
 
+    def create_archive_events(self, events):
+        """Пакетный вариант create_archive_event: одна проверка и многострочный INSERT на пакет."""
+        if not self.db_connector:
+            self.logger.error("db_connector не инициализирован.")
+            self.write_detailed_report("db_connector не инициализирован.")
+            return False
+        date_now = datetime.now()
+        table_name = f"pult4db_archives.dbo.archive{date_now.strftime('%Y%m')}01"
+        try:
+            for chunk in chunked(events, 400):
+                placeholders = ', '.join(['%s'] * len(chunk))
+                check_sql = f"SELECT Event_id FROM {table_name} WHERE Event_id IN ({placeholders})"
+                rows = self.db_connector.fetchall(check_sql, tuple(e['event_id'] for e in chunk))
+                archived = {row['Event_id'] for row in rows}
+                to_insert = [e for e in chunk if e['event_id'] not in archived]
+                if not to_insert:
+                    continue
+                values = ', '.join(
+                    ['(%s, %s, %s, NULL, NULL, NULL, %s, NULL, %s, NULL, NULL, NULL, NULL, NULL, NULL, 0, NULL, NULL)']
+                    * len(to_insert)
+                )
+                insert_sql = f"""
+                INSERT INTO {table_name} (
+                    Event_id, Date_Key, Panel_id, Group_, Line, Zone, Code, CodeGroup,
+                    TimeEvent, Phone, MeterCount, TimeMeterCount, StateEvent,
+                    Event_Parent_id, Result_Text, BitMask, DeviceEventTime, ResultID
+                )
+                VALUES {values}
+                """
+                params = []
+                for e in to_insert:
+                    params.extend((e['event_id'], int(date_now.strftime('%Y%m%d')), e['panel_id'], e['code'], e['time_event']))
+                self.db_connector.execute(insert_sql, tuple(params))
+            self.db_connector.commit()
+            self.logger.info(f"Пакетная запись {len(events)} событий в архив {table_name} выполнена.")
+            self.write_detailed_report(f"Пакетная запись {len(events)} событий в архив {table_name} выполнена.")
+            return True
+        except Exception as e:
+            self.db_connector.rollback()
+            self.logger.error(f"Ошибка при пакетной записи в архив: {e}")
+            self.write_detailed_report(f"Ошибка при пакетной записи в архив: {e}")
+            return False
+
     def create_archive_record(self, event_id, name_state):
+        self.create_archive_records([event_id], name_state)
+
+    def create_archive_records(self, event_ids, name_state):
+        """Создаёт записи eventservice для нескольких событий одним INSERT."""
         if not self.db_connector:
             self.logger.error("db_connector не инициализирован.")
             self.write_detailed_report("db_connector не инициализирован для создания записи в архиве.")
             return
         date_now = datetime.now()
         table_name = f"pult4db_archives.dbo.eventservice{date_now.strftime('%Y%m')}01"
-        sql = f"""
-        INSERT INTO {table_name} (
-            NameState, Event_id, Computer, OperationTime, Date_Key, PersonName
-        )
-        VALUES (%s, %s, %s, %s, %s, %s)
-        """
-        params = (
-            name_state,
-            event_id,
-            socket.gethostname(),
-            datetime.now(),
-            int(date_now.strftime('%Y%m%d')),
-            'Смена 1.0'
-        )
         try:
-            self.db_connector.execute(sql, params)
+            # 6 параметров на строку: 300 строк укладываются в лимит 2100 параметров SQL Server
+            for chunk in chunked(event_ids, 300):
+                values = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(chunk))
+                sql = f"""
+                INSERT INTO {table_name} (
+                    NameState, Event_id, Computer, OperationTime, Date_Key, PersonName
+                )
+                VALUES {values}
+                """
+                params = []
+                for event_id in chunk:
+                    params.extend((
+                        name_state,
+                        event_id,
+                        socket.gethostname(),
+                        date_now,
+                        int(date_now.strftime('%Y%m%d')),
+                        'Смена 1.0'
+                    ))
+                self.db_connector.execute(sql, tuple(params))
             self.db_connector.commit()
-            self.logger.debug(f"Запись в {table_name} создана для события {event_id}.")
-            self.write_detailed_report(f"Запись в архиве {table_name} создана для события {event_id}.")
+            self.logger.debug(f"Запись в {table_name} создана для событий {event_ids}.")
+            self.write_detailed_report(f"Запись в архиве {table_name} создана для событий {event_ids}.")
         except Exception as e:
             self.db_connector.rollback()
             self.logger.error(f"Ошибка при создании записи в {table_name}: {e}")
-            self.write_detailed_report(f"Ошибка при создании записи в {table_name} для события {event_id}: {e}")
+            self.write_detailed_report(f"Ошибка при создании записи в {table_name} для событий {event_ids}: {e}")
 
     def stop(self):
         self.stop_processing()
         if self.call_manager:
             self.call_manager.stop()
             self.write_detailed_report("CallManager остановлен.")
+        self.sms_dispatcher.shutdown(wait=False)
+        if self.prefetch_executor:
+            self.prefetch_executor.shutdown(wait=False)
+        if self.prerender_job:
+            self.prerender_job.stop()
+        if self.journal:
+            self.journal.close()
         if self.synthesizer:
             self.synthesizer.stop_http_server()
             self.write_detailed_report("VoiceSynthesizer остановлен.")
@@ -0,0 +1,100 @@
+# keyed_executor.py
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger('keyed_executor')
+
+
+class KeyedExecutor:
+    """
+    Пул потоков с упорядочиванием по ключу.
+
+    Задачи с одинаковым ключом (например, panel_id) выполняются строго по одной
+    и в порядке постановки. Задачи с разными ключами распределяются по всем
+    рабочим потокам пула. Глобальной блокировки на время выполнения задачи нет:
+    блокировка берётся только на изменение очередей ключей.
+    """
+
+    def __init__(self, max_workers):
+        """
+        :param max_workers: Количество рабочих потоков.
+        """
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        # Ключ -> очередь ожидающих задач (fn, args, kwargs, future).
+        # Наличие ключа в словаре означает, что по нему сейчас выполняется задача.
+        self._queues = {}
+        self._shutdown = False
+
+    def submit(self, key, fn, *args, **kwargs):
+        """
+        Ставит задачу в очередь ключа. Возвращает Future с результатом fn.
+        """
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("KeyedExecutor остановлен, новые задачи не принимаются.")
+            pending = self._queues.get(key)
+            if pending is not None:
+                # По ключу уже идёт обработка — ждём своей очереди
+                pending.append((fn, args, kwargs, future))
+                return future
+            self._queues[key] = deque()
+        self._executor.submit(self._run, key, fn, args, kwargs, future)
+        return future
+
+    def _run(self, key, fn, args, kwargs, future):
+        """Выполняет задачу и передаёт пулу следующую задачу того же ключа."""
+        if future.set_running_or_notify_cancel():
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                logger.error(f"Ошибка в задаче ключа {key}: {e}")
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+        self._schedule_next(key)
+
+    def _schedule_next(self, key):
+        with self._lock:
+            pending = self._queues.get(key)
+            if not pending:
+                self._queues.pop(key, None)
+                return
+            if self._shutdown:
+                # Задачи, не успевшие начаться до остановки, отменяются
+                for _, _, _, rest in pending:
+                    rest.cancel()
+                self._queues.pop(key, None)
+                return
+            fn, args, kwargs, future = pending.popleft()
+
+        # Следующая задача ключа ставится в конец общего пула, чтобы
+        # один «горячий» ключ не занимал рабочий поток бесконечно.
+        try:
+            self._executor.submit(self._run, key, fn, args, kwargs, future)
+        except RuntimeError:
+            # Пул остановлен между проверкой флага и постановкой задачи
+            future.cancel()
+            with self._lock:
+                for _, _, _, rest in self._queues.pop(key, ()):
+                    rest.cancel()
+
+    def pending_count(self):
+        """Количество задач: выполняемых и ожидающих в очередях ключей."""
+        with self._lock:
+            return sum(1 + len(q) for q in self._queues.values())
+
+    def active_keys(self):
+        """Ключи, по которым сейчас есть выполняемые или ожидающие задачи."""
+        with self._lock:
+            return set(self._queues.keys())
+
+    def shutdown(self, wait=True):
+        """Останавливает пул. Ожидающие в очередях ключей задачи отменяются."""
+        with self._lock:
+            self._shutdown = True
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,194 @@
+# notification_journal.py
+import json
+import time
+import queue
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger('notification_journal')
+
+# Состояния задания оповещения
+JOB_PENDING = 'pending'    # звонок ответственному attempt ещё не сделан (ждёт next_attempt_at)
+JOB_DIALING = 'dialing'    # звонок ответственному attempt инициирован, исход неизвестен
+
+
+def encode(value):
+    """
+    JSON с сохранением datetime (события содержат время события, срок обработки и т. п.).
+    Прочие типы из БД (Decimal, date, bytes) сохраняются строкой.
+    """
+    def default(obj):
+        if isinstance(obj, datetime):
+            return {'__datetime__': obj.isoformat()}
+        return str(obj)
+    return json.dumps(value, ensure_ascii=False, default=default)
+
+
+def decode(text):
+    def object_hook(obj):
+        if len(obj) == 1 and '__datetime__' in obj:
+            return datetime.fromisoformat(obj['__datetime__'])
+        return obj
+    return json.loads(text, object_hook=object_hook)
+
+
+class NotificationJournal:
+    """
+    Журнал заданий оповещения в локальной SQLite (WAL).
+
+    Каждое задание — инцидент, по которому идёт обзвон: событие, список ответственных,
+    индекс текущей попытки и её состояние. После перезапуска процесс продолжает
+    цепочку с того места, где остановился, и не повторяет уже сделанные звонки.
+
+    Запись идёт в фоновом потоке: изменения, накопившиеся за flush_interval, фиксируются
+    одной транзакцией (один fsync на пакет). Вызов с wait=True дожидается фиксации
+    пакета, в который попало изменение, — так отмечается звонок перед его инициацией.
+    Завершённые задания удаляются; когда активных заданий не остаётся, WAL усекается.
+    """
+
+    def __init__(self, path, flush_interval=0.2, batch_size=100):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=FULL')
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                event_id INTEGER PRIMARY KEY,
+                panel_id INTEGER,
+                state TEXT NOT NULL,
+                attempt INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL,
+                event TEXT NOT NULL,
+                responsibles TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self.lock = threading.Lock()
+        self.pending = queue.Queue()
+        self.counters = {'writes': 0, 'batches': 0, 'compactions': 0}
+        self.running = True
+        self.thread = threading.Thread(target=self.writer_loop, daemon=True)
+        self.thread.start()
+
+    def start(self, event, responsibles):
+        """Новое задание: звонок первому ответственному."""
+        now = time.time()
+        self.submit(
+            "INSERT OR REPLACE INTO jobs (event_id, panel_id, state, attempt, next_attempt_at, event, responsibles,"
+            " created_at, updated_at) VALUES (?, ?, ?, 0, NULL, ?, ?, ?, ?)",
+            (event.get('event_id'), event.get('panel_id'), JOB_PENDING, encode(event), encode(responsibles), now, now)
+        )
+
+    def dialing(self, attempts, wait=True):
+        """Отмечает инициацию звонков: attempts — список (event_id, индекс попытки)."""
+        now = time.time()
+        done = None
+        for event_id, attempt in attempts:
+            done = self.submit(
+                "UPDATE jobs SET state = ?, attempt = ?, next_attempt_at = NULL, updated_at = ? WHERE event_id = ?",
+                (JOB_DIALING, attempt, now, event_id)
+            )
+        if wait and done is not None:
+            done.wait()
+
+    def schedule(self, event_id, attempt, next_attempt_at):
+        """Следующая попытка attempt запланирована на next_attempt_at (time.time())."""
+        self.submit(
+            "UPDATE jobs SET state = ?, attempt = ?, next_attempt_at = ?, updated_at = ? WHERE event_id = ?",
+            (JOB_PENDING, attempt, next_attempt_at, time.time(), event_id)
+        )
+
+    def complete(self, event_id):
+        self.submit("DELETE FROM jobs WHERE event_id = ?", (event_id,))
+
+    def submit(self, sql, params):
+        done = threading.Event()
+        if not self.running:
+            done.set()
+            return done
+        self.pending.put((sql, params, done))
+        return done
+
+    def jobs(self):
+        """Незавершённые задания (для возобновления после перезапуска)."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT event_id, panel_id, state, attempt, next_attempt_at, event, responsibles, created_at"
+                " FROM jobs ORDER BY created_at"
+            ).fetchall()
+        jobs = []
+        for event_id, panel_id, state, attempt, next_attempt_at, event, responsibles, created_at in rows:
+            try:
+                jobs.append({
+                    'event_id': event_id,
+                    'panel_id': panel_id,
+                    'state': state,
+                    'attempt': attempt,
+                    'next_attempt_at': next_attempt_at,
+                    'event': decode(event),
+                    'responsibles': decode(responsibles),
+                    'created_at': created_at,
+                })
+            except ValueError as e:
+                logger.error(f"Повреждённое задание {event_id} в журнале оповещений: {e}")
+        return jobs
+
+    def writer_loop(self):
+        while self.running or not self.pending.empty():
+            try:
+                batch = [self.pending.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.write_batch(batch)
+
+    def write_batch(self, batch):
+        with self.lock:
+            try:
+                self.conn.execute('BEGIN')
+                for sql, params, _ in batch:
+                    self.conn.execute(sql, params)
+                self.conn.execute('COMMIT')
+                self.counters['writes'] += len(batch)
+                self.counters['batches'] += 1
+                if any(sql.startswith('DELETE') for sql, _, _ in batch):
+                    self.compact()
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка записи журнала оповещений ({len(batch)} изменений): {e}")
+                try:
+                    self.conn.execute('ROLLBACK')
+                except sqlite3.Error:
+                    pass
+        for _, _, done in batch:
+            done.set()
+
+    def compact(self):
+        """Усекает WAL, когда активных заданий не осталось."""
+        if self.conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]:
+            return
+        self.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        self.counters['compactions'] += 1
+
+    def stats(self):
+        with self.lock:
+            active = self.conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+            return dict(self.counters, active=active)
+
+    def close(self):
+        self.running = False
+        self.thread.join(timeout=5)
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,182 @@
+# prerender.py
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from ui.tts_segments import split_template, SEGMENT_VARIABLE
+
+logger = logging.getLogger('prerender')
+
+# Переменные, значения которых заранее неизвестны: шаблон с ними не пререндерится
+UNPREDICTABLE_VARIABLES = ('event_time',)
+
+
+class RateLimiter:
+    """Не больше rate запросов в секунду (равномерно) для всех потоков."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_at)
+            self.next_at = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class PrerenderJob:
+    """
+    Ночной пакетный синтез сообщений тревоги в кэш TTS.
+
+    Для каждого объекта из справочника и каждого кода из [EventCodes] синтезируется
+    сообщение, которое понадобится при тревоге, — к её моменту аудио уже лежит в кэше.
+    Задача запускается раз в сутки в окне [Prerender] start_hour..end_hour с ограничением
+    числа потоков и частоты запросов. Для каждого объекта запоминается отпечаток
+    (шаблон, настройки голоса, адрес, название компании, коды): при следующем запуске
+    синтезируются только объекты, у которых он изменился.
+
+    Пакет останавливается, когда кэш заполнен до fill_ratio, чтобы не вытеснять
+    сообщения, которые уже использовались.
+    """
+
+    STATE_FILE = 'prerender_state.json'
+
+    def __init__(self, config, db_connector, synthesizer, build_template_vars, template, backend, event_codes):
+        self.db_connector = db_connector
+        self.synthesizer = synthesizer
+        self.build_template_vars = build_template_vars
+        self.template = template
+        self.backend = backend
+        self.event_codes = event_codes
+        self.database_name = config.get('Database', 'database', fallback='Pult4DB')
+        self.start_hour = int(config.get('Prerender', 'start_hour', fallback='2'))
+        self.end_hour = int(config.get('Prerender', 'end_hour', fallback='5'))
+        self.workers = int(config.get('Prerender', 'workers', fallback='2'))
+        self.rate_limiter = RateLimiter(float(config.get('Prerender', 'rate_per_second', fallback='2')))
+        self.fill_ratio = float(config.get('Prerender', 'cache_fill_ratio', fallback='0.8'))
+        self.state_path = os.path.join(synthesizer.base_dir, self.STATE_FILE)
+        self.state = self.load_state()
+        self.state_lock = threading.Lock()
+        self.last_run_date = None
+        self.stop_event = threading.Event()
+
+    def load_state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Не удалось прочитать состояние пререндера {self.state_path}: {e}")
+            return {}
+
+    def save_state(self):
+        tmp_path = self.state_path + '.tmp'
+        with self.state_lock:
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.state, f)
+                os.replace(tmp_path, self.state_path)
+            except OSError as e:
+                logger.error(f"Не удалось сохранить состояние пререндера: {e}")
+
+    def start(self):
+        threading.Thread(target=self.run_forever, daemon=True).start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def in_window(self, now=None):
+        hour = (now or datetime.now()).hour
+        if self.start_hour <= self.end_hour:
+            return self.start_hour <= hour < self.end_hour
+        return hour >= self.start_hour or hour < self.end_hour
+
+    def run_forever(self):
+        while not self.stop_event.wait(60):
+            today = datetime.now().date()
+            if self.last_run_date != today and self.in_window():
+                self.last_run_date = today
+                self.run()
+
+    def can_prerender(self):
+        if not self.template or '<speak>' in self.template:
+            return False
+        variables = {value for kind, value in split_template(self.template) if kind == SEGMENT_VARIABLE}
+        return not variables & set(UNPREDICTABLE_VARIABLES)
+
+    def load_panels(self):
+        query = f"""
+        SELECT b.Panel_id, COALESCE(d.address, '') as address, d.CompanyName
+        FROM {self.database_name}.dbo.Panel b
+        LEFT JOIN {self.database_name}.dbo.Groups c ON c.Panel_id = b.Panel_id
+        LEFT JOIN {self.database_name}.dbo.Company d ON d.ID = c.CompanyID
+        """
+        try:
+            return self.db_connector.fetchall(query)
+        except Exception as e:
+            logger.error(f"Ошибка загрузки справочника объектов для пререндера: {e}")
+            return []
+
+    def fingerprint(self, row):
+        settings = self.synthesizer.voice_settings()
+        raw = '\x1f'.join(str(part) for part in (
+            self.template, self.backend, settings['voice'], settings['emotion'], settings['speed'],
+            row['address'], row['CompanyName'], ','.join(self.event_codes)
+        ))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+    def cache_full(self):
+        cache = self.synthesizer.cache
+        return cache.stats()['bytes'] >= cache.max_bytes * self.fill_ratio
+
+    def run(self):
+        """Один проход пакета. Возвращает число синтезированных объектов."""
+        if not self.can_prerender():
+            logger.info("Шаблон сообщения содержит заранее неизвестные данные, пререндер пропущен.")
+            return 0
+        panels = [row for row in self.load_panels()
+                  if self.state.get(str(row['Panel_id'])) != self.fingerprint(row)]
+        logger.info(f"Пререндер: к синтезу {len(panels)} объектов.")
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(self.render_panel, panels))
+        self.save_state()
+        done = sum(1 for ok in results if ok)
+        logger.info(f"Пререндер завершён: обработано {done} из {len(panels)} объектов.")
+        return done
+
+    def render_panel(self, row):
+        """Синтезирует сообщения всех кодов для объекта."""
+        if self.stop_event.is_set() or not self.in_window() or self.cache_full():
+            return False
+        for code in self.event_codes:
+            event = {
+                'panel_id': row['Panel_id'],
+                'code': code,
+                'codes': [code],
+                'time_event': datetime.now(),
+                'address': row['address'],
+                'company_name': row['CompanyName'],
+            }
+            self.rate_limiter.wait()
+            audio_files = self.synthesizer.synthesize(
+                row['Panel_id'], self.build_template_vars(event), self.template, self.backend
+            )
+            if not audio_files:
+                return False
+            # Пререндер не держит запись: её закрепит звонок, когда она понадобится
+            self.synthesizer.release(audio_files.get('cache_key'))
+        with self.state_lock:
+            self.state[str(row['Panel_id'])] = self.fingerprint(row)
+        return True
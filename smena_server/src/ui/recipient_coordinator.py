@@ -0,0 +1,89 @@
+# recipient_coordinator.py
+import threading
+from collections import deque
+
+
+class RecipientCoordinator:
+    """
+    Координатор звонков по номеру телефона.
+
+    Гарантирует, что на один номер одновременно идёт не более одного звонка.
+    Оповещения для номера, на который уже звонят, ставятся в очередь номера;
+    когда звонок завершается, все накопленные оповещения выдаются разом,
+    чтобы их можно было объединить в один звонок с общим сообщением.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.busy = set()
+        # phone -> deque оповещений (словари с ключом 'event_id')
+        self.pending = {}
+
+    def acquire(self, phone, notification):
+        """
+        Пытается занять номер под оповещение.
+
+        :return: True — номер свободен и занят, звонить можно сразу;
+                 False — на номер уже звонят, оповещение поставлено в очередь.
+        """
+        with self.lock:
+            if phone not in self.busy:
+                self.busy.add(phone)
+                return True
+            self.pending.setdefault(phone, deque()).append(notification)
+            return False
+
+    def release(self, phone, is_active=None):
+        """
+        Освобождает номер после завершения звонка.
+
+        :param is_active: Функция is_active(event_id); оповещения событий, для которых она
+                          вернула False (событие уже завершено), отбрасываются.
+        :return: Список ожидающих оповещений. Если он не пуст, номер остаётся
+                 занятым — вызывающий обязан позвонить по ним и снова вызвать release.
+        """
+        while True:
+            with self.lock:
+                queued = self.pending.pop(phone, None)
+                if not queued:
+                    self.busy.discard(phone)
+                    return []
+            # Проверка вне блокировки координатора: is_active берёт блокировки вызывающего
+            if is_active is not None:
+                queued = [n for n in queued if is_active(n.get('event_id'))]
+            if queued:
+                return list(queued)
+            # Все ожидавшие оповещения устарели — номер освобождается, если за это время
+            # в очередь не попали новые
+
+    def requeue(self, phone, notifications):
+        """Возвращает оповещения в начало очереди номера (номер должен быть занят)."""
+        with self.lock:
+            queued = self.pending.setdefault(phone, deque())
+            queued.extendleft(reversed(notifications))
+
+    def drop_event(self, event_id):
+        """Удаляет из очередей все оповещения события. Возвращает количество удалённых."""
+        removed = 0
+        with self.lock:
+            for phone in list(self.pending):
+                queued = self.pending[phone]
+                kept = deque(n for n in queued if n.get('event_id') != event_id)
+                removed += len(queued) - len(kept)
+                if kept:
+                    self.pending[phone] = kept
+                else:
+                    del self.pending[phone]
+        return removed
+
+    def is_busy(self, phone):
+        with self.lock:
+            return phone in self.busy
+
+    def stats(self):
+        """Количество занятых номеров и ожидающих оповещений."""
+        with self.lock:
+            return {
+                'busy_numbers': len(self.busy),
+                'queued_notifications': sum(len(q) for q in self.pending.values()),
+            }
@@ -0,0 +1,86 @@
+# severity_policy.py
+from datetime import datetime, timedelta
+
+SEVERITY_CRITICAL = 'critical'
+SEVERITY_HIGH = 'high'
+SEVERITY_LOW = 'low'
+
+# Порядок важности: меньше — важнее (используется как приоритет очереди)
+SEVERITY_RANK = {SEVERITY_CRITICAL: 0, SEVERITY_HIGH: 1, SEVERITY_LOW: 2}
+
+# Каналы оповещения от дорогого к дешёвому
+CHANNEL_CALLS = 'calls'
+CHANNEL_SMS = 'sms'
+CHANNEL_REPORT = 'report'
+
+DEFAULT_CRITICAL_CODES = 'E100,E101,E111,E120,E121,E130,E140,E201,$BA,85'
+DEFAULT_HIGH_CODES = 'E305,E333,E345,E357,E371,E373,$AT,$TA,99'
+
+
+class SeverityPolicy:
+    """
+    Классы важности событий, бюджеты времени и правила деградации при перегрузке.
+
+    Настройки берутся из секции [Severity]:
+      critical / high                  — коды событий по классам (остальные — low);
+      <класс>_budget_seconds           — бюджет времени на событие от момента постановки в очередь;
+      shed_queue_depth                 — глубина очереди, после которой включается деградация
+                                         (0 или нет секции — деградация выключена);
+      shed_max_age_seconds             — возраст старейшего ожидающего события, после которого
+                                         включается деградация;
+      low_degraded_channel             — канал для low при деградации: sms (по умолчанию)
+                                         или report (только отчёт, без оповещения).
+    Критические события никогда не деградируют. При выключенной деградации все события
+    идут на обзвон, бюджеты времени не применяются.
+    """
+
+    def __init__(self, config):
+        def codes(option, fallback):
+            return {c.strip() for c in config.get('Severity', option, fallback=fallback).split(',') if c.strip()}
+
+        self.critical_codes = codes('critical', DEFAULT_CRITICAL_CODES)
+        self.high_codes = codes('high', DEFAULT_HIGH_CODES)
+        self.budgets = {
+            SEVERITY_CRITICAL: timedelta(seconds=int(config.get('Severity', 'critical_budget_seconds', fallback='900'))),
+            SEVERITY_HIGH: timedelta(seconds=int(config.get('Severity', 'high_budget_seconds', fallback='1800'))),
+            SEVERITY_LOW: timedelta(seconds=int(config.get('Severity', 'low_budget_seconds', fallback='3600'))),
+        }
+        self.shed_queue_depth = int(config.get('Severity', 'shed_queue_depth', fallback='0'))
+        self.shed_enabled = self.shed_queue_depth > 0
+        self.shed_max_age = timedelta(seconds=int(config.get('Severity', 'shed_max_age_seconds', fallback='300')))
+        self.low_degraded_channel = config.get('Severity', 'low_degraded_channel', fallback=CHANNEL_SMS).strip().lower()
+        if self.low_degraded_channel not in (CHANNEL_SMS, CHANNEL_REPORT):
+            self.low_degraded_channel = CHANNEL_SMS
+
+    def classify(self, codes):
+        """Класс важности по коду или списку кодов (берётся самый важный)."""
+        if isinstance(codes, str):
+            codes = [codes]
+        codes = set(codes or [])
+        if codes & self.critical_codes:
+            return SEVERITY_CRITICAL
+        if codes & self.high_codes:
+            return SEVERITY_HIGH
+        return SEVERITY_LOW
+
+    def deadline(self, severity, received_at):
+        return received_at + self.budgets[severity]
+
+    def is_overloaded(self, queue_depth, oldest_received_at, now=None):
+        """Перегрузка: очередь глубже порога или старейшее событие ждёт дольше порога."""
+        if not self.shed_enabled:
+            return False
+        now = now or datetime.now()
+        if queue_depth > self.shed_queue_depth:
+            return True
+        if self.shed_max_age and oldest_received_at is not None and now - oldest_received_at > self.shed_max_age:
+            return True
+        return False
+
+    def degraded_channel(self, severity):
+        """Канал для события при перегрузке или истёкшем бюджете."""
+        if severity == SEVERITY_CRITICAL:
+            return CHANNEL_CALLS
+        if severity == SEVERITY_HIGH:
+            return CHANNEL_SMS
+        return self.low_degraded_channel
@@ -0,0 +1,270 @@
+# smpp_transport.py
+import re
+import time
+import logging
+import threading
+
+import smpplib.client
+import smpplib.consts
+import smpplib.exceptions
+import smpplib.gsm
+import smpplib.smpp
+
+from ui.sms_dispatcher import SMSResult
+
+logger = logging.getLogger('smpp_transport')
+
+# Статусы submit_sm_resp, при которых отправку имеет смысл повторить
+RETRYABLE_SMPP_STATUSES = {
+    smpplib.consts.SMPP_ESME_RTHROTTLED,
+    smpplib.consts.SMPP_ESME_RMSGQFUL,
+    smpplib.consts.SMPP_ESME_RSYSERR,
+}
+
+RECEIPT_ID_RE = re.compile(rb'id:(\S+)')
+RECEIPT_STAT_RE = re.compile(rb'stat:(\S+)')
+
+
+class PendingSubmit:
+    """Ожидание submit_sm_resp для одного PDU."""
+
+    def __init__(self, reference=None):
+        self.event = threading.Event()
+        self.reference = reference
+        self.status = None
+        self.message_id = None
+
+
+class SMPPTransport:
+    """
+    Отправка SMS по SMPP через одну долгоживущую сессию transceiver.
+
+    - Фоновый поток читает PDU, отвечает на enquire_link SMSC и сам отправляет
+      enquire_link при простое; при обрыве сессия переподключается и заново
+      привязывается (bind_transceiver) с нарастающей задержкой.
+    - submit_sm отправляются окном: одновременно ожидают ответа не больше window PDU.
+    - Квитанции доставки (deliver_sm) сопоставляются с отправленными сообщениями по
+      message_id и передаются в on_delivery(reference, stat). Сообщение ждёт квитанцию
+      не дольше receipt_ttl, и ожидающих не больше max_receipts (старые отбрасываются).
+    - PDU с ошибкой (submit_sm_resp с ненулевым статусом, generic_nack) не разрывают
+      сессию: ошибка возвращается отправителю, повтор решается по RETRYABLE_SMPP_STATUSES.
+
+    Интерфейс send/close совпадает с HTTPSMSTransport, поэтому транспорт подключается
+    к SMSDispatcher так же.
+    """
+
+    name = 'smpp'
+
+    def __init__(self, host, port, system_id, password, system_type='SMPP', source_addr='',
+                 window=10, enquire_link_interval=30.0, submit_timeout=30.0, bind_timeout=10.0,
+                 on_delivery=None, receipt_ttl=86400.0, max_receipts=10000):
+        self.host = host
+        self.port = port
+        self.system_id = system_id
+        self.password = password
+        self.system_type = system_type
+        self.source_addr = source_addr
+        self.enquire_link_interval = enquire_link_interval
+        self.submit_timeout = submit_timeout
+        self.bind_timeout = bind_timeout
+        self.on_delivery = on_delivery
+        self.receipt_ttl = receipt_ttl
+        self.max_receipts = max_receipts
+
+        self.client = None
+        self.lock = threading.Lock()
+        self.window_size = window
+        self.window = threading.BoundedSemaphore(window)
+        self.bound = threading.Event()
+        self.running = True
+        # sequence -> PendingSubmit
+        self.pending = {}
+        # message_id SMSC -> (reference — дескриптор SMS вызывающего, время регистрации);
+        # порядок вставки — порядок регистрации, старые записи в начале
+        self.references = {}
+        self.thread = threading.Thread(target=self.session_loop, daemon=True)
+        self.thread.start()
+
+    def connect(self):
+        client = smpplib.client.Client(
+            self.host, self.port, timeout=self.enquire_link_interval, allow_unknown_opt_params=True
+        )
+        client.set_message_sent_handler(self.on_submit_resp)
+        client.set_message_received_handler(self.on_deliver_sm)
+        client.set_error_pdu_handler(self.on_error_pdu)
+        client.connect()
+        client.bind_transceiver(
+            system_id=self.system_id,
+            password=self.password,
+            system_type=self.system_type,
+            addr_ton=smpplib.consts.SMPP_TON_INTL,
+            addr_npi=smpplib.consts.SMPP_NPI_ISDN,
+            address_range=self.source_addr
+        )
+        return client
+
+    def session_loop(self):
+        """Поддерживает сессию: привязка, чтение PDU, переподключение при обрыве."""
+        delay = 1.0
+        while self.running:
+            try:
+                client = self.connect()
+            except (smpplib.exceptions.ConnectionError, smpplib.exceptions.PDUError, OSError) as e:
+                logger.error(f"SMPP: не удалось подключиться к {self.host}:{self.port}: {e}. Повтор через {delay:.0f} сек.")
+                time.sleep(delay)
+                delay = min(delay * 2, 60.0)
+                continue
+            with self.lock:
+                self.client = client
+            self.bound.set()
+            delay = 1.0
+            logger.info(f"SMPP: сессия transceiver с {self.host}:{self.port} установлена.")
+            try:
+                while self.running:
+                    client.read_once(auto_send_enquire_link=True)
+            except (smpplib.exceptions.ConnectionError, smpplib.exceptions.PDUError, OSError) as e:
+                if self.running:
+                    logger.error(f"SMPP: сессия разорвана: {e}. Переподключение.")
+            self.bound.clear()
+            with self.lock:
+                self.client = None
+                pending = list(self.pending.values())
+                self.pending.clear()
+            # Ответов на отправленные PDU уже не будет — ожидающие получают ошибку с повтором
+            for waiter in pending:
+                waiter.event.set()
+            try:
+                client.disconnect()
+            except Exception:
+                pass
+
+    def send(self, phone_number, message, reference=None):
+        if not self.bound.wait(self.bind_timeout):
+            return SMSResult(False, retryable=True, detail="SMPP: сессия не установлена")
+        parts, encoding_flag, msg_type_flag = smpplib.gsm.make_parts(message)
+        message_id = None
+        for index, part in enumerate(parts):
+            # Квитанция ожидается по последней части длинного сообщения
+            part_reference = reference if index == len(parts) - 1 else None
+            result = self.submit_part(phone_number, part, encoding_flag, msg_type_flag, part_reference)
+            if not result.ok:
+                return result
+            message_id = result.message_id
+        return SMSResult(True, detail=f"message_id={message_id}", message_id=message_id)
+
+    def submit_part(self, phone_number, part, encoding_flag, msg_type_flag, reference=None):
+        """Отправляет один submit_sm и ждёт ответа (в пределах окна)."""
+        if not self.window.acquire(timeout=self.submit_timeout):
+            return SMSResult(False, retryable=True, detail="SMPP: окно отправки заполнено")
+        try:
+            waiter = PendingSubmit(reference)
+            with self.lock:
+                if self.client is None:
+                    return SMSResult(False, retryable=True, detail="SMPP: сессия не установлена")
+                try:
+                    pdu = self.client.send_message(
+                        source_addr_ton=smpplib.consts.SMPP_TON_ALNUM,
+                        source_addr_npi=smpplib.consts.SMPP_NPI_UNK,
+                        source_addr=self.source_addr,
+                        dest_addr_ton=smpplib.consts.SMPP_TON_INTL,
+                        dest_addr_npi=smpplib.consts.SMPP_NPI_ISDN,
+                        destination_addr=phone_number,
+                        short_message=part,
+                        data_coding=encoding_flag,
+                        esm_class=msg_type_flag,
+                        registered_delivery=True,
+                    )
+                except (smpplib.exceptions.ConnectionError, OSError) as e:
+                    return SMSResult(False, retryable=True, detail=f"SMPP: ошибка отправки: {e}")
+                # Регистрация под той же блокировкой: ответ не может прийти раньше
+                self.pending[pdu.sequence] = waiter
+            if not waiter.event.wait(self.submit_timeout):
+                with self.lock:
+                    self.pending.pop(pdu.sequence, None)
+                return SMSResult(False, retryable=True, detail="SMPP: нет ответа на submit_sm")
+            if waiter.status is None:
+                return SMSResult(False, retryable=True, detail="SMPP: сессия разорвана до ответа")
+            if waiter.status != smpplib.consts.SMPP_ESME_ROK:
+                return SMSResult(
+                    False, retryable=waiter.status in RETRYABLE_SMPP_STATUSES,
+                    detail=f"SMPP: submit_sm_resp со статусом {waiter.status:#x}"
+                )
+            return SMSResult(True, message_id=waiter.message_id)
+        finally:
+            self.window.release()
+
+    def on_error_pdu(self, pdu):
+        """
+        PDU с ненулевым статусом. Обработчик smpplib по умолчанию выбрасывает PDUError
+        и тем разрывает всю сессию; здесь ошибка относится только к своему запросу.
+        """
+        logger.warning(f"SMPP: {pdu.command} (sequence {pdu.sequence}) со статусом {pdu.status:#x}.")
+        if pdu.command == 'generic_nack':
+            # read_once не передаёт generic_nack обработчикам: ответ на submit_sm — здесь
+            self.on_submit_resp(pdu)
+        # submit_sm_resp с ошибкой read_once затем передаёт в on_submit_resp
+
+    def on_submit_resp(self, pdu):
+        message_id = getattr(pdu, 'message_id', None)
+        if isinstance(message_id, bytes):
+            message_id = message_id.decode('ascii', 'replace')
+        with self.lock:
+            waiter = self.pending.pop(pdu.sequence, None)
+            if waiter is None:
+                return
+            # Регистрация до пробуждения отправителя: квитанция может прийти сразу за ответом
+            if pdu.status == smpplib.consts.SMPP_ESME_ROK and waiter.reference is not None and message_id:
+                self.references[message_id] = (waiter.reference, time.monotonic())
+                self.prune_references()
+        waiter.status = pdu.status
+        waiter.message_id = message_id
+        waiter.event.set()
+
+    def prune_references(self):
+        """Отбрасывает сообщения, квитанции по которым уже не ждут (вызывается под self.lock)."""
+        expire_before = time.monotonic() - self.receipt_ttl
+        while self.references:
+            message_id, (_, registered_at) = next(iter(self.references.items()))
+            if len(self.references) <= self.max_receipts and registered_at >= expire_before:
+                break
+            del self.references[message_id]
+
+    def on_deliver_sm(self, pdu):
+        """Квитанция доставки: находит исходное сообщение по message_id и сообщает статус."""
+        text = pdu.short_message or b''
+        receipted_id = getattr(pdu, 'receipted_message_id', None)
+        if isinstance(receipted_id, bytes):
+            receipted_id = receipted_id.decode('ascii', 'replace')
+        if not receipted_id:
+            match = RECEIPT_ID_RE.search(text)
+            receipted_id = match.group(1).decode('ascii', 'replace') if match else None
+        if not receipted_id:
+            logger.info(f"SMPP: входящее сообщение от {pdu.source_addr}: {text!r}")
+            return smpplib.consts.SMPP_ESME_ROK
+        match = RECEIPT_STAT_RE.search(text)
+        stat = match.group(1).decode('ascii', 'replace') if match else 'UNKNOWN'
+        with self.lock:
+            reference, _ = self.references.pop(receipted_id, (None, None))
+        logger.info(f"SMPP: квитанция по сообщению {receipted_id}: {stat}.")
+        if reference is not None and self.on_delivery:
+            try:
+                self.on_delivery(reference, stat)
+            except Exception as e:
+                logger.error(f"SMPP: ошибка обработки квитанции {receipted_id}: {e}")
+        return smpplib.consts.SMPP_ESME_ROK
+
+    def close(self):
+        self.running = False
+        with self.lock:
+            client = self.client
+        if client is not None:
+            # unbind без ожидания ответа: PDU читает поток сессии
+            try:
+                with self.lock:
+                    client.send_pdu(smpplib.smpp.make_pdu('unbind', client=client))
+            except Exception:
+                pass
+            try:
+                client.disconnect()
+            except Exception:
+                pass
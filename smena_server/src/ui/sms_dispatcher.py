@@ -0,0 +1,222 @@
+# sms_dispatcher.py
+import time
+import random
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ui.sms_manager import is_valid_phone_number
+
+logger = logging.getLogger('sms_dispatcher')
+
+
+class SMSResult:
+    """Результат одной попытки отправки."""
+
+    def __init__(self, ok, retryable=False, detail='', message_id=None):
+        self.ok = ok
+        self.retryable = retryable
+        self.detail = detail
+        self.message_id = message_id
+
+
+class HTTPSMSTransport:
+    """
+    Отправка SMS через HTTP API шлюза (тот же протокол, что send_http_sms),
+    но через одну сессию с пулом keep-alive соединений.
+    """
+
+    name = 'http'
+
+    def __init__(self, url, login, password, shortcode, pool_size=10, timeout=10.0, verify=False):
+        self.url = url
+        self.login = login
+        self.password = password
+        self.shortcode = shortcode
+        self.timeout = timeout
+        self.verify = verify
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def send(self, phone_number, message, reference=None):
+        params = {
+            'operation': 'send',
+            'login': self.login,
+            'password': self.password,
+            'msisdn': phone_number,
+            'text': message
+        }
+        try:
+            response = self.session.get(self.url, params=params, timeout=self.timeout, verify=self.verify)
+        except requests.RequestException as e:
+            return SMSResult(False, retryable=True, detail=f"Ошибка соединения с сервером SMS: {e}")
+        response_text = response.text.strip()
+        if response.status_code == 200:
+            if 'ERROR' in response_text:
+                return SMSResult(False, detail=response_text)
+            return SMSResult(True, detail=response_text, message_id=response_text)
+        return SMSResult(
+            False, retryable=response.status_code == 429 or response.status_code >= 500,
+            detail=f"Код ответа {response.status_code}: {response_text[:200]}"
+        )
+
+    def close(self):
+        self.session.close()
+
+
+class TokenBucket:
+    """Ограничение частоты: rate токенов в секунду, запас не больше capacity."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Ждёт токен (без ограничения, если rate <= 0)."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class SMSHandle:
+    """
+    Дескриптор отправленного в диспетчер SMS. result() ждёт окончательного
+    результата (SMSResult), add_done_callback(fn) вызывает fn(handle) по завершении.
+    """
+
+    def __init__(self, phone_number, message, context=None):
+        self.phone_number = phone_number
+        self.message = message
+        self.context = context
+        self.attempts = 0
+        self.completed = False
+        self.future = Future()
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+    def add_done_callback(self, fn):
+        self.future.add_done_callback(lambda _: fn(self))
+
+
+class SMSDispatcher:
+    """
+    Асинхронная отправка SMS: submit() сразу возвращает SMSHandle, отправка идёт в
+    ограниченном пуле потоков с ограничением частоты (token bucket) под лимит
+    провайдера. Ошибки транспорта повторяются с экспоненциальной задержкой; повтор
+    ставится таймером и не занимает рабочий поток на время ожидания.
+    """
+
+    def __init__(self, transport, workers=4, rate_per_second=5.0, burst=None, max_retries=3,
+                 backoff_base=1.0, backoff_max=30.0):
+        self.transport = transport
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sms')
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stats_lock = threading.Lock()
+        self.counters = {'submitted': 0, 'sent': 0, 'failed': 0, 'retries': 0, 'pending': 0}
+        self.timers = set()
+        self.closed = False
+
+    def submit(self, phone_number, message, context=None, callback=None):
+        """
+        Ставит SMS в очередь отправки. Не блокируется на шлюзе.
+
+        :param context: Произвольные данные вызывающего (доступны как handle.context).
+        :param callback: Вызывается callback(handle) после окончательного результата.
+        """
+        handle = SMSHandle(phone_number, message, context)
+        if callback:
+            handle.add_done_callback(callback)
+        with self.stats_lock:
+            self.counters['submitted'] += 1
+            self.counters['pending'] += 1
+        if not is_valid_phone_number(phone_number):
+            self._complete(handle, SMSResult(False, detail=f"Некорректный формат номера телефона: {phone_number}"))
+            return handle
+        self._schedule(handle)
+        return handle
+
+    def _schedule(self, handle):
+        try:
+            self.executor.submit(self._send, handle)
+        except RuntimeError:
+            self._complete(handle, SMSResult(False, detail="Диспетчер SMS остановлен"))
+
+    def _send(self, handle):
+        if handle.completed:
+            # shutdown() завершил SMS, пока срабатывал таймер повтора
+            return
+        self.bucket.acquire()
+        handle.attempts += 1
+        try:
+            result = self.transport.send(handle.phone_number, handle.message, reference=handle)
+        except Exception as e:
+            result = SMSResult(False, retryable=True, detail=f"Ошибка транспорта SMS: {e}")
+        if result.ok or not result.retryable or handle.attempts > self.max_retries or self.closed:
+            self._complete(handle, result)
+            return
+        delay = random.uniform(0.5, 1.0) * min(self.backoff_max, self.backoff_base * (2 ** (handle.attempts - 1)))
+        with self.stats_lock:
+            self.counters['retries'] += 1
+        logger.warning(f"SMS на {handle.phone_number}: {result.detail}. Повтор через {delay:.1f} сек.")
+        timer = threading.Timer(delay, self._retry, args=(handle,))
+        timer.daemon = True
+        with self.stats_lock:
+            self.timers.add(timer)
+        timer.start()
+
+    def _retry(self, handle):
+        with self.stats_lock:
+            self.timers = {t for t in self.timers if t.is_alive() and t is not threading.current_thread()}
+        self._schedule(handle)
+
+    def _complete(self, handle, result):
+        with self.stats_lock:
+            if handle.completed:
+                return
+            handle.completed = True
+            self.counters['pending'] -= 1
+            self.counters['sent' if result.ok else 'failed'] += 1
+        if result.ok:
+            logger.info(f"SMS отправлено на номер {handle.phone_number}. Ответ: {result.detail}")
+        else:
+            logger.error(f"Не удалось отправить SMS на {handle.phone_number}: {result.detail}")
+        handle.future.set_result(result)
+
+    def stats(self):
+        with self.stats_lock:
+            return dict(self.counters)
+
+    def shutdown(self, wait=False):
+        self.closed = True
+        with self.stats_lock:
+            timers = list(self.timers)
+            self.timers.clear()
+        for timer in timers:
+            timer.cancel()
+            self._complete(timer.args[0], SMSResult(False, detail="Диспетчер SMS остановлен"))
+        self.executor.shutdown(wait=wait)
+        self.transport.close()
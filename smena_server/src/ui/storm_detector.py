@@ -0,0 +1,84 @@
+# storm_detector.py
+import threading
+from collections import Counter, deque
+from datetime import datetime, timedelta
+
+
+class StormDetector:
+    """
+    Обнаружение массовых событий («шторма»).
+
+    Считает новые события в скользящем окне по коду события и по пульту (Pult_id).
+    Если число событий с одним кодом или с одного пульта за окно достигает порога,
+    ключ считается штормом: ('code', код) или ('pult', Pult_id).
+    """
+
+    def __init__(self, window_seconds=300, code_threshold=50, pult_threshold=100):
+        """
+        :param window_seconds: Длина скользящего окна в секундах.
+        :param code_threshold: Порог числа событий одного кода за окно (0 — не учитывать).
+        :param pult_threshold: Порог числа событий одного пульта за окно (0 — не учитывать).
+        """
+        self.window = timedelta(seconds=window_seconds)
+        self.code_threshold = code_threshold
+        self.pult_threshold = pult_threshold
+        self.lock = threading.Lock()
+        # (время, Event_id, код, Pult_id) в порядке поступления
+        self.window_events = deque()
+        self.window_ids = set()
+        self.code_counts = Counter()
+        self.pult_counts = Counter()
+
+    def observe(self, event, now=None):
+        """Учитывает событие в окне. Повторное наблюдение того же Event_id не учитывается."""
+        now = now or datetime.now()
+        event_id = event.get('event_id')
+        with self.lock:
+            self._expire(now)
+            if event_id in self.window_ids:
+                return
+            code, pult_id = event.get('code'), event.get('pult_id')
+            self.window_events.append((now, event_id, code, pult_id))
+            self.window_ids.add(event_id)
+            self.code_counts[code] += 1
+            if pult_id is not None:
+                self.pult_counts[pult_id] += 1
+
+    def _expire(self, now):
+        while self.window_events and now - self.window_events[0][0] > self.window:
+            _, event_id, code, pult_id = self.window_events.popleft()
+            self.window_ids.discard(event_id)
+            self.code_counts[code] -= 1
+            if self.code_counts[code] <= 0:
+                del self.code_counts[code]
+            if pult_id is not None:
+                self.pult_counts[pult_id] -= 1
+                if self.pult_counts[pult_id] <= 0:
+                    del self.pult_counts[pult_id]
+
+    def storm_key(self, event, now=None):
+        """Возвращает ключ шторма, к которому относится событие, или None."""
+        now = now or datetime.now()
+        codes = event.get('codes') or [event.get('code')]
+        with self.lock:
+            self._expire(now)
+            if self.code_threshold:
+                for code in codes:
+                    if self.code_counts.get(code, 0) >= self.code_threshold:
+                        return ('code', code)
+            pult_id = event.get('pult_id')
+            if self.pult_threshold and pult_id is not None and self.pult_counts.get(pult_id, 0) >= self.pult_threshold:
+                return ('pult', pult_id)
+        return None
+
+    def active_storms(self, now=None):
+        """Словарь активных штормов: ключ -> число событий в окне."""
+        now = now or datetime.now()
+        with self.lock:
+            self._expire(now)
+            storms = {}
+            if self.code_threshold:
+                storms.update({('code', c): n for c, n in self.code_counts.items() if n >= self.code_threshold})
+            if self.pult_threshold:
+                storms.update({('pult', p): n for p, n in self.pult_counts.items() if n >= self.pult_threshold})
+            return storms
@@ -0,0 +1,156 @@
+# tts_backends.py
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from xml.sax.saxutils import escape
+
+from ui.tts_segments import PCM_SAMPLE_RATE
+
+logger = logging.getLogger('tts_backends')
+
+BACKEND_YANDEX = 'yandex'
+BACKEND_SILERO = 'silero'
+# Облако, а при ошибке или медленном ответе — локальный движок
+BACKEND_AUTO = 'auto'
+
+
+class TTSBackend:
+    """
+    Движок синтеза речи. Возвращает PCM (16 бит, моно, PCM_SAMPLE_RATE),
+    который дальше сохраняется и склеивается одинаково для всех движков.
+    """
+
+    name = None
+
+    def available(self):
+        return True
+
+    def synthesize_pcm(self, text, voice, emotion, speed):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class YandexTTSBackend(TTSBackend):
+    """Yandex SpeechKit (API v1) через общий TTSClient."""
+
+    name = BACKEND_YANDEX
+
+    def __init__(self, client, folder_id):
+        self.client = client
+        self.folder_id = folder_id
+
+    def request_data(self, text, voice, emotion, speed, audio_format, sample_rate):
+        return {
+            "text": text,
+            "lang": "ru-RU",
+            "voice": voice,
+            "speed": str(speed),
+            "emotion": emotion,
+            "folderId": self.folder_id,
+            "format": audio_format,
+            "sampleRateHertz": str(sample_rate)
+        }
+
+    def synthesize(self, text, voice, emotion, speed, audio_format, sample_rate):
+        """Синтезирует текст в заданном формате и возвращает байты аудио или None."""
+        return self.client.synthesize(self.request_data(text, voice, emotion, speed, audio_format, sample_rate))
+
+    def stream_pcm(self, text, voice, emotion, speed):
+        """Генератор фрагментов PCM по мере синтеза (TTSStreamError при ошибке)."""
+        return self.client.stream(self.request_data(text, voice, emotion, speed, 'lpcm', PCM_SAMPLE_RATE))
+
+    def synthesize_pcm(self, text, voice, emotion, speed):
+        return self.synthesize(text, voice, emotion, speed, 'lpcm', PCM_SAMPLE_RATE)
+
+    def close(self):
+        self.client.close()
+
+
+class SileroTTSBackend(TTSBackend):
+    """
+    Локальный синтез Silero на CPU.
+
+    Модели загружаются один раз на процесс в фоне (warm_up) и хранятся в пуле:
+    каждая модель одновременно обслуживает один запрос, поэтому число моделей
+    равно числу рабочих потоков. Пока модели не загружены, движок недоступен.
+    Голос, эмоция Yandex к Silero не применимы — используется speaker из настроек.
+    """
+
+    name = BACKEND_SILERO
+
+    def __init__(self, model_id='v4_ru', speaker='xenia', pool_size=1, threads_per_model=2, timeout=30.0):
+        self.model_id = model_id
+        self.speaker = speaker
+        self.pool_size = max(1, pool_size)
+        self.threads_per_model = threads_per_model
+        self.timeout = timeout
+        self.models = queue.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=self.pool_size)
+        self.loaded = threading.Event()
+        self.load_error = None
+
+    def warm_up(self):
+        """Загружает пул моделей в фоновом потоке."""
+        threading.Thread(target=self._load_models, daemon=True).start()
+
+    def _load_models(self):
+        try:
+            import torch
+            from silero import silero_tts
+            torch.set_num_threads(self.threads_per_model)
+            for _ in range(self.pool_size):
+                model, _ = silero_tts(language='ru', speaker=self.model_id)
+                model.to(torch.device('cpu'))
+                self.models.put(model)
+        except Exception as e:
+            self.load_error = e
+            logger.error(f"Не удалось загрузить модель Silero {self.model_id}: {e}")
+            return
+        self.loaded.set()
+        logger.info(f"Silero: загружено моделей {self.pool_size} ({self.model_id}, голос {self.speaker}).")
+
+    def available(self):
+        return self.loaded.is_set()
+
+    @staticmethod
+    def rate(speed):
+        """Скорость Yandex (0.1–3.0) в значение prosody rate для SSML Silero."""
+        speed = float(speed)
+        if speed <= 0.6:
+            return 'x-slow'
+        if speed <= 0.85:
+            return 'slow'
+        if speed < 1.2:
+            return 'medium'
+        if speed < 1.6:
+            return 'fast'
+        return 'x-fast'
+
+    def synthesize_pcm(self, text, voice=None, emotion=None, speed=1.0):
+        if not self.available():
+            return None
+        future = self.executor.submit(self._infer, text, speed)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            logger.error(f"Silero: синтез не уложился в {self.timeout} сек.")
+        except Exception as e:
+            logger.error(f"Silero: ошибка синтеза: {e}")
+        return None
+
+    def _infer(self, text, speed):
+        import torch
+        ssml = f'<speak><prosody rate="{self.rate(speed)}">{escape(text)}</prosody></speak>'
+        model = self.models.get()
+        try:
+            with torch.no_grad():
+                audio = model.apply_tts(ssml_text=ssml, speaker=self.speaker, sample_rate=PCM_SAMPLE_RATE)
+        finally:
+            self.models.put(model)
+        return (audio * 32767).clamp(-32768, 32767).to(torch.int16).numpy().tobytes()
+
+    def close(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,336 @@
+# tts_cache.py
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger('tts_cache')
+
+# Файлы, которые уборщик считает своими: аудио и недописанные временные файлы
+MANAGED_SUFFIXES = ('.ogg', '.mp3', '.wav', '.pcm', '.sln', '.sln16', '.sln48', '.tmp')
+
+
+class TTSCache:
+    """
+    Кэш синтезированных аудиофайлов с адресацией по содержимому.
+
+    Ключ — хэш (текст, голос, эмоция, скорость, формат), поэтому одинаковое сообщение
+    синтезируется один раз, а разные сообщения никогда не перезаписывают файлы друг друга.
+    Файлы записи лежат в base_dir с именами вида <ключ>.<расширение>.
+
+    Индекс (ключ -> файлы, размер, время использования) хранится в памяти и
+    периодически сбрасывается на диск в JSON. При превышении max_bytes или max_files
+    вытесняются давно не использованные записи (LRU), кроме закреплённых: пока запись
+    захвачена (acquire) или закреплена за ActionID звонка (pin), её файлы не удаляются.
+
+    Фоновый уборщик (start_janitor) удаляет записи старше max_age_seconds, снимает
+    закрепления зависших звонков старше pin_timeout_seconds, сохраняет индекс и удаляет
+    из папки файлы, которых нет в индексе. Обход папки выполняется только уборщиком,
+    не при синтезе.
+    """
+
+    INDEX_FILE = 'tts_cache_index.json'
+
+    def __init__(self, base_dir, max_bytes=200 * 1024 * 1024, max_files=5000, max_age_seconds=7 * 24 * 3600,
+                 pin_timeout_seconds=3600):
+        """
+        :param base_dir: Папка с аудиофайлами (она же раздаётся HTTP-сервером).
+        :param max_bytes: Максимальный суммарный размер файлов кэша.
+        :param max_files: Максимальное число записей.
+        :param max_age_seconds: Записи, не использовавшиеся дольше, удаляются уборщиком.
+        :param pin_timeout_seconds: Закрепление за звонком, о завершении которого не пришло
+                                    уведомление, снимается через это время.
+        """
+        self.base_dir = base_dir
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.max_age_seconds = max_age_seconds
+        self.pin_timeout_seconds = pin_timeout_seconds
+        self.index_path = os.path.join(base_dir, self.INDEX_FILE)
+        self.lock = threading.Lock()
+        # ключ -> {'files': [...], 'size': int, 'last_used': float}; порядок — от старых к новым
+        self.entries = OrderedDict()
+        self.refcounts = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        # Блокировки синтеза по ключу: два одновременных промаха по одному ключу синтезируют один раз
+        self.key_locks = {}
+        # ActionID -> (ключ, время закрепления)
+        self.owner_pins = {}
+        # Индекс изменён и ещё не сохранён на диск
+        self.dirty = False
+        self.janitor_stop = threading.Event()
+        self.load_index()
+
+    @staticmethod
+    def make_key(text, voice, emotion, speed, audio_format):
+        raw = '\x1f'.join(str(part) for part in (text, voice, emotion, speed, audio_format))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+    def load_index(self):
+        """Загружает индекс с диска, отбрасывая записи, файлы которых пропали."""
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Не удалось прочитать индекс кэша TTS {self.index_path}: {e}")
+            return
+        for key, entry in sorted(data.items(), key=lambda item: item[1].get('last_used', 0)):
+            files = entry.get('files', [])
+            if files and all(os.path.exists(os.path.join(self.base_dir, name)) for name in files):
+                self.entries[key] = entry
+                self.total_bytes += entry.get('size', 0)
+        logger.info(f"Кэш TTS: загружено {len(self.entries)} записей, {self.total_bytes} байт.")
+
+    def save_index(self):
+        """Атомарно сохраняет индекс на диск, если он изменился."""
+        with self.lock:
+            if not self.dirty:
+                return
+            data = json.dumps(self.entries)
+            self.dirty = False
+        tmp_path = self.index_path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            logger.error(f"Не удалось сохранить индекс кэша TTS: {e}")
+            with self.lock:
+                self.dirty = True
+
+    def key_lock(self, key):
+        """Блокировка синтеза для ключа."""
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def get(self, key):
+        """
+        Возвращает список файлов записи и закрепляет её (acquire) или None при промахе.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or not all(os.path.exists(os.path.join(self.base_dir, n)) for n in entry['files']):
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            entry['last_used'] = time.time()
+            self.entries.move_to_end(key)
+            self.refcounts[key] = self.refcounts.get(key, 0) + 1
+            self.hits += 1
+            return list(entry['files'])
+
+    def put(self, key, files):
+        """
+        Регистрирует файлы новой записи, закрепляет её (acquire) и при необходимости
+        вытесняет старые записи.
+        """
+        size = 0
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(self.base_dir, name))
+            except OSError:
+                pass
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old.get('size', 0)
+            self.entries[key] = {'files': list(files), 'size': size, 'last_used': time.time()}
+            self.total_bytes += size
+            self.refcounts[key] = self.refcounts.get(key, 0) + 1
+            self._evict()
+            self.dirty = True
+
+    def update(self, key, files):
+        """
+        Заменяет список файлов записи и пересчитывает размер, не меняя закрепления
+        (запись, созданная заранее и дописанная позже, например при потоковом синтезе).
+        Возвращает False, если записи уже нет.
+        """
+        size = 0
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(self.base_dir, name))
+            except OSError:
+                pass
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False
+            self.total_bytes += size - entry.get('size', 0)
+            entry.update({'files': list(files), 'size': size, 'last_used': time.time()})
+            self.entries.move_to_end(key)
+            self._evict()
+            self.dirty = True
+            return True
+
+    def discard(self, key):
+        """Удаляет запись и её файлы (например, при сбое синтеза)."""
+        with self.lock:
+            self._drop(key, delete_files=True)
+            self.dirty = True
+
+    def add_files(self, key, files):
+        """Добавляет к существующей записи файлы, созданные позже (например, другой формат)."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return
+            for name in files:
+                if name in entry['files']:
+                    continue
+                try:
+                    size = os.path.getsize(os.path.join(self.base_dir, name))
+                except OSError:
+                    continue
+                entry['files'].append(name)
+                entry['size'] += size
+                self.total_bytes += size
+            self._evict()
+            self.dirty = True
+
+    def acquire(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.refcounts[key] = self.refcounts.get(key, 0) + 1
+
+    def release(self, key):
+        """Снимает закрепление записи (звонок, использовавший файл, завершён)."""
+        with self.lock:
+            count = self.refcounts.get(key, 0) - 1
+            if count > 0:
+                self.refcounts[key] = count
+            else:
+                self.refcounts.pop(key, None)
+                self._evict()
+
+    def pin(self, key, owner):
+        """Закрепляет запись за владельцем (ActionID звонка) до вызова unpin(owner)."""
+        with self.lock:
+            if key not in self.entries or owner in self.owner_pins:
+                return
+            self.owner_pins[owner] = (key, time.time())
+            self.refcounts[key] = self.refcounts.get(key, 0) + 1
+
+    def unpin(self, owner):
+        """Снимает закрепление владельца (звонок завершён)."""
+        with self.lock:
+            pinned = self.owner_pins.pop(owner, None)
+        if pinned is not None:
+            self.release(pinned[0])
+
+    def over_limit(self):
+        return self.total_bytes > self.max_bytes or len(self.entries) > self.max_files
+
+    def _evict(self):
+        """
+        Вытесняет LRU-записи без закрепления, пока превышен лимит размера или числа записей.
+        Вызывается под self.lock.
+        """
+        if not self.over_limit():
+            return
+        for key in list(self.entries):
+            if not self.over_limit():
+                break
+            if self.refcounts.get(key):
+                continue
+            self._drop(key, delete_files=True)
+
+    def _drop(self, key, delete_files=False):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        self.total_bytes -= entry.get('size', 0)
+        # key_locks не трогаем: блокировку ключа может держать или ждать синтезирующий поток
+        self.dirty = True
+        if delete_files:
+            for name in entry['files']:
+                try:
+                    os.remove(os.path.join(self.base_dir, name))
+                except OSError as e:
+                    logger.error(f"Кэш TTS: ошибка удаления файла {name}: {e}")
+            logger.info(f"Кэш TTS: вытеснена запись {key} ({entry.get('size', 0)} байт).")
+
+    def start_janitor(self, interval_seconds=60, orphan_age_seconds=3600, is_live=None):
+        """
+        Запускает фонового уборщика.
+
+        :param orphan_age_seconds: Файлы вне индекса старше этого возраста удаляются.
+        :param is_live: Функция is_live(имя_файла) — файл ещё пишется, его не трогать.
+        """
+        thread = threading.Thread(
+            target=self._janitor_loop, args=(interval_seconds, orphan_age_seconds, is_live), daemon=True
+        )
+        thread.start()
+
+    def _janitor_loop(self, interval_seconds, orphan_age_seconds, is_live):
+        while not self.janitor_stop.wait(interval_seconds):
+            try:
+                self.expire()
+                self.remove_orphans(orphan_age_seconds, is_live)
+                self.save_index()
+            except Exception as e:
+                logger.error(f"Кэш TTS: ошибка уборки: {e}")
+
+    def expire(self, now=None):
+        """Удаляет устаревшие записи и снимает закрепления зависших звонков."""
+        now = now or time.time()
+        with self.lock:
+            stale_owners = [owner for owner, (_, pinned_at) in self.owner_pins.items()
+                            if now - pinned_at > self.pin_timeout_seconds]
+        for owner in stale_owners:
+            logger.warning(f"Кэш TTS: закрепление звонка {owner} снято по таймауту.")
+            self.unpin(owner)
+        with self.lock:
+            for key, entry in list(self.entries.items()):
+                # Записи упорядочены по времени использования — дальше только более свежие
+                if now - entry.get('last_used', 0) <= self.max_age_seconds:
+                    break
+                if not self.refcounts.get(key):
+                    self._drop(key, delete_files=True)
+            self._evict()
+
+    def remove_orphans(self, orphan_age_seconds, is_live=None, now=None):
+        """Удаляет из папки файлы, которых нет в индексе (старые сообщения, недописанные .tmp)."""
+        now = now or time.time()
+        with self.lock:
+            owned = {name for entry in self.entries.values() for name in entry['files']}
+        try:
+            names = os.listdir(self.base_dir)
+        except OSError as e:
+            logger.error(f"Кэш TTS: не удалось прочитать папку {self.base_dir}: {e}")
+            return
+        for name in names:
+            if not name.endswith(MANAGED_SUFFIXES) or name in owned or (is_live and is_live(name)):
+                continue
+            path = os.path.join(self.base_dir, name)
+            try:
+                if not os.path.isfile(path) or now - os.path.getmtime(path) <= orphan_age_seconds:
+                    continue
+                os.remove(path)
+                logger.info(f"Кэш TTS: удалён файл вне индекса {name}.")
+            except OSError as e:
+                logger.error(f"Кэш TTS: ошибка удаления файла {name}: {e}")
+
+    def close(self):
+        """Останавливает уборщика и сохраняет индекс."""
+        self.janitor_stop.set()
+        self.save_index()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.total_bytes,
+                'pinned': len(self.refcounts),
+                'pinned_calls': len(self.owner_pins),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -0,0 +1,211 @@
+# tts_client.py
+import time
+import random
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger('tts_client')
+
+# Коды ответа, при которых запрос повторяется
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TTSStreamError(Exception):
+    """Потоковый синтез не удался (в том числе обрыв после начала передачи)."""
+
+
+class TTSClient:
+    """
+    HTTP-клиент Yandex TTS.
+
+    - Одна сессия requests с пулом keep-alive соединений: TLS-рукопожатие не на каждое событие.
+    - Жёсткие таймауты подключения и чтения: зависший запрос не держит рабочий поток.
+    - Не больше max_concurrency одновременных запросов к API.
+    - Повтор при 429/5xx и сетевых ошибках с экспоненциальной задержкой и случайным разбросом
+      (заголовок Retry-After учитывается).
+    - Хеджирование (опционально): если ответ не пришёл за наблюдаемый p95, отправляется
+      второй такой же запрос, используется первый успешный ответ.
+    - Статистика задержек по запросам (stats()).
+    """
+
+    def __init__(self, url, api_key, pool_size=8, max_concurrency=4, connect_timeout=3.05, read_timeout=15.0,
+                 max_retries=3, backoff_base=0.5, backoff_max=8.0, hedge=False, hedge_min_samples=20):
+        self.url = url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Api-Key {api_key}"
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        # Хеджирующим запросам нужен свой поток, поэтому пул вдвое больше лимита запросов
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency * 2) if hedge else None
+
+        self.stats_lock = threading.Lock()
+        self.latencies = deque(maxlen=500)
+        self.requests_count = 0
+        self.errors_count = 0
+        self.retries_count = 0
+        self.hedges_count = 0
+
+    def synthesize(self, data):
+        """Выполняет запрос синтеза с повторами. Возвращает байты аудио или None."""
+        for attempt in range(self.max_retries + 1):
+            content, retryable, retry_after = self._attempt(data)
+            if content is not None:
+                return content
+            if not retryable or attempt == self.max_retries:
+                break
+            delay = self.backoff_delay(attempt, retry_after)
+            with self.stats_lock:
+                self.retries_count += 1
+            logger.warning(f"Повтор запроса к TTS через {delay:.2f} сек (попытка {attempt + 2}).")
+            time.sleep(delay)
+        return None
+
+    def stream(self, data, chunk_size=8192):
+        """
+        Потоковый синтез: генератор фрагментов аудио по мере их поступления от API.
+        До получения первого байта запрос повторяется, как в synthesize; обрыв после
+        начала передачи вызывает TTSStreamError. Хеджирование не применяется.
+        """
+        for attempt in range(self.max_retries + 1):
+            retryable, retry_after = True, None
+            with self.semaphore:
+                started = time.monotonic()
+                try:
+                    response = self.session.post(
+                        self.url, data=data, stream=True, timeout=(self.connect_timeout, self.read_timeout)
+                    )
+                except requests.exceptions.RequestException as e:
+                    self.record(time.monotonic() - started, ok=False)
+                    logger.error(f"Ошибка при выполнении запроса к TTS: {e}")
+                else:
+                    with response:
+                        if response.status_code == 200:
+                            try:
+                                for chunk in response.iter_content(chunk_size=chunk_size):
+                                    if chunk:
+                                        yield chunk
+                            except requests.exceptions.RequestException as e:
+                                self.record(time.monotonic() - started, ok=False)
+                                raise TTSStreamError(f"Обрыв потока синтеза: {e}") from e
+                            self.record(time.monotonic() - started, ok=True)
+                            return
+                        self.record(time.monotonic() - started, ok=False)
+                        logger.error(f"Ошибка синтеза речи: {response.status_code} - {response.text[:200]}")
+                        retryable = response.status_code in RETRYABLE_STATUSES
+                        if response.headers.get('Retry-After', '').isdigit():
+                            retry_after = float(response.headers['Retry-After'])
+            if not retryable or attempt == self.max_retries:
+                break
+            delay = self.backoff_delay(attempt, retry_after)
+            with self.stats_lock:
+                self.retries_count += 1
+            logger.warning(f"Повтор потокового запроса к TTS через {delay:.2f} сек (попытка {attempt + 2}).")
+            time.sleep(delay)
+        raise TTSStreamError("Потоковый синтез не удался.")
+
+    def backoff_delay(self, attempt, retry_after=None):
+        """Экспоненциальная задержка с полным случайным разбросом."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    def _attempt(self, data):
+        """Одна попытка (с хеджирующим запросом, если включено)."""
+        hedge_after = self.percentile(0.95) if self.hedge else None
+        if hedge_after is None:
+            return self._post(data)
+
+        futures = [self.executor.submit(self._post, data)]
+        done, _ = wait(futures, timeout=hedge_after)
+        if not done:
+            with self.stats_lock:
+                self.hedges_count += 1
+            logger.debug(f"Запрос к TTS дольше p95 ({hedge_after:.2f} сек), отправлен хеджирующий запрос.")
+            futures.append(self.executor.submit(self._post, data))
+        result = (None, True, None)
+        for future in as_completed(futures):
+            result = future.result()
+            if result[0] is not None:
+                return result
+        return result
+
+    def _post(self, data):
+        """
+        HTTP-запрос к API. Возвращает (content, retryable, retry_after):
+        content — байты аудио или None, retryable — имеет ли смысл повтор.
+        """
+        with self.semaphore:
+            started = time.monotonic()
+            try:
+                response = self.session.post(self.url, data=data, timeout=(self.connect_timeout, self.read_timeout))
+            except requests.exceptions.RequestException as e:
+                self.record(time.monotonic() - started, ok=False)
+                logger.error(f"Ошибка при выполнении запроса к TTS: {e}")
+                return None, True, None
+            elapsed = time.monotonic() - started
+
+        if response.status_code == 200:
+            self.record(elapsed, ok=True)
+            return response.content, False, None
+
+        self.record(elapsed, ok=False)
+        logger.error(f"Ошибка синтеза речи: {response.status_code} - {response.text[:200]}")
+        retry_after = None
+        if response.headers.get('Retry-After', '').isdigit():
+            retry_after = float(response.headers['Retry-After'])
+        return None, response.status_code in RETRYABLE_STATUSES, retry_after
+
+    def record(self, elapsed, ok):
+        with self.stats_lock:
+            self.requests_count += 1
+            if ok:
+                self.latencies.append(elapsed)
+            else:
+                self.errors_count += 1
+
+    def percentile(self, fraction):
+        """Перцентиль задержки успешных запросов или None, пока замеров мало."""
+        with self.stats_lock:
+            if len(self.latencies) < self.hedge_min_samples:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+    def stats(self):
+        with self.stats_lock:
+            ordered = sorted(self.latencies)
+            stats = {
+                'requests': self.requests_count,
+                'errors': self.errors_count,
+                'retries': self.retries_count,
+                'hedges': self.hedges_count,
+            }
+        if ordered:
+            stats.update({
+                'p50': round(ordered[len(ordered) // 2], 3),
+                'p95': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+                'max': round(ordered[-1], 3),
+            })
+        return stats
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown(wait=False)
+        self.session.close()
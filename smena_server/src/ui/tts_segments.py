@@ -0,0 +1,65 @@
+# tts_segments.py
+import wave
+from string import Formatter
+
+# Параметры PCM, в котором синтезируются и склеиваются сегменты (формат lpcm Yandex TTS)
+PCM_SAMPLE_RATE = 48000
+PCM_SAMPLE_WIDTH = 2  # 16 бит
+PCM_CHANNELS = 1
+# Расширение «сырого» signed linear для Asterisk при частоте PCM_SAMPLE_RATE
+SLN_EXTENSION = '.sln48'
+
+SEGMENT_STATIC = 'static'
+SEGMENT_VARIABLE = 'var'
+
+
+def split_template(template):
+    """
+    Разбивает шаблон сообщения на сегменты.
+
+    Возвращает список (тип, значение): ('static', текст) для неизменной части шаблона
+    и ('var', имя_переменной) для подстановки {имя}. Пустые статические части опускаются.
+
+    >>> split_template("Объект {object_id_digits}. Адрес {address}.")
+    [('static', 'Объект'), ('var', 'object_id_digits'), ('static', '. Адрес'), ('var', 'address'), ('static', '.')]
+    """
+    segments = []
+    for literal, field_name, _, _ in Formatter().parse(template):
+        if literal and literal.strip():
+            segments.append((SEGMENT_STATIC, literal.strip()))
+        if field_name:
+            segments.append((SEGMENT_VARIABLE, field_name))
+    return segments
+
+
+def render_segments(segments, template_variables):
+    """
+    Подставляет переменные: возвращает список (тип, текст).
+    Сегменты без букв и цифр (одна пунктуация) опускаются — синтезировать в них нечего.
+    """
+    rendered = []
+    for kind, value in segments:
+        text = value if kind == SEGMENT_STATIC else str(template_variables[value]).strip()
+        if any(ch.isalnum() for ch in text):
+            rendered.append((kind, text))
+    return rendered
+
+
+def silence(milliseconds, sample_rate=PCM_SAMPLE_RATE):
+    """Тишина заданной длительности в формате PCM."""
+    return b'\x00' * (int(sample_rate * milliseconds / 1000) * PCM_SAMPLE_WIDTH * PCM_CHANNELS)
+
+
+def join_pcm(parts, gap_ms=0, sample_rate=PCM_SAMPLE_RATE):
+    """Склеивает фрагменты PCM, вставляя между ними паузу gap_ms."""
+    gap = silence(gap_ms, sample_rate) if gap_ms else b''
+    return gap.join(parts)
+
+
+def write_wav(path, pcm, sample_rate=PCM_SAMPLE_RATE):
+    """Записывает PCM в WAV-файл без внешних конвертеров."""
+    with wave.open(path, 'wb') as wav_file:
+        wav_file.setnchannels(PCM_CHANNELS)
+        wav_file.setsampwidth(PCM_SAMPLE_WIDTH)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm)
@@ -1,15 +1,23 @@
+DIGIT_WORDS = {
+    '0': 'ноль',
+    '1': 'один',
+    '2': 'два',
+    '3': 'три',
+    '4': 'четыре',
+    '5': 'пять',
+    '6': 'шесть',
+    '7': 'семь',
+    '8': 'восемь',
+    '9': 'девять'
+}
+
+
 def number_to_spelled_digits(number):
     """Преобразует число в строку, где каждая цифра произносится отдельно."""
-    digits_map = {
-        '0': 'ноль',
-        '1': 'один',
-        '2': 'два',
-        '3': 'три',
-        '4': 'четыре',
-        '5': 'пять',
-        '6': 'шесть',
-        '7': 'семь',
-        '8': 'восемь',
-        '9': 'девять'
-    }
-    return ' '.join([digits_map.get(digit, '') for digit in str(number)])
\ No newline at end of file
+    return ' '.join([DIGIT_WORDS.get(digit, '') for digit in str(number)])
+
+
+def chunked(items, size):
+    """Разбивает список на части не длиннее size (для IN (...) и многострочных INSERT)."""
+    items = list(items)
+    return [items[i:i + size] for i in range(0, len(items), size)]
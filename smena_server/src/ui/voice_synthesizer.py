@@ -1,12 +1,22 @@
 import os
-import requests
 import threading
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from urllib.parse import urljoin
 from pydub import AudioSegment
 import configparser
 import logging
 
+from ui.tts_cache import TTSCache
+from ui.audio_server import AudioHTTPServer, LiveAudio
+from ui.tts_client import TTSClient, TTSStreamError
+from ui.tts_backends import (
+    YandexTTSBackend, SileroTTSBackend, BACKEND_YANDEX, BACKEND_SILERO, BACKEND_AUTO
+)
+from ui.audio_vocabulary import AudioVocabulary, MessageAssembler
+from ui.tts_segments import (
+    split_template, render_segments, join_pcm, write_wav, PCM_SAMPLE_RATE, SLN_EXTENSION
+)
+
 # Настройка глобального логирования
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger('Syntez')
@@ -37,23 +47,30 @@ def load_synthesizer_settings():
     
     return settings
 
-class CustomHTTPRequestHandler(SimpleHTTPRequestHandler):
-    """Кастомный HTTPRequestHandler для перенаправления логов в основной логгер."""
-
-    def log_message(self, format, *args):
-        """Переопределение метода логирования."""
-        message = "%s - - [%s] %s\n" % (
-            self.client_address[0],
-            self.log_date_time_string(),
-            format % args
-        )
-        logger.info(f"(HTTPServer) {message.strip()}")
-
 class VoiceSynthesizer:
-    def __init__(self, api_key, folder_id, http_host, http_port, audio_base_url):
+    def __init__(self, api_key, folder_id, http_host, http_port, audio_base_url, cache_max_bytes=200 * 1024 * 1024,
+                 cache_options=None,
+                 segmented=False, segment_gap_ms=60, vocabulary=False,
+                 write_sln=False, client_options=None, backend=BACKEND_YANDEX, silero_options=None,
+                 fallback_after=0.0, streaming=False):
         self.api_key = api_key
         self.folder_id = folder_id
         self.url = "https://tts.api.cloud.yandex.net/speech/v1/tts:synthesize"
+        # Пул соединений, таймауты, повторы и хеджирование запросов к API
+        self.client = TTSClient(self.url, api_key, **(client_options or {}))
+        self.yandex = YandexTTSBackend(self.client, folder_id)
+
+        # Движок по умолчанию (yandex / silero / auto) и локальный движок Silero.
+        # В режиме auto сообщение синтезируется локально, если облако вернуло ошибку
+        # или не ответило за fallback_after секунд.
+        self.backend = backend
+        self.fallback_after = fallback_after
+        self.local = None
+        self.fallback_executor = None
+        if silero_options is not None:
+            self.local = SileroTTSBackend(**silero_options)
+            self.local.warm_up()
+            self.fallback_executor = ThreadPoolExecutor(max_workers=4)
 
         # Параметры HTTP-сервера
         self.http_host = http_host
@@ -67,27 +84,70 @@ class VoiceSynthesizer:
         else:
             logger.info(f"Используем существующую директорию: {self.base_dir}")
 
+        # Кэш синтезированных сообщений: повторная тревога с тем же текстом не обращается к API.
+        # Устаревшие файлы удаляет фоновый уборщик кэша, а не обход папки после каждого синтеза
+        cache_options = dict(cache_options or {})
+        janitor_interval = cache_options.pop('janitor_interval_seconds', 60)
+        orphan_age = cache_options.pop('orphan_age_seconds', 3600)
+        self.cache = TTSCache(self.base_dir, max_bytes=cache_max_bytes, **cache_options)
+
+        # Посегментный синтез: неизменные части шаблона синтезируются один раз и берутся
+        # из кэша, по API синтезируются только подставленные значения
+        self.segmented = segmented
+        self.segment_gap_ms = segment_gap_ms
+
+        # Синтез запрашивается в lpcm и сохраняется как WAV (и .sln48 для Asterisk) без ffmpeg;
+        # mp3/ogg создаются только по запросу к HTTP-серверу (см. ensure_format)
+        self.write_sln = write_sln or streaming
+
+        # Потоковая отдача: URL .sln48 возвращается сразу, а файл дописывается по мере
+        # поступления PCM от API и отдаётся HTTP-сервером по частям (см. LiveAudio)
+        self.streaming = streaming
+        self.live = {}
+        self.live_lock = threading.Lock()
+
+        # Словарь заранее синтезированных цифр, кодов событий и общих фраз: сообщения,
+        # целиком составленные из них, собираются без обращения к API
+        self.vocabulary = None
+        self.assembler = None
+        if vocabulary:
+            vocabulary_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), 'audio_sms', 'vocabulary'))
+            self.vocabulary = AudioVocabulary(vocabulary_dir, self.fetch_pcm)
+            self.assembler = MessageAssembler(self.vocabulary)
+
+        self.cache.start_janitor(janitor_interval, orphan_age, is_live=lambda name: self.live_source(name) is not None)
+
         # Запуск HTTP-сервера в отдельном потоке
         self.start_http_server()
 
     def start_http_server(self):
-        """Запуск встроенного HTTP-сервера для обслуживания аудиофайлов."""
-        os.chdir(self.base_dir)
-        handler = CustomHTTPRequestHandler
-        self.httpd = HTTPServer((self.http_host, self.http_port), handler)
+        """
+        Запуск встроенного многопоточного HTTP-сервера для обслуживания аудиофайлов.
+        Корень сервера задаётся явно — рабочий каталог процесса не меняется.
+        """
+        self.httpd = AudioHTTPServer(
+            (self.http_host, self.http_port), self.base_dir,
+            on_missing=self.ensure_format, live_source=self.live_source
+        )
         logger.info(f"(HTTPServer) Запуск HTTP-сервера на {self.http_host}:{self.http_port}, обслуживаются файлы из {self.base_dir}")
 
         server_thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
         server_thread.start()
 
-    def synthesize(self, object_id, template_variables, message_template=None):
+    def synthesize(self, object_id, template_variables, message_template=None, backend=None):
         """
         Генерация аудиосообщения с использованием Yandex.Cloud TTS API.
 
-        :param object_id: Уникальный идентификатор объекта, используется как имя файла
+        Файлы именуются ключом кэша (хэш текста и параметров голоса), поэтому повторный
+        синтез того же сообщения берётся из кэша, а одновременные события разных объектов
+        не перезаписывают файлы друг друга. Возвращённая запись закреплена в кэше —
+        после завершения звонка нужно вызвать release(cache_key).
+
+        :param object_id: Идентификатор объекта (для журнала)
         :param template_variables: Переменные для замены в шаблоне сообщения
         :param message_template: Шаблон сообщения для синтеза
-        :return: URL к сгенерированным аудиофайлам или None в случае ошибки
+        :param backend: Движок синтеза (yandex / silero / auto), по умолчанию — из настроек
+        :return: URL к сгенерированным аудиофайлам (и 'cache_key') или None в случае ошибки
         """
         # Загрузка текста из конфигурационного файла
         if not message_template:
@@ -101,10 +161,6 @@ class VoiceSynthesizer:
         emotion = synthesizer_settings["emotion"]
         speed = synthesizer_settings["speed"]
 
-        headers = {
-            "Authorization": f"Api-Key {self.api_key}"
-        }
-
         # Формируем текст сообщения
         try:
             message_text = message_template.format(**template_variables)
@@ -112,91 +168,323 @@ class VoiceSynthesizer:
             logger.error(f"Ошибка форматирования шаблона сообщения: отсутствует ключ {e}")
             return None
 
-        data = {
-            "text": message_text,
-            "lang": "ru-RU",
-            "voice": voice,  # Голос из конфиг файла
-            "speed": str(speed),  # Скорость из конфиг файла
-            "emotion": emotion,  # Эмоция из конфиг файла
-            "folderId": self.folder_id,
-            "format": "oggopus",
-            "sampleRateHertz": "48000"
+        backend = backend or self.backend
+        if backend == BACKEND_SILERO and self.local is None:
+            logger.warning("Движок Silero не настроен, используется Yandex.")
+            backend = BACKEND_YANDEX
+
+        if backend == BACKEND_SILERO:
+            return self.synthesize_local(object_id, message_text, speed)
+
+        if self.assembler and '<speak>' not in message_template:
+            cache_key = TTSCache.make_key(message_text, voice, emotion, speed, 'vocabulary')
+            with self.cache.key_lock(cache_key):
+                if self.cache.get(cache_key) is not None:
+                    logger.info(f"Аудио для объекта {object_id} взято из кэша ({cache_key}).")
+                    return self.build_urls(cache_key)
+                pcm = self.assembler.assemble(message_template, template_variables, voice, emotion, speed)
+                if pcm is not None and self.write_outputs(cache_key, pcm):
+                    logger.info(f"Аудио для объекта {object_id} собрано из словаря без обращения к API.")
+                    return self.build_urls(cache_key)
+
+        if self.segmented and '<speak>' not in message_template:
+            cache_key = TTSCache.make_key(message_text, voice, emotion, speed, 'segmented')
+            with self.cache.key_lock(cache_key):
+                if self.cache.get(cache_key) is not None:
+                    logger.info(f"Аудио для объекта {object_id} взято из кэша ({cache_key}).")
+                    return self.build_urls(cache_key)
+                audio_file_urls = self.synthesize_segmented(
+                    object_id, cache_key, message_template, template_variables, voice, emotion, speed
+                )
+            if audio_file_urls:
+                return audio_file_urls
+            logger.warning(f"Посегментный синтез для объекта {object_id} не удался, синтезируем сообщение целиком.")
+
+        cache_key = TTSCache.make_key(message_text, voice, emotion, speed, f"wav{PCM_SAMPLE_RATE}")
+        with self.cache.key_lock(cache_key):
+            if self.cache.get(cache_key) is not None:
+                logger.info(f"Аудио для объекта {object_id} взято из кэша ({cache_key}).")
+                return self.build_urls(cache_key)
+            if self.streaming:
+                return self.start_streaming(object_id, cache_key, message_text, voice, emotion, speed)
+            return self.synthesize_to_cache(object_id, cache_key, message_text, voice, emotion, speed, backend)
+
+    def live_source(self, filename):
+        """LiveAudio для файла, который ещё дописывается потоковым синтезом, иначе None."""
+        with self.live_lock:
+            return self.live.get(filename)
+
+    def start_streaming(self, object_id, cache_key, message_text, voice, emotion, speed):
+        """
+        Запускает потоковый синтез в фоне и сразу возвращает URL: звонок можно начинать
+        параллельно с синтезом. Запись кэша создаётся сразу и закрепляется за вызывающим;
+        после завершения к ней добавляется WAV, при сбое запись удаляется.
+        """
+        sln_filename = f"{cache_key}{SLN_EXTENSION}"
+        path = os.path.join(self.base_dir, sln_filename)
+        try:
+            open(path, 'wb').close()
+        except OSError as e:
+            logger.error(f"Не удалось создать файл потокового синтеза {path}: {e}")
+            return None
+        live = LiveAudio(path)
+        with self.live_lock:
+            self.live[sln_filename] = live
+        self.cache.put(cache_key, [sln_filename])
+        # Отдельное закрепление на время синтеза: вызывающий может освободить запись раньше
+        self.cache.acquire(cache_key)
+        threading.Thread(
+            target=self.stream_to_file,
+            args=(object_id, cache_key, live, message_text, voice, emotion, speed),
+            daemon=True
+        ).start()
+        logger.info(f"Потоковый синтез для объекта {object_id} запущен ({sln_filename}).")
+        return self.build_urls(cache_key)
+
+    def stream_to_file(self, object_id, cache_key, live, message_text, voice, emotion, speed):
+        """Дописывает PCM в .sln48 по мере поступления; по завершении сохраняет WAV."""
+        sln_filename = os.path.basename(live.path)
+        failed = True
+        try:
+            with open(live.path, 'wb') as f:
+                for chunk in self.yandex.stream_pcm(message_text, voice, emotion, speed):
+                    f.write(chunk)
+                    f.flush()
+                    live.grew(f.tell())
+            failed = live.size == 0
+            if not failed:
+                with open(live.path, 'rb') as f:
+                    write_wav(os.path.join(self.base_dir, f"{cache_key}.wav"), f.read())
+                self.cache.update(cache_key, [sln_filename, f"{cache_key}.wav"])
+                logger.info(f"Потоковый синтез для объекта {object_id} завершён ({live.size} байт).")
+        except (TTSStreamError, OSError) as e:
+            failed = True
+            logger.error(f"Потоковый синтез для объекта {object_id} не удался: {e}")
+        finally:
+            # При любом исходе читатели файла получают конец потока, а закрепление снимается
+            if failed:
+                self.cache.discard(cache_key)
+            live.finish(failed=failed)
+            with self.live_lock:
+                self.live.pop(sln_filename, None)
+            self.cache.release(cache_key)
+
+    def local_cache_key(self, message_text, speed):
+        return TTSCache.make_key(message_text, f"silero:{self.local.speaker}", '', speed, f"wav{PCM_SAMPLE_RATE}")
+
+    def synthesize_local(self, object_id, message_text, speed):
+        """Синтез сообщения целиком локальным движком (с кэшем)."""
+        cache_key = self.local_cache_key(message_text, speed)
+        with self.cache.key_lock(cache_key):
+            if self.cache.get(cache_key) is not None:
+                logger.info(f"Аудио для объекта {object_id} взято из кэша ({cache_key}).")
+                return self.build_urls(cache_key)
+            pcm = self.local.synthesize_pcm(message_text, speed=speed)
+            if pcm is None or not self.write_outputs(cache_key, pcm):
+                logger.error(f"Локальный синтез для объекта {object_id} не удался.")
+                return None
+        logger.info(f"Аудио для объекта {object_id} синтезировано локально (Silero).")
+        return self.build_urls(cache_key)
+
+    def build_urls(self, cache_key):
+        """URL файлов записи. mp3 и ogg создаются при первом обращении к ним."""
+        urls = {
+            'ogg': urljoin(self.audio_base_url, f"{cache_key}.ogg"),
+            'mp3': urljoin(self.audio_base_url, f"{cache_key}.mp3"),
+            'wav': urljoin(self.audio_base_url, f"{cache_key}.wav"),
+            'cache_key': cache_key
         }
+        if self.write_sln:
+            urls['sln'] = urljoin(self.audio_base_url, f"{cache_key}{SLN_EXTENSION}")
+        return urls
 
-        # Путь для сохранения аудиофайлов локально
-        ogg_filename = f"{object_id}.ogg"
-        ogg_output = os.path.join(self.base_dir, ogg_filename)
+    def release(self, cache_key):
+        """Снимает закрепление аудио в кэше (звонок, использовавший его, завершён)."""
+        if cache_key:
+            self.cache.release(cache_key)
 
-        logger.info(f"Отправка запроса на синтез речи для объекта {object_id}...")
+    def pin(self, cache_key, action_id):
+        """Закрепляет аудио за звонком (ActionID) до unpin — файл не удалится, пока Asterisk его играет."""
+        if cache_key and action_id:
+            self.cache.pin(cache_key, action_id)
 
-        try:
-            response = requests.post(self.url, headers=headers, data=data, stream=True)
-            response.raise_for_status()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Ошибка при выполнении запроса: {e}")
-            return None
+    def unpin(self, action_id):
+        self.cache.unpin(action_id)
 
-        # Сохраняем аудиофайл в формате OGG
-        if response.status_code == 200:
+    def fetch_audio(self, text, voice, emotion, speed, audio_format, sample_rate):
+        """Синтезирует текст целиком в Yandex TTS и возвращает байты аудио или None."""
+        return self.yandex.synthesize(text, voice, emotion, speed, audio_format, sample_rate)
+
+    def fetch_pcm(self, text, voice, emotion, speed):
+        """Синтезирует текст в PCM (lpcm) с частотой склейки сегментов."""
+        return self.fetch_audio(text, voice, emotion, speed, 'lpcm', PCM_SAMPLE_RATE)
+
+    def render_pcm(self, text, voice, emotion, speed, local_ready):
+        """
+        PCM сообщения из Yandex TTS. Возвращает (pcm, future). Если local_ready, облако
+        ждут не дольше fallback_after: при ошибке pcm — None, при задержке — None и future
+        ещё не завершённого запроса (вызывающий синтезирует локально, а если не выйдет —
+        дожидается облака).
+        """
+        if not local_ready or self.fallback_after <= 0:
+            pcm = self.fetch_pcm(text, voice, emotion, speed)
+        else:
+            future = self.fallback_executor.submit(self.fetch_pcm, text, voice, emotion, speed)
+            try:
+                pcm = future.result(timeout=self.fallback_after)
+            except FutureTimeoutError:
+                logger.warning(f"Yandex TTS не ответил за {self.fallback_after} сек, синтезируем локально.")
+                return None, future
+        if pcm is None and local_ready:
+            logger.warning("Yandex TTS недоступен, синтезируем локально.")
+        return pcm, None
+
+    @staticmethod
+    def voice_settings():
+        """Текущие настройки голоса (голос, эмоция, скорость) из конфиг файла."""
+        return load_synthesizer_settings()
+
+    def build_vocabulary(self, templates=(), phrases=()):
+        """Досинтезирует недостающие фразы словаря для текущих настроек голоса."""
+        if not self.vocabulary:
+            return 0
+        settings = load_synthesizer_settings()
+        all_phrases = AudioVocabulary.default_phrases(templates) + list(phrases)
+        return self.vocabulary.build(settings["voice"], settings["emotion"], settings["speed"], all_phrases)
+
+    def write_outputs(self, cache_key, pcm):
+        """
+        Сохраняет PCM под ключом cache_key как WAV (и .sln48, если включено) модулем wave,
+        без запуска ffmpeg, и регистрирует запись в кэше.
+        """
+        files = [f"{cache_key}.wav"]
+        try:
+            write_wav(os.path.join(self.base_dir, files[0]), pcm)
+            if self.write_sln:
+                files.append(f"{cache_key}{SLN_EXTENSION}")
+                with open(os.path.join(self.base_dir, files[1]), 'wb') as f:
+                    f.write(pcm)
+        except OSError as e:
+            logger.error(f"Ошибка при сохранении аудио: {e}")
+            return False
+        self.cache.put(cache_key, files)
+        return True
+
+    def ensure_format(self, filename):
+        """
+        Создаёт mp3/ogg из WAV той же записи при первом запросе к HTTP-серверу.
+        Возвращает True, если файл существует.
+        """
+        path = os.path.join(self.base_dir, filename)
+        if os.path.exists(path):
+            return True
+        key, ext = os.path.splitext(filename)
+        if ext not in ('.mp3', '.ogg'):
+            return False
+        live = self.live_source(f"{key}{SLN_EXTENSION}")
+        if live is not None and not live.wait_done(timeout=60):
+            return False
+        wav_path = os.path.join(self.base_dir, f"{key}.wav")
+        with self.cache.key_lock(key):
+            if os.path.exists(path):
+                return True
+            if not os.path.exists(wav_path):
+                return False
+            tmp_path = f"{path}.tmp"
             try:
-                with open(ogg_output, "wb") as f:
-                    for chunk in response.iter_content(chunk_size=4096):
-                        if chunk:
-                            f.write(chunk)
-                logger.info(f"Файл {ogg_output} успешно создан.")
-
-                # Конвертируем ogg в mp3 и wav
-                mp3_filename = f"{object_id}.mp3"
-                mp3_output = os.path.join(self.base_dir, mp3_filename)
-                wav_filename = f"{object_id}.wav"
-                wav_output = os.path.join(self.base_dir, wav_filename)
-
-                try:
-                    # Конвертация OGG -> MP3 и WAV
-                    audio = AudioSegment.from_file(ogg_output)
-                    audio.export(mp3_output, format="mp3")
-                    audio.export(wav_output, format="wav")
-
-                    logger.info(f"Файлы {mp3_output} и {wav_output} успешно созданы.")
-                except Exception as e:
-                    logger.error(f"Ошибка при конвертации аудиофайла: {e}")
+                audio = AudioSegment.from_wav(wav_path)
+                if ext == '.ogg':
+                    audio.export(tmp_path, format="ogg", codec="libopus")
+                else:
+                    audio.export(tmp_path, format="mp3")
+                os.replace(tmp_path, path)
+            except Exception as e:
+                logger.error(f"Ошибка при конвертации {wav_path} в {ext}: {e}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return False
+        self.cache.add_files(key, [filename])
+        logger.info(f"(HTTPServer) Файл {filename} создан по запросу.")
+        return True
+
+    def segment_pcm(self, text, voice, emotion, speed):
+        """PCM одного сегмента: из кэша или синтезом (результат сразу кладётся в кэш)."""
+        key = TTSCache.make_key(text, voice, emotion, speed, f"lpcm{PCM_SAMPLE_RATE}")
+        filename = f"{key}.pcm"
+        path = os.path.join(self.base_dir, filename)
+        with self.cache.key_lock(key):
+            cached = self.cache.get(key) is not None
+            if not cached:
+                pcm = self.fetch_pcm(text, voice, emotion, speed)
+                if pcm is None:
                     return None
+                with open(path, 'wb') as f:
+                    f.write(pcm)
+                self.cache.put(key, [filename])
+            try:
+                with open(path, 'rb') as f:
+                    return f.read()
+            finally:
+                # Сегмент нужен только на время склейки
+                self.cache.release(key)
 
-                # Формируем URL аудиофайлов
-                audio_file_urls = {
-                    'ogg': urljoin(self.audio_base_url, ogg_filename),
-                    'mp3': urljoin(self.audio_base_url, mp3_filename),
-                    'wav': urljoin(self.audio_base_url, wav_filename)
-                }
+    def synthesize_segmented(self, object_id, cache_key, message_template, template_variables, voice, emotion, speed):
+        """
+        Собирает сообщение из сегментов шаблона и сохраняет в кэш под ключом cache_key.
+        Возвращает URL аудиофайлов или None.
+        """
+        try:
+            segments = render_segments(split_template(message_template), template_variables)
+        except (KeyError, ValueError) as e:
+            logger.error(f"Ошибка разбиения шаблона на сегменты: {e}")
+            return None
 
-                logger.info(f"URL аудиофайлов: {audio_file_urls}")
+        parts = []
+        for _, text in segments:
+            pcm = self.segment_pcm(text, voice, emotion, speed)
+            if pcm is None:
+                return None
+            parts.append(pcm)
 
-                # Очищаем старые файлы
-                self.cleanup_old_files()
+        if not self.write_outputs(cache_key, join_pcm(parts, self.segment_gap_ms)):
+            return None
+        logger.info(f"Аудио для объекта {object_id} собрано из {len(parts)} сегментов.")
+        return self.build_urls(cache_key)
 
+    def synthesize_to_cache(self, object_id, cache_key, message_text, voice, emotion, speed, backend=BACKEND_YANDEX):
+        """
+        Синтез сообщения целиком и сохранение в кэш под ключом cache_key.
+        Результат локального движка (fallback в режиме auto) сохраняется под ключом Silero,
+        чтобы следующий такой же запрос снова попробовал облако.
+        """
+        logger.info(f"Отправка запроса на синтез речи для объекта {object_id}...")
+        local_ready = backend == BACKEND_AUTO and self.local is not None and self.local.available()
+        pcm, pending = self.render_pcm(message_text, voice, emotion, speed, local_ready)
+        if pcm is None and local_ready:
+            # synthesize_local держит блокировку ключа Silero от проверки кэша до записи файлов:
+            # одновременные промахи по одному тексту не синтезируют и не пишут его дважды
+            audio_file_urls = self.synthesize_local(object_id, message_text, speed)
+            if audio_file_urls or pending is None:
                 return audio_file_urls
-            except Exception as e:
-                logger.error(f"Ошибка при сохранении файла: {e}")
-                return None
-        else:
-            logger.error(f"Ошибка синтеза речи: {response.status_code} - {response.text}")
+            pcm = pending.result()
+        if pcm is None:
+            return None
+        if not self.write_outputs(cache_key, pcm):
             return None
 
-    def cleanup_old_files(self):
-        """Удаляет старые файлы, оставляя только 30 последних."""
-        files = [os.path.join(self.base_dir, f) for f in os.listdir(self.base_dir) if f.endswith(('.ogg', '.mp3', '.wav'))]
-        files.sort(key=os.path.getmtime)
-
-        if len(files) > 30:
-            for file_to_delete in files[:-30]:
-                try:
-                    os.remove(file_to_delete)
-                    logger.info(f"(HTTPServer) Удален старый файл: {file_to_delete}")
-                except Exception as e:
-                    logger.error(f"(HTTPServer) Ошибка удаления файла {file_to_delete}: {e}")
+        # Формируем URL аудиофайлов
+        audio_file_urls = self.build_urls(cache_key)
+        logger.info(f"URL аудиофайлов: {audio_file_urls}")
+        return audio_file_urls
 
     def stop_http_server(self):
         """Останавливает HTTP-сервер."""
         if hasattr(self, 'httpd'):
             self.httpd.shutdown()
+            self.httpd.server_close()
             logger.info("(HTTPServer) HTTP-сервер остановлен.")
+        self.cache.close()
+        self.yandex.close()
+        if self.local:
+            self.local.close()
+            self.fallback_executor.shutdown(wait=False)
@@ -0,0 +1,166 @@
+# ami_simulator.py
+# Локальный имитатор Asterisk для ручной проверки CallManager/EventProcessor:
+#   python ami_simulator.py [порт AMI] [порт HTTP]
+# и в config.ini: [Asterisk] host = 127.0.0.1, port = 5038; [AsteriskHTTP] host = 127.0.0.1, port = 8088.
+# Originate принимается через HTTP (/asterisk/arawman), события звонка рассылаются всем
+# подключениям AMI. Сценарий выбирается по последней цифре номера:
+#   1 — ответ и подтверждение (UserEvent SMENA_ACK), затем Hangup;
+#   2 — ответ без подтверждения, Hangup через 5 сек;
+#   3 — занято;
+#   остальные — долгий вызов без ответа (30 сек), прерывается действием Hangup.
+import sys
+import time
+import socket
+import threading
+import itertools
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+connections = []
+connections_lock = threading.Lock()
+channel_seq = itertools.count(1)
+# канал -> threading.Event прерывания вызова
+ringing = {}
+
+
+def send_message(conn, fields):
+    data = ''.join(f"{key}: {value}\r\n" for key, value in fields) + '\r\n'
+    try:
+        conn.sendall(data.encode('utf-8'))
+    except OSError:
+        pass
+
+
+def broadcast(event, **fields):
+    print(f"-> {event} {fields}")
+    with connections_lock:
+        targets = list(connections)
+    for conn in targets:
+        send_message(conn, [('Event', event), *fields.items()])
+
+
+def run_call(action_id, phone, variables):
+    channel = f"Local/{phone}@out-bot1-{next(channel_seq):08x};1"
+    hangup = threading.Event()
+    ringing[channel] = hangup
+    for name, value in variables.items():
+        broadcast('VarSet', Channel=channel, Variable=name, Value=value)
+    scenario = phone[-1:] if phone else ''
+    if scenario == '3':
+        time.sleep(1)
+        broadcast('OriginateResponse', ActionID=action_id, Response='Failure', Channel=channel, Reason='5')
+    elif scenario in ('1', '2'):
+        time.sleep(1)
+        broadcast('OriginateResponse', ActionID=action_id, Response='Success', Channel=channel, Reason='4')
+        if scenario == '1':
+            time.sleep(2)
+            broadcast('UserEvent', UserEvent='SMENA_ACK', Channel=channel, SmenaActionID=action_id, Digit='1')
+            hangup.wait(1)
+        else:
+            hangup.wait(5)
+        broadcast('Hangup', Channel=channel, Cause='16', **{'Cause-txt': 'Normal Clearing'})
+    else:
+        if hangup.wait(30):
+            broadcast('Hangup', Channel=channel, Cause='16', **{'Cause-txt': 'Normal Clearing'})
+        broadcast('OriginateResponse', ActionID=action_id, Response='Failure', Channel=channel, Reason='3')
+    ringing.pop(channel, None)
+
+
+class ArawmanHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        query = {k: v[0] for k, v in parse_qs(urlsplit(self.path).query).items()}
+        if query.get('action', '').lower() == 'originate':
+            variables = dict(
+                item.split('=', 1) for item in query.get('Variable', '').split(',') if '=' in item
+            )
+            phone = variables.get('phone_number', '')
+            print(f"Originate {query.get('ActionID')} на {phone}")
+            threading.Thread(
+                target=run_call, args=(query.get('ActionID'), phone, variables), daemon=True
+            ).start()
+        body = b'Response: Success\r\nMessage: Originate successfully queued\r\n\r\n'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def read_action(reader):
+    fields = {}
+    for line in reader:
+        line = line.rstrip('\r\n')
+        if not line:
+            if fields:
+                return fields
+            continue
+        key, _, value = line.partition(':')
+        fields[key.strip()] = value.strip()
+    return None
+
+
+def serve_ami(conn, address):
+    print(f"AMI: подключение {address}")
+    conn.sendall(b'Asterisk Call Manager/5.0.1\r\n')
+    with connections_lock:
+        connections.append(conn)
+    try:
+        reader = conn.makefile('r', encoding='utf-8', newline='')
+        while True:
+            action = read_action(reader)
+            if action is None:
+                break
+            name = action.get('Action', '').lower()
+            response = [('Response', 'Success'), ('ActionID', action.get('ActionID', ''))]
+            if name == 'login':
+                response.append(('Message', 'Authentication accepted'))
+            elif name == 'ping':
+                response.append(('Ping', 'Pong'))
+            elif name == 'hangup':
+                hangup = ringing.get(action.get('Channel'))
+                if hangup is None:
+                    response = [('Response', 'Error'), ('ActionID', action.get('ActionID', '')),
+                                ('Message', 'No such channel')]
+                else:
+                    hangup.set()
+            elif name == 'logoff':
+                send_message(conn, [('Response', 'Goodbye'), ('ActionID', action.get('ActionID', ''))])
+                break
+            send_message(conn, response)
+    except OSError:
+        pass
+    finally:
+        with connections_lock:
+            if conn in connections:
+                connections.remove(conn)
+        conn.close()
+        print(f"AMI: отключение {address}")
+
+
+def start(ami_port=0, http_port=0):
+    """Запускает имитатор в фоновых потоках. Возвращает (сервер AMI, HTTP-сервер)."""
+    httpd = ThreadingHTTPServer(('127.0.0.1', http_port), ArawmanHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    server = socket.create_server(('127.0.0.1', ami_port))
+    threading.Thread(target=accept_ami, args=(server,), daemon=True).start()
+    return server, httpd
+
+
+def accept_ami(server):
+    while True:
+        try:
+            conn, address = server.accept()
+        except OSError:
+            break
+        threading.Thread(target=serve_ami, args=(conn, address), daemon=True).start()
+
+
+def main():
+    ami_port = int(sys.argv[1]) if len(sys.argv) > 1 else 5038
+    http_port = int(sys.argv[2]) if len(sys.argv) > 2 else 8088
+    server, _ = start(ami_port, http_port)
+    print(f"Имитатор Asterisk: AMI 127.0.0.1:{ami_port}, HTTP 127.0.0.1:{http_port}")
+    threading.Event().wait()
+
+
+if __name__ == '__main__':
+    main()
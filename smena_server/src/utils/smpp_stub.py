@@ -0,0 +1,126 @@
+# smpp_stub.py
+# Локальная заглушка SMSC для ручной проверки SMPPTransport:
+#   python smpp_stub.py [порт]
+# и в config.ini: [SMS] backend = smpp, [SMPP] host = 127.0.0.1, port = 2775.
+# Принимает bind_transceiver, отвечает на enquire_link и submit_sm, через
+# секунду после каждого принятого submit_sm присылает квитанцию доставки (deliver_sm).
+# Ошибки submit_sm_resp выбираются по последней цифре номера получателя:
+#   8 — ESME_RTHROTTLED (0x58, временная), 9 — ESME_RINVDSTADR (0x0B, постоянная).
+import sys
+import struct
+import socket
+import threading
+import itertools
+
+BIND_TRANSCEIVER = 0x00000009
+SUBMIT_SM = 0x00000004
+DELIVER_SM = 0x00000005
+UNBIND = 0x00000006
+ENQUIRE_LINK = 0x00000015
+GENERIC_NACK = 0x80000000
+
+# Последняя цифра номера -> статус submit_sm_resp
+ERROR_STATUSES = {ord('8'): 0x58, ord('9'): 0x0B}
+
+message_ids = itertools.count(1)
+
+
+def read_exact(conn, size):
+    data = b''
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Соединение закрыто")
+        data += chunk
+    return data
+
+
+def send_pdu(conn, lock, command_id, sequence, body=b'', status=0):
+    with lock:
+        conn.sendall(struct.pack('>IIII', 16 + len(body), command_id, status, sequence) + body)
+
+
+def cstrings(body, count):
+    """Первые count C-строк тела PDU и смещение после них."""
+    values, offset = [], 0
+    for _ in range(count):
+        end = body.index(b'\0', offset)
+        values.append(body[offset:end])
+        offset = end + 1
+    return values, offset
+
+
+def destination_addr(body):
+    # service_type, source_addr_ton, source_addr_npi, source_addr, dest_addr_ton, dest_addr_npi, destination_addr
+    (_,), offset = cstrings(body, 1)
+    (_,), skip = cstrings(body[offset + 2:], 1)
+    offset += 2 + skip + 2
+    (dest,), _ = cstrings(body[offset:], 1)
+    return dest
+
+
+def send_receipt(conn, lock, sequence, message_id, phone):
+    text = f"id:{message_id} sub:001 dlvrd:001 submit date:0000000000 done date:0000000000 stat:DELIVRD err:000 text:".encode('ascii')
+    body = (b'\0' + bytes([1, 1]) + phone + b'\0' + bytes([0, 0]) + b'\0'
+            + bytes([0x04, 0, 0]) + b'\0' + b'\0' + bytes([0, 0, 0, 0]) + bytes([len(text)]) + text)
+    try:
+        send_pdu(conn, lock, DELIVER_SM, sequence, body)
+    except OSError:
+        pass
+
+
+def serve_client(conn, address):
+    print(f"Подключение {address}")
+    lock = threading.Lock()
+    sequences = itertools.count(1)
+    try:
+        while True:
+            length, command_id, _, sequence = struct.unpack('>IIII', read_exact(conn, 16))
+            body = read_exact(conn, length - 16)
+            if command_id == BIND_TRANSCEIVER:
+                (system_id,), _ = cstrings(body, 1)
+                print(f"bind_transceiver: {system_id.decode()}")
+                send_pdu(conn, lock, command_id | GENERIC_NACK, sequence, b'smpp_stub\0')
+            elif command_id == ENQUIRE_LINK:
+                send_pdu(conn, lock, command_id | GENERIC_NACK, sequence)
+            elif command_id == SUBMIT_SM:
+                phone = destination_addr(body)
+                status = ERROR_STATUSES.get(phone[-1] if phone else None)
+                if status:
+                    print(f"submit_sm на {phone.decode()}: ошибка {status:#x}")
+                    send_pdu(conn, lock, command_id | GENERIC_NACK, sequence, b'\0', status=status)
+                    continue
+                message_id = str(next(message_ids))
+                print(f"submit_sm на {phone.decode()}: message_id={message_id}")
+                send_pdu(conn, lock, command_id | GENERIC_NACK, sequence, message_id.encode('ascii') + b'\0')
+                threading.Timer(1.0, send_receipt, args=(conn, lock, next(sequences), message_id, phone)).start()
+            elif command_id == UNBIND:
+                send_pdu(conn, lock, command_id | GENERIC_NACK, sequence)
+                break
+            elif not command_id & GENERIC_NACK:
+                send_pdu(conn, lock, GENERIC_NACK, sequence, status=0x03)
+    except ConnectionError:
+        pass
+    finally:
+        conn.close()
+        print(f"Отключение {address}")
+
+
+def serve(server):
+    while True:
+        try:
+            conn, address = server.accept()
+        except OSError:
+            break
+        threading.Thread(target=serve_client, args=(conn, address), daemon=True).start()
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 2775
+    server = socket.create_server(('127.0.0.1', port))
+    print(f"Заглушка SMSC слушает 127.0.0.1:{port}")
+    serve(server)
+
+
+if __name__ == '__main__':
+    main()